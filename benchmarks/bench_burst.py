@@ -0,0 +1,131 @@
+"""
+Benchmark: Burst-Nachrichten mit und ohne Zusammenfassen (src/updates.py).
+
+Jeder User schickt --burst Nachrichten im Abstand von --gap-s Sekunden
+("hey" / "kurze frage" / ...). Die Updates laufen wie im Bot durch den
+UserOrderedUpdateProcessor:
+- einzeln:  jede Nachricht bekommt ihren eigenen Pipeline-Lauf und ihre
+            eigene Antwort (current_arrival() und Neuplanung abgeschaltet)
+- debounce: Ruhe-Fenster BOT_DEBOUNCE_SECONDS, eine noch nicht gesendete
+            Antwort in der Outbox wird bei neuer Nachricht neu geplant
+
+Kennzahlen pro Burst: LLM-Aufrufe (am Fake-Server gezählt), gesendete
+Antworten, davon veraltet (ohne Kenntnis der letzten Nachricht des Bursts
+geschrieben) und Zeit von der letzten Nachricht bis zur ersten Antwort,
+die sie kennt.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_burst.py --users 10 --burst 3 --gap-s 0.8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import start_server
+from bench_reply_latency import fake_update, TELEGRAM, MESSAGES
+
+async def run(bot, db, processor, server, n_users, burst, gap, offset):
+    from src.outbox import start_dispatcher
+    start_dispatcher(TELEGRAM)
+    user_ids = range(offset + 1, offset + n_users + 1)
+    for user_id in user_ids:
+        db.add_user(user_id, f"user{user_id}", f"User{user_id}")
+
+    context = SimpleNamespace(bot=TELEGRAM)
+    last_sent = {}
+
+    async def user_burst(user_id):
+        tasks = []
+        for index in range(burst):
+            last_sent[user_id] = time.perf_counter()
+            update = fake_update(user_id, MESSAGES[index % len(MESSAGES)])
+            tasks.append(asyncio.create_task(processor.process_update(update, bot.handle_message(update, context))))
+            if index < burst - 1:
+                await asyncio.sleep(gap)
+        await asyncio.gather(*tasks)
+
+    await processor.initialize()
+    requests_before = server.requests
+    await asyncio.gather(*(user_burst(u) for u in user_ids))
+    await bot.drain_analyses()
+    while db.get_outbox_counts().keys() & {'pending', 'typing', 'sending'}:
+        await asyncio.sleep(0.05)
+
+    # Antworten in Sendereihenfolge, je mit den Nachrichten, auf die sie antworten
+    last_text = MESSAGES[(burst - 1) % len(MESSAGES)]
+    sent, stale, waits = 0, 0, []
+    for user_id in user_ids:
+        rows = db.get_connection().execute(
+            "SELECT reply_to FROM outbox WHERE user_id = ? AND status = 'sent' ORDER BY sent_at", (user_id,)
+        ).fetchall()
+        sent += len(rows)
+        stale += sum(1 for row in rows if last_text not in (row['reply_to'] or ""))
+        times = [at for at, _ in TELEGRAM.sent[user_id]]
+        fresh = [at for at, row in zip(times, rows) if last_text in (row['reply_to'] or "")]
+        if fresh:
+            waits.append((fresh[0] - last_sent[user_id]) * 1000)
+
+    calls = (server.requests - requests_before) / n_users
+    return calls, sent / n_users, stale / n_users, statistics.median(waits) if waits else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=3, help="Nachrichten pro Burst")
+    parser.add_argument("--gap-s", type=float, default=0.8, help="Abstand innerhalb des Bursts")
+    parser.add_argument("--debounce-s", type=float, default=2, help="Ruhe-Fenster")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latenz pro LLM-Aufruf")
+    parser.add_argument("--delay-s", type=float, default=3, help="fixer Human Delay pro Antwort")
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        from src import bot, outbox, updates
+        from src.updates import UserOrderedUpdateProcessor
+
+        async def fixed_delay(user_id, text):
+            return args.delay_s, 0
+        async def keep_pending(user_id):
+            return []
+        bot.plan_human_delay = fixed_delay
+        bot.is_in_quiet_hours = lambda *a: (False, None, None)
+        bot.random.randint = lambda a, b: a
+
+        print(f"\n{args.burst} Nachrichten pro Burst, {args.gap_s}s Abstand, {args.users} User")
+        print(f"{'Modus':<10} {'LLM-Aufrufe':>12} {'Antworten':>10} {'veraltet':>9} {'Antwort nach':>13}")
+        offset = 0
+        for mode in ("einzeln", "debounce"):
+            bot.current_arrival = (lambda: None) if mode == "einzeln" else updates.current_arrival
+            bot.cancel_pending_replies = keep_pending if mode == "einzeln" else outbox.cancel_pending_replies
+            bot.BOT_DEBOUNCE_SECONDS = args.debounce_s
+            offset += 10_000
+            calls, sent, stale, wait = asyncio.run(run(
+                bot, db, UserOrderedUpdateProcessor(), server,
+                args.users, args.burst, args.gap_s, offset
+            ))
+            print(f"{mode:<10} {calls:>12.1f} {sent:>10.1f} {stale:>9.1f} {wait:>11.0f}ms")
+
+        stats = updates.get_update_stats()
+        superseded = outbox._stats["superseded"]
+        print(f"\n🧺 {stats['coalesced']} Läufe zusammengefasst, {superseded} geplante Antworten neu geplant")
+        db.close_connection()
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: Kampagnen-Lauf (src/campaign.py) über eine große User-Basis.
+
+Legt --users User in einer temporären DB an (zufällige letzte Aktivität der
+letzten 60 Tage, Lead Score 0-10, ~10% deaktiviert, ~20% ohne Human Mode,
+verschiedene Nachtruhe-Zeiten) und misst:
+- Dry-Run über alle: Auswahl (SQL) und Versandplan inkl. Nachtruhe
+- echter Lauf mit --min-score: Generierung gegen den Fake-LLM-Server,
+  Nachrichten pro Sekunde und Slots in der Outbox (Abstand = 1/rate)
+
+Die Generierung ist durch LLM_RPM/LLM_TPM begrenzt (Standard ~8/s), nicht
+durch die Kampagne – mit --llm-rpm/--llm-tpm auf das Konto-Limit setzen.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_campaign.py --users 50000 --min-score 9
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import start_server
+
+def seed_users(db, n_users):
+    """User, Lead Scores (als Fakt → user_stats per Trigger) und je eine Nachricht"""
+    now = datetime.now()
+    users, facts, messages = [], [], []
+    for user_id in range(1, n_users + 1):
+        last = now - timedelta(hours=random.uniform(0, 60 * 24))
+        quiet_start, quiet_end = random.choice([(23, 7), (22, 6), (0, 8), (21, 9)])
+        users.append((user_id, f"user{user_id}", f"User{user_id}", last, random.random() > 0.1,
+                      random.random() > 0.2, quiet_start, quiet_end, last))
+        facts.append((user_id, 'lead_score', str(random.randint(0, 10)), 'score', last))
+        messages.append((user_id, 'user', "bis später", last))
+    conn = db.get_connection()
+    with conn:
+        conn.executemany("""
+            INSERT INTO users (id, username, first_name, joined_at, is_active, human_mode,
+                               quiet_start, quiet_end, last_message_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, users)
+        conn.executemany(
+            "INSERT INTO user_facts (user_id, fact_key, fact_value, fact_type, updated_at) VALUES (?, ?, ?, ?, ?)",
+            facts
+        )
+        conn.executemany("INSERT INTO messages (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)", messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--min-score", type=int, default=9, help="Lead Score für den echten Lauf")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latenz pro LLM-Aufruf")
+    parser.add_argument("--llm-rpm", type=int, default=500, help="LLM_RPM – begrenzt die Generierung")
+    parser.add_argument("--llm-tpm", type=int, default=200000, help="LLM_TPM – begrenzt die Generierung")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server, url = start_server(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+    os.environ["LLM_RPM"] = str(args.llm_rpm)
+    os.environ["LLM_TPM"] = str(args.llm_tpm)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(max(16, args.concurrency))
+    os.environ["LLM_MODEL_CONCURRENCY"] = str(max(8, args.concurrency))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        begin = time.perf_counter()
+        seed_users(db, args.users)
+        print(f"\n👥 {args.users} User angelegt in {time.perf_counter() - begin:.1f}s")
+
+        from src import campaign
+        dry = asyncio.run(campaign.run_campaign(dry_run=True, human_mode="any", min_score=0, rate=args.rate))
+        print(f"\n{'Dry-Run (alle Scores)':<24} {dry['candidates']:>7} Kandidaten, {dry['quiet']} Nachtruhe, "
+              f"{dry['planned']} geplant | Auswahl {dry['select_ms']}ms, Plan {dry['plan_ms']}ms")
+
+        requests_before = server.requests
+        real = asyncio.run(campaign.run_campaign(
+            min_score=args.min_score, human_mode="any", rate=args.rate, concurrency=args.concurrency
+        ))
+        rows = db.get_connection().execute(
+            "SELECT due_at FROM outbox WHERE kind = 'proactive' ORDER BY due_at"
+        ).fetchall()
+        slots = [row['due_at'] for row in rows]
+        gaps = [(b - a).total_seconds() for a, b in zip(slots, slots[1:])]
+        generated = real['seconds'] - (real['select_ms'] + real['plan_ms']) / 1000
+        print(f"{f'Lauf (Score ≥ {args.min_score})':<24} {real['candidates']:>7} Kandidaten, "
+              f"{real['scheduled']} in der Outbox, {real['failed']} fehlgeschlagen, "
+              f"{server.requests - requests_before} LLM-Aufrufe")
+        print(f"{'Generierung':<24} {generated:>6.1f}s ({real['scheduled'] / max(generated, 1e-9):.1f}/s "
+              f"bei {args.concurrency} parallel, {args.latency_ms:.0f}ms Latenz, LLM_RPM {args.llm_rpm}, LLM_TPM {args.llm_tpm})")
+        if gaps:
+            print(f"{'Slots':<24} {min(gaps):.2f}s bis {max(gaps):.2f}s Abstand, "
+                  f"Versand über {(slots[-1] - slots[0]).total_seconds() / 60:.1f} min")
+
+        again = asyncio.run(campaign.run_campaign(dry_run=True, min_score=args.min_score, human_mode="any"))
+        print(f"{'2. Lauf (Cooldown)':<24} {again['candidates']:>7} Kandidaten")
+        db.close_connection()
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Lasttest: Durchsatz von handle_message mit und ohne UserOrderedUpdateProcessor.
+
+Jeder User schickt --messages Nachrichten direkt hintereinander. Die Updates
+laufen wie in Application._update_fetcher durch process_update():
+- sequential: ein Update nach dem anderen (PTB-Standard ohne concurrent_updates)
+- concurrent: src/updates.py (globales Limit, FIFO pro User)
+
+LLM-Aufrufe gehen an benchmarks/fake_openai.py, Human Mode ist an, der
+simulierte Delay aber auf --delay-s fixiert (statt 3-60s), damit der Test
+in Sekunden läuft. Gemessen wird bis die Outbox alle Antworten gesendet hat.
+Zusammenfassen von Bursts ist aus, damit jede Nachricht eine eigene Antwort
+bekommt. Geprüft wird zusätzlich, dass sich die Nachrichten eines Users nie
+überlappen und in Sendereihenfolge verarbeitet werden.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_concurrency.py --users 1 5 20 50 --messages 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import start_server
+from bench_reply_latency import fake_update, TELEGRAM, MESSAGES
+
+async def run(bot, adb, processor, n_users, messages, offset):
+    user_ids = range(offset + 1, offset + n_users + 1)
+    for user_id in user_ids:
+        await adb.add_user(user_id, f"user{user_id}", f"User{user_id}")
+
+    spans = {}
+    from src.outbox import start_dispatcher
+    context = SimpleNamespace(bot=TELEGRAM)
+    start_dispatcher(TELEGRAM)
+
+    async def handle(user_id, seq):
+        start = time.perf_counter()
+        update = fake_update(user_id, MESSAGES[seq % len(MESSAGES)])
+        await bot.handle_message(update, context)
+        spans.setdefault(user_id, []).append((seq, start, time.perf_counter()))
+
+    # Updates in Eingangsreihenfolge: alle ersten Nachrichten, dann alle zweiten ...
+    updates = [(u, seq) for seq in range(messages) for u in user_ids]
+
+    start = time.perf_counter()
+    if processor is None:
+        for user_id, seq in updates:
+            await handle(user_id, seq)
+    else:
+        await processor.initialize()
+        await asyncio.gather(*(
+            processor.process_update(fake_update(user_id, ""), handle(user_id, seq))
+            for user_id, seq in updates
+        ))
+    for user_id in user_ids:
+        await TELEGRAM.wait_sent(user_id, messages, timeout=60)
+    elapsed = time.perf_counter() - start
+    await bot.drain_analyses()
+
+    ordered = all(
+        [seq for seq, _, _ in runs] == sorted(seq for seq, _, _ in runs)
+        and all(runs[i][2] <= runs[i + 1][1] for i in range(len(runs) - 1))
+        for runs in spans.values()
+    )
+    ordered = ordered and all(len(TELEGRAM.sent[u]) == messages for u in user_ids)
+    return len(updates) / elapsed, elapsed, ordered
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--messages", type=int, default=3, help="Nachrichten pro User")
+    parser.add_argument("--latency-ms", type=float, default=300, help="Latenz pro LLM-Aufruf")
+    parser.add_argument("--delay-s", type=float, default=2, help="fixer Human Delay pro Antwort")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-sequential-users", type=int, default=5, help="sequential dauert linear länger")
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+    # Eigene LLM-Limits (RPM, Semaphoren) sollen hier nicht der Engpass sein
+    os.environ.setdefault("LLM_RPM", "100000")
+    os.environ.setdefault("LLM_TPM", "100000000")
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", "256")
+    os.environ.setdefault("LLM_MODEL_CONCURRENCY", "256")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        from src import bot, db_async
+        from src.updates import UserOrderedUpdateProcessor
+
+        async def fixed_delay(user_id, text):
+            return args.delay_s, 0
+        async def keep_pending(user_id):
+            return []
+        bot.plan_human_delay = fixed_delay
+        bot.is_in_quiet_hours = lambda *a: (False, None, None)
+        bot.current_arrival = lambda: None
+        bot.cancel_pending_replies = keep_pending
+
+        print(f"\n{'User':>5} {'Modus':<11} {'Nachr./s':>9} {'Dauer':>8} {'Reihenfolge':>12}")
+        offset = 0
+        for n_users in args.users:
+            for mode in ("sequential", "concurrent"):
+                if mode == "sequential" and n_users > args.max_sequential_users:
+                    print(f"{n_users:>5} {mode:<11} {'(übersprungen)':>31}")
+                    continue
+                processor = UserOrderedUpdateProcessor(args.concurrency) if mode == "concurrent" else None
+                offset += 10_000
+                rate, elapsed, ordered = asyncio.run(run(bot, db_async, processor, n_users, args.messages, offset))
+                print(f"{n_users:>5} {mode:<11} {rate:>9.2f} {elapsed:>7.1f}s {'ok' if ordered else 'FEHLER':>12}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: Latenz der Dashboard-/Bot-Queries mit und ohne Migrations-Indizes.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_db_queries.py --messages 10000 10000000
+
+Für jede Größe wird eine frische Datenbank in einem Temp-Verzeichnis befüllt,
+einmal ohne Indizes (Schema-Version 0) und einmal nach migrate() gemessen.
+10M Nachrichten brauchen beim Befüllen ein bis zwei Minuten und ~1 GB Platz.
+"""
+import argparse
+import datetime
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import db
+from src.migrations import MIGRATIONS, migrate
+
+CHUNK = 50_000
+
+def populate(conn, n_messages, n_users):
+    """Füllt alle Tabellen mit synthetischen Daten"""
+    base = datetime.datetime(2024, 1, 1)
+    now = datetime.datetime.now()
+
+    conn.executemany(
+        "INSERT INTO users (id, username, first_name, joined_at, last_message_at) VALUES (?, ?, ?, ?, ?)",
+        ((u, f"user{u}", f"User{u}", base, now) for u in range(1, n_users + 1))
+    )
+
+    def message_rows():
+        for i in range(n_messages):
+            user_id = random.randint(1, n_users)
+            role = "user" if i % 2 else "assistant"
+            yield (user_id, role, f"Nachricht {i} mit etwas Text", base + datetime.timedelta(seconds=i))
+
+    rows = message_rows()
+    while True:
+        chunk = [r for _, r in zip(range(CHUNK), rows)]
+        if not chunk:
+            break
+        conn.executemany(
+            "INSERT INTO messages (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+            chunk
+        )
+
+    n_side = max(n_messages // 50, n_users)
+    conn.executemany(
+        "INSERT INTO lead_signals (user_id, signal, category, timestamp) VALUES (?, ?, 'general', ?)",
+        ((random.randint(1, n_users), "🔥 HOT", base + datetime.timedelta(seconds=i)) for i in range(n_side))
+    )
+    conn.executemany(
+        "INSERT INTO user_contacts (user_id, name, relationship, info, potential, created_at) VALUES (?, ?, 'Schwester', '', 'mittel', ?)",
+        ((random.randint(1, n_users), f"Kontakt {i}", base + datetime.timedelta(seconds=i)) for i in range(n_side))
+    )
+    conn.commit()
+
+def drop_indexes(conn):
+    """Setzt die DB auf den Stand vor den Migrationen zurück"""
+    names = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    )]
+    for name in names:
+        conn.execute(f"DROP INDEX {name}")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+
+def time_queries(n_users, repeats):
+    """Misst den Median jeder Query über zufällige User"""
+    queries = {
+        "get_chat_history": lambda u: db.get_chat_history(u, limit=50),
+        "get_full_chat": db.get_full_chat,
+        "get_lead_signals": db.get_lead_signals,
+        "get_contacts": db.get_contacts,
+        "get_user_stats": db.get_user_stats,
+    }
+    results = {}
+    for name, fn in queries.items():
+        samples = []
+        for _ in range(repeats):
+            user_id = random.randint(1, n_users)
+            start = time.perf_counter()
+            fn(user_id)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    return results
+
+def run(n_messages, n_users, repeats):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        conn = db.get_connection()
+        drop_indexes(conn)
+
+        print(f"\n📦 Befülle {n_messages:,} Nachrichten für {n_users:,} User...")
+        start = time.perf_counter()
+        populate(conn, n_messages, n_users)
+        print(f"   fertig in {time.perf_counter() - start:.1f}s")
+
+        before = time_queries(n_users, repeats)
+
+        start = time.perf_counter()
+        migrate(conn)
+        print(f"   Migrationen (v{MIGRATIONS[-1][0]}) in {time.perf_counter() - start:.1f}s")
+        after = time_queries(n_users, repeats)
+
+        print(f"\n{'Query':<20} {'ohne Index':>12} {'mit Index':>12} {'Faktor':>8}")
+        for name in before:
+            factor = before[name] / after[name] if after[name] else float("inf")
+            print(f"{name:<20} {before[name]:>10.3f}ms {after[name]:>10.3f}ms {factor:>7.1f}x")
+
+        db.close_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, nargs="+", default=[10_000, 10_000_000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    for n in args.messages:
+        run(n, args.users, args.repeats)
@@ -0,0 +1,111 @@
+"""
+Benchmark: Versand über src/delivery.py unter Last.
+
+Ein Fake-Bot simuliert die Bot API (HTTP-Latenz, optional 429 mit
+RetryAfter). Gleichzeitig gehen --live Antworten, --proactive proaktive und
+--manual manuelle Nachrichten an --chats Chats raus, alles auf einmal
+eingereiht (Worst Case für die Prioritäten).
+
+Geprüft wird:
+- Durchsatz bleibt unter TELEGRAM_GLOBAL_RATE (gemessen über 1s-Fenster)
+- kein Chat bekommt zwei Nachrichten in weniger als TELEGRAM_CHAT_INTERVAL
+- Live-Antworten warten kürzer als proaktive und manuelle (p50/p95)
+- 429er werden abgewartet und wiederholt, keine Nachricht geht verloren
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_delivery.py --live 120 --proactive 120 --manual 30 --chats 60
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telegram.error import RetryAfter
+
+class FakeBotAPI:
+    """Bot-Attrappe mit Latenz und gelegentlichem Flood Control"""
+
+    def __init__(self, latency_ms, flood_rate):
+        self.latency_ms = latency_ms
+        self.flood_rate = flood_rate
+        self.sent = []  # (perf_counter beim Aufruf, chat_id) – Jitter der Latenz zählt nicht
+        self.floods = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        called = time.perf_counter()
+        await asyncio.sleep(self.latency_ms / 1000 * random.uniform(0.8, 1.2))
+        if random.random() < self.flood_rate:
+            self.floods += 1
+            raise RetryAfter(1)
+        self.sent.append((called, chat_id))
+
+async def run(delivery, api, args):
+    jobs = (
+        [("live", delivery.LIVE)] * args.live
+        + [("proactive", delivery.PROACTIVE)] * args.proactive
+        + [("manual", delivery.MANUAL)] * args.manual
+    )
+    random.shuffle(jobs)
+    waits = defaultdict(list)
+    failed = 0
+    start = time.perf_counter()
+
+    async def one(index, kind, priority):
+        nonlocal failed
+        begin = time.perf_counter()
+        try:
+            await delivery.send_message(api, index % args.chats, f"{kind} {index}", priority)
+            waits[kind].append((time.perf_counter() - begin) * 1000)
+        except RetryAfter:
+            failed += 1
+
+    await asyncio.gather(*(one(i, kind, priority) for i, (kind, priority) in enumerate(jobs)))
+    elapsed = time.perf_counter() - start
+
+    times = sorted(t for t, _ in api.sent)
+    peak = max(sum(1 for t in times[i:] if t - times[i] < 1.0) for i in range(len(times))) if times else 0
+    per_chat = defaultdict(list)
+    for t, chat_id in api.sent:
+        per_chat[chat_id].append(t)
+    min_gap = min(
+        (b - a for ts in per_chat.values() for a, b in zip(sorted(ts), sorted(ts)[1:])),
+        default=float("inf")
+    )
+    return elapsed, waits, failed, peak, min_gap
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", type=int, default=120)
+    parser.add_argument("--proactive", type=int, default=120)
+    parser.add_argument("--manual", type=int, default=30)
+    parser.add_argument("--chats", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=80, help="Latenz der Bot API pro Aufruf")
+    parser.add_argument("--flood-rate", type=float, default=0.01, help="Anteil Aufrufe mit 429")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    from src import delivery
+    api = FakeBotAPI(args.latency_ms, args.flood_rate)
+    elapsed, waits, failed, peak, min_gap = asyncio.run(run(delivery, api, args))
+
+    total = args.live + args.proactive + args.manual
+    print(f"\n📮 {total} Nachrichten an {args.chats} Chats in {elapsed:.1f}s, {api.floods}x 429")
+    print(f"{'Spitze pro Sekunde':<26} {peak:>6}  (Limit {delivery.TELEGRAM_GLOBAL_RATE:.0f})")
+    print(f"{'kürzester Abstand im Chat':<26} {min_gap:>6.2f}s (Limit {delivery.TELEGRAM_CHAT_INTERVAL}s)")
+    print(f"{'verloren':<26} {total - len(api.sent):>6}  ({failed} nach allen Retries)")
+    print(f"\n{'Art':<10} {'Wartezeit p50':>14} {'p95':>9}")
+    for kind in ("live", "proactive", "manual"):
+        values = sorted(waits[kind])
+        if values:
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            print(f"{kind:<10} {statistics.median(values):>12.0f}ms {p95:>7.0f}ms")
+
+if __name__ == "__main__":
+    main()
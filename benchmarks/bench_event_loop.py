@@ -0,0 +1,120 @@
+"""
+Benchmark: Event-Loop-Latenz bei vielen gleichzeitigen Usern,
+synchrone DB-Aufrufe (src/db.py) vs. async DB-Layer (src/db_async.py).
+
+Jeder simulierte User durchläuft die DB-Schritte von handle_message
+(add_user, save_message, Verlauf laden, apply_analysis, Antwort speichern).
+Parallel misst ein Ticker, wie stark sich ein 10ms-Sleep verspätet –
+genau diese Verspätung spüren alle anderen Chats.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_event_loop.py --users 1 10 50 --disk-latency-ms 5
+
+--disk-latency-ms emuliert eine langsame Platte (fsync), indem jeder
+Schreibzugriff zusätzlich blockierend schläft. 0 = echte Platte.
+"""
+import argparse
+import asyncio
+import functools
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import db
+
+ANALYSIS = {
+    "facts": {"alter": "29", "wohnort": "Köln", "beruf": "Elektriker"},
+    "meta": {"stimmung": "entspannt"},
+    "contacts": [{"name": "Lisa", "beziehung": "Schwester"}],
+    "lead_signals": ["Plant Eigenheim"],
+}
+
+def slow_writes(latency_s):
+    """Verlangsamt alle Schreibfunktionen in src/db.py um latency_s"""
+    for name in ("add_user", "save_message", "apply_analysis"):
+        fn = getattr(db, name)
+        @functools.wraps(fn)
+        def slow(*args, _fn=fn, **kwargs):
+            time.sleep(latency_s)
+            return _fn(*args, **kwargs)
+        setattr(db, name, slow)
+
+async def user_session_sync(user_id, messages):
+    for i in range(messages):
+        db.add_user(user_id, f"user{user_id}", f"User{user_id}")
+        db.save_message(user_id, "user", f"Nachricht {i}")
+        db.get_chat_history(user_id, limit=50)
+        db.apply_analysis(user_id, ANALYSIS, score_fn=lambda f: 5)
+        db.save_message(user_id, "assistant", f"Antwort {i}")
+        await asyncio.sleep(0)
+
+async def user_session_async(adb, user_id, messages):
+    for i in range(messages):
+        await adb.add_user(user_id, f"user{user_id}", f"User{user_id}")
+        await adb.save_message(user_id, "user", f"Nachricht {i}")
+        await adb.get_chat_history(user_id, limit=50)
+        await adb.apply_analysis(user_id, ANALYSIS, score_fn=lambda f: 5)
+        await adb.save_message(user_id, "assistant", f"Antwort {i}")
+
+async def ticker(lags, stop):
+    """Misst die Verspätung eines 10ms-Sleeps"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - start - 0.01) * 1000)
+
+async def run_mode(mode, n_users, messages):
+    # Erst hier importieren, damit db_async die (ggf. verlangsamten) Funktionen wrappt
+    from src import db_async as adb
+
+    lags = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    if mode == "sync":
+        sessions = [user_session_sync(u, messages) for u in range(1, n_users + 1)]
+    else:
+        sessions = [user_session_async(adb, u, messages) for u in range(1, n_users + 1)]
+    await asyncio.gather(*sessions)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    lags.sort()
+    return {
+        "elapsed": elapsed,
+        "msgs_per_s": n_users * messages / elapsed,
+        "p50": statistics.median(lags),
+        "p99": lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[0],
+        "max": lags[-1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--messages", type=int, default=10, help="Nachrichten pro User")
+    parser.add_argument("--disk-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.disk_latency_ms:
+        slow_writes(args.disk_latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+
+        print(f"\n{'User':>5} {'Modus':<6} {'Msg/s':>8} {'Lag p50':>10} {'Lag p99':>10} {'Lag max':>10}")
+        for n_users in args.users:
+            for mode in ("sync", "async"):
+                r = asyncio.run(run_mode(mode, n_users, args.messages))
+                print(f"{n_users:>5} {mode:<6} {r['msgs_per_s']:>8.1f} "
+                      f"{r['p50']:>8.2f}ms {r['p99']:>8.2f}ms {r['max']:>8.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: Vorfilter src/gate.py auf dem gelabelten Fixture-Set.
+
+benchmarks/fixtures/gate_messages.jsonl enthält echte Chat-Muster mit Label
+"facts" (true = der Analyst hätte daraus etwas extrahieren sollen) und optional
+der vorherigen Bot-Nachricht ("prev").
+
+Kennzahlen:
+- Skip-Rate:        Anteil Nachrichten ohne eigenen Analyst-Aufruf (SKIP + DEFER)
+- Verpasste Fakten: Fakten-Nachrichten mit SKIP (DEFER wird später mitanalysiert)
+- Zurückgestellt:   Fakten-Nachrichten, die erst mit der nächsten Analyse ankommen
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_gate.py [--verbose]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.gate import classify, ANALYZE, DEFER, SKIP
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "gate_messages.jsonl"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES)
+    parser.add_argument("--verbose", action="store_true", help="Fehlentscheidungen ausgeben")
+    args = parser.parse_args()
+
+    samples = [json.loads(line) for line in args.fixtures.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    counts = {ANALYZE: 0, DEFER: 0, SKIP: 0}
+    with_facts = sum(1 for s in samples if s["facts"])
+    missed, deferred_facts, wasted = [], [], []
+
+    start = time.perf_counter()
+    for sample in samples:
+        decision, reason = classify(sample["text"], sample.get("prev"))
+        counts[decision] += 1
+        if sample["facts"] and decision == SKIP:
+            missed.append((sample, reason))
+        elif sample["facts"] and decision == DEFER:
+            deferred_facts.append((sample, reason))
+        elif not sample["facts"] and decision == ANALYZE:
+            wasted.append((sample, reason))
+    per_call_us = (time.perf_counter() - start) / len(samples) * 1e6
+
+    total = len(samples)
+    print(f"\n📋 {total} Nachrichten, davon {with_facts} mit Fakten")
+    print(f"   ANALYZE {counts[ANALYZE]:>3}   DEFER {counts[DEFER]:>3}   SKIP {counts[SKIP]:>3}")
+    print(f"\n{'Skip-Rate (kein eigener Analyst-Call)':<42} {(counts[DEFER] + counts[SKIP]) / total:>6.1%}")
+    print(f"{'Verpasste Fakten (SKIP)':<42} {len(missed) / with_facts:>6.1%}")
+    print(f"{'Fakten erst mit nächster Analyse (DEFER)':<42} {len(deferred_facts) / with_facts:>6.1%}")
+    print(f"{'Unnötige Analysen (ANALYZE ohne Fakten)':<42} {len(wasted) / (total - with_facts):>6.1%}")
+    print(f"{'Zeit pro Klassifikation':<42} {per_call_us:>6.1f}µs")
+
+    if args.verbose:
+        for title, rows in (("Verpasst", missed), ("Zurückgestellt", deferred_facts), ("Unnötig", wasted)):
+            if rows:
+                print(f"\n{title}:")
+                for sample, reason in rows:
+                    print(f"  {sample['text']!r:<50} ({reason})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: Verhalten von src/llm.py unter Last und Störungen.
+
+Startet benchmarks/fake_openai.py im Prozess und feuert pro Szenario
+--calls parallele Texter-Aufrufe ab:
+- healthy:   normale Latenz
+- 429:       Server-Limit unter der Last, Antworten mit Retry-After
+- flaky:     20% 500er
+- timeouts:  10% hängende Requests
+- outage:    alles 503 → Circuit Breaker muss öffnen und schnell ablehnen
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_llm_client.py --calls 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import DEFAULT_CONFIG, start_server
+
+SCENARIOS = {
+    "healthy": {},
+    "429": {"rpm": 60, "retry_after": 1},
+    "flaky": {"error_rate": 0.2},
+    "timeouts": {"hang_rate": 0.1},
+    "outage": {"down": True},
+}
+
+async def run_scenario(llm, server, name, config, calls):
+    server.config.update(config)
+    server.window.clear()
+    llm._breakers.clear()
+    with llm._usage_lock:
+        llm._usage.clear()
+
+    async def one(i):
+        start = time.perf_counter()
+        try:
+            await llm.chat("texter", [{"role": "user", "content": f"Nachricht {i}"}], max_tokens=50)
+            return True, time.perf_counter() - start
+        except llm.LLMUnavailable:
+            return False, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r[1] * 1000 for r in results)
+    usage = llm.get_usage_stats().get("texter", {})
+    breaker = llm.get_breaker_state().get(llm.DEFAULT_MODEL, {})
+    print(f"{name:<9} {sum(ok for ok, _ in results):>5}/{calls:<5} "
+          f"{statistics.median(latencies):>8.0f}ms {latencies[int(len(latencies) * 0.95) - 1]:>8.0f}ms "
+          f"{usage.get('retries', 0):>7} {usage.get('rejected', 0):>8} "
+          f"{breaker.get('state', '-'):>10} {elapsed:>7.1f}s")
+
+    for key in config:
+        server.config[key] = DEFAULT_CONFIG[key]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms)
+
+    # Vor dem Import setzen: src/llm.py liest die Konfiguration beim Import
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+    os.environ.setdefault("LLM_TIMEOUTS", "texter:2")
+    os.environ.setdefault("LLM_BACKOFF_MAX", "5")
+    os.environ.setdefault("LLM_BREAKER_COOLDOWN", "60")
+    from src import llm
+
+    print(f"\n{'Szenario':<9} {'OK':>11} {'p50':>10} {'p95':>10} {'Retries':>7} {'Abgelehnt':>8} {'Breaker':>10} {'Dauer':>8}")
+    for name in args.scenarios:
+        llm.run(run_scenario(llm, server, name, SCENARIOS[name], args.calls))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
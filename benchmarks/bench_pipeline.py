@@ -0,0 +1,115 @@
+"""
+Benchmark: PIPELINE_MODE split (Analyst → Stratege) vs. fused (ein JSON-Aufruf).
+
+Läuft wie bench_reply_latency.py komplett lokal gegen benchmarks/fake_openai.py.
+Der Fake-Server liefert im JSON-Modus ein gültiges kombiniertes Objekt
+(Analyst-Felder + "strategy"), die Latenz wächst mit der Output-Länge
+(--ms-per-token), damit der längere fused-Output fair eingepreist ist.
+
+Szenarien:
+- split:          Analyst + Stratege getrennt (bisheriger Weg)
+- fused:          ein Planner-Aufruf
+- fused-invalid:  Planner liefert ungültiges JSON → Fallback auf split
+
+Kennzahlen pro Nachricht: Antwortlatenz, LLM-Aufrufe, Prompt- und
+Completion-Tokens (aus src.llm.get_usage_stats).
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_pipeline.py --users 10 --messages 5 --latency-ms 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import start_server
+from bench_reply_latency import user_session
+
+PLAN_REPLY = json.dumps({
+    "facts": {"alter": "29", "wohnort": "Köln"},
+    "meta": {"stimmung": "entspannt"},
+    "lead_signals": [],
+    "contacts": [],
+    "confidence": "hoch",
+    "strategy": "[1 NACHRICHT]\nINHALT: Reagiere auf Köln\nAKTION: Frage nach Beruf\nZIEL: Beruf herausfinden"
+}, ensure_ascii=False)
+
+SCENARIOS = {
+    "split": ("split", PLAN_REPLY),
+    "fused": ("fused", PLAN_REPLY),
+    "fused-invalid": ("fused", '{"facts": "kaputt"}'),
+}
+
+async def run_scenario(bot, llm, adb, pipeline_mode, n_users, messages, offset):
+    bot.PIPELINE_MODE = pipeline_mode
+    with llm._usage_lock:
+        llm._usage.clear()
+
+    user_ids = range(offset + 1, offset + n_users + 1)
+    for user_id in user_ids:
+        await adb.add_user(user_id, f"user{user_id}", f"User{user_id}")
+        await adb.toggle_human_mode(user_id)
+
+    latencies = []
+    await asyncio.gather(*(user_session(bot, u, messages, latencies) for u in user_ids))
+    await bot.drain_analyses()
+
+    usage = llm.get_usage_stats()
+    total = n_users * messages
+    return {
+        "p50": statistics.median(latencies),
+        "calls": sum(a["calls"] for a in usage.values()) / total,
+        "prompt": sum(a["prompt_tokens"] for a in usage.values()) / total,
+        "completion": sum(a["completion_tokens"] for a in usage.values()) / total,
+        "planner": usage.get("planner", {}).get("calls", 0),
+        "analyst": usage.get("analyst", {}).get("calls", 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=5, help="Nachrichten pro User")
+    parser.add_argument("--latency-ms", type=float, default=400, help="Basislatenz pro LLM-Aufruf")
+    parser.add_argument("--ms-per-token", type=float, default=10, help="Zusatzlatenz pro Output-Token")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    server, url = start_server(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.latency_ms / 4,
+        ms_per_token=args.ms_per_token,
+        reply="[1 NACHRICHT]\nINHALT: Reagiere auf Köln\nAKTION: Frage nach Beruf"
+    )
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        from src import bot, db_async, llm
+
+        rows = []
+        for i, name in enumerate(args.scenarios):
+            pipeline_mode, json_reply = SCENARIOS[name]
+            server.config["json_reply"] = json_reply
+            r = asyncio.run(run_scenario(bot, llm, db_async, pipeline_mode, args.users, args.messages, offset=i * 10_000))
+            rows.append((name, r))
+
+        print(f"\n{'Szenario':<14} {'Antwort p50':>12} {'Aufrufe':>8} {'Prompt-Tok':>11} {'Output-Tok':>11} {'Planner':>8} {'Analyst':>8}")
+        for name, r in rows:
+            print(f"{name:<14} {r['p50']:>10.0f}ms {r['calls']:>8.1f} {r['prompt']:>11.0f} {r['completion']:>11.0f} "
+                  f"{r['planner']:>8} {r['analyst']:>8}")
+        print("(Aufrufe/Tokens pro Nachricht)")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: End-to-End-Antwortlatenz von handle_message, ANALYSIS_MODE inline
+vs. background.
+
+Läuft komplett lokal: LLM-Aufrufe gehen an benchmarks/fake_openai.py (feste
+Latenz pro Aufruf), die DB liegt in einem Temp-Verzeichnis, Telegram-Update
+und -Context sind minimale Attrappen. Human Mode ist aus, damit nur
+Pipeline-Zeit gemessen wird (keine simulierten Tipp-Pausen).
+
+Gemessen wird die Zeit von handle_message-Start bis die Outbox (src/outbox.py)
+die erste Antwort an den Fake-Bot gesendet hat. Im background-Modus wird danach auf alle Analysen gewartet und
+geprüft, dass Fakten/Score trotzdem gespeichert wurden.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_reply_latency.py --users 10 --messages 5 --latency-ms 400
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import start_server
+
+MESSAGES = [
+    "ich bin 29 und wohne in köln",
+    "arbeite als elektriker bei einer kleinen firma",
+    "meine freundin und ich wollen bald zusammenziehen",
+    "sparen tu ich eigentlich nix, rente ist mir noch egal",
+    "am wochenende spiel ich fußball im verein",
+]
+
+class FakeTelegram:
+    """Attrappe für telegram.Bot: merkt sich pro Chat, wann was gesendet wurde"""
+
+    def __init__(self):
+        self.sent = defaultdict(list)  # chat_id → [(perf_counter, text)]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent[chat_id].append((time.perf_counter(), text))
+
+    async def send_chat_action(self, chat_id, action, **kwargs):
+        pass
+
+    async def wait_sent(self, chat_id, count, timeout=10):
+        """Wartet, bis mindestens count Nachrichten an chat_id raus sind. Returns: bool"""
+        deadline = time.perf_counter() + timeout
+        while len(self.sent[chat_id]) < count:
+            if time.perf_counter() > deadline:
+                return False
+            await asyncio.sleep(0.005)
+        return True
+
+TELEGRAM = FakeTelegram()
+
+def fake_update(user_id, text):
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User{user_id}"),
+        effective_chat=SimpleNamespace(id=user_id),
+        message=SimpleNamespace(text=text)
+    )
+
+async def user_session(bot, user_id, messages, latencies):
+    from src.outbox import start_dispatcher
+    start_dispatcher(TELEGRAM)
+    context = SimpleNamespace(bot=TELEGRAM)
+    for i in range(messages):
+        before = len(TELEGRAM.sent[user_id])
+        start = time.perf_counter()
+        await bot.handle_message(fake_update(user_id, MESSAGES[i % len(MESSAGES)]), context)
+        if await TELEGRAM.wait_sent(user_id, before + 1):
+            latencies.append((TELEGRAM.sent[user_id][before][0] - start) * 1000)
+
+async def run_mode(bot, adb, mode, n_users, messages, offset):
+    bot.ANALYSIS_MODE = mode
+    user_ids = range(offset + 1, offset + n_users + 1)
+    for user_id in user_ids:
+        await adb.add_user(user_id, f"user{user_id}", f"User{user_id}")
+        await adb.toggle_human_mode(user_id)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(user_session(bot, u, messages, latencies) for u in user_ids))
+    replies_done = time.perf_counter() - start
+    await bot.drain_analyses()
+    all_done = time.perf_counter() - start
+
+    scored = 0
+    for user_id in user_ids:
+        facts = await adb.get_user_facts(user_id)
+        scored += 'lead_score' in facts.get('score', {})
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0],
+        "replies_done": replies_done,
+        "all_done": all_done,
+        "scored": scored
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=5, help="Nachrichten pro User")
+    parser.add_argument("--latency-ms", type=float, default=400, help="Latenz pro LLM-Aufruf")
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        from src import bot, db_async
+
+        print(f"\n{'Modus':<11} {'Antwort p50':>12} {'Antwort p95':>12} {'Antworten':>10} {'inkl. Analyse':>14} {'Score':>7}")
+        for i, mode in enumerate(("inline", "background")):
+            r = asyncio.run(run_mode(bot, db_async, mode, args.users, args.messages, offset=i * 10_000))
+            print(f"{mode:<11} {r['p50']:>10.0f}ms {r['p95']:>10.0f}ms {r['replies_done']:>9.1f}s "
+                  f"{r['all_done']:>13.1f}s {r['scored']:>3}/{args.users}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: Langzeit-Recall über src/retrieval.py.
+
+Legt --users User mit je --messages Nachrichten Alltags-Chat an und versteckt
+pro User einige Aussagen weit vor dem Kontextfenster ("mein hund heißt
+bello", ...). Danach wird der Großteil archiviert. Gefragt wird mit einer
+späteren Nachricht, die sich darauf bezieht.
+
+Kennzahlen:
+- Recall@k:   Anteil der Fragen, bei denen die versteckte Aussage abgerufen wird
+- Tokens:     Prompt-Zuwachs durch Retrieval vs. kompletter Verlauf
+- Latenz:     Dauer pro recall() (FTS5-Abfrage + Budget)
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_retrieval.py --users 20 --messages 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FILLER = [
+    "haha ja voll", "war heute echt lang", "keine ahnung ehrlich gesagt", "jo passt schon",
+    "hab grad gegessen", "bin bisschen müde", "was machst du so heute abend", "ne eher nicht",
+    "das wetter ist echt mies", "muss gleich noch einkaufen", "hab die serie fertig geschaut",
+    "morgen wird stressig", "klingt gut", "kenn ich", "und bei dir so", "war ganz okay eigentlich",
+]
+
+# (versteckte Aussage, spätere Frage darauf)
+PLANTED = [
+    ("mein hund heißt bello und ist ein labrador", "bello hat heute wieder den ganzen garten umgegraben"),
+    ("ich hab nen bausparvertrag bei der sparkasse", "die sparkasse hat mir nen brief geschickt wegen dem vertrag"),
+    ("meine schwester heiratet im august in hamburg", "bin nervös wegen der hochzeit meiner schwester"),
+    ("ich spiel seit zehn jahren gitarre in einer band", "heute probe mit der band, gitarre muss neu besaitet werden"),
+]
+
+def seed_user(db, user_id, n_messages, rng):
+    """Füllt einen User und versteckt die PLANTED-Aussagen in der ersten Hälfte"""
+    db.add_user(user_id, f"user{user_id}", f"User{user_id}")
+    positions = sorted(rng.sample(range(n_messages // 2), len(PLANTED)))
+    planted_ids = {}
+    conn = db.get_connection()
+    for i in range(n_messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        text = rng.choice(FILLER)
+        if i in positions:
+            role, text = "user", PLANTED[positions.index(i)][0]
+        db.save_message(user_id, role, text)
+        if i in positions:
+            planted_ids[positions.index(i)] = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return planted_ids
+
+async def run_queries(db, retrieval, users, planted):
+    found, latencies, tokens, full_tokens = 0, [], [], []
+    for user_id in users:
+        history = db.get_chat_history(user_id, limit=60)
+        before_id = history[0]['id']
+        full = db.get_full_chat(user_id)
+        for index, (_, question) in enumerate(PLANTED):
+            start = time.perf_counter()
+            recalled = await retrieval.recall(user_id, question, before_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += any(m['id'] == planted[user_id][index] for m in recalled)
+            tokens.append(retrieval.estimate_tokens(retrieval.format_recalled(recalled) or ""))
+            full_tokens.append(sum(retrieval.estimate_tokens(m['content']) + 4 for m in full))
+    return found, latencies, tokens, full_tokens
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=2000, help="Nachrichten pro User")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        from src import retrieval
+
+        start = time.perf_counter()
+        users = list(range(1, args.users + 1))
+        planted = {u: seed_user(db, u, args.messages, rng) for u in users}
+        seeded = time.perf_counter() - start
+
+        archived = 0
+        while True:
+            moved = db.archive_messages(max_age_days=0)
+            if not moved:
+                break
+            archived += moved
+
+        found, latencies, tokens, full_tokens = asyncio.run(run_queries(db, retrieval, users, planted))
+        total = len(latencies)
+        latencies.sort()
+
+        print(f"\n📋 {args.users} User × {args.messages} Nachrichten ({seeded:.1f}s inkl. Index), {archived} archiviert")
+        print(f"{'Recall@' + str(retrieval.RETRIEVAL_TOP_K):<28} {found / total:>8.1%}  ({found}/{total})")
+        print(f"{'Latenz p50 / p95':<28} {statistics.median(latencies):>7.2f}ms / {latencies[int(total * 0.95) - 1]:.2f}ms")
+        print(f"{'Tokens durch Retrieval':<28} {statistics.mean(tokens):>8.0f}  (Budget {retrieval.RETRIEVAL_TOKEN_BUDGET})")
+        print(f"{'Tokens kompletter Verlauf':<28} {statistics.mean(full_tokens):>8.0f}")
+        db.close_connection()
+
+if __name__ == "__main__":
+    main()
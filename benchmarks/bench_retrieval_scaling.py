@@ -0,0 +1,119 @@
+"""
+Benchmark: Retrieval-Suche eines Users, während die Daten anderer User wachsen.
+
+Ein Ziel-User mit --messages Nachrichten (inkl. der versteckten Aussagen aus
+bench_retrieval.py) bleibt gleich; in Stufen (--steps, Anzahl anderer User)
+kommen User mit je --other-messages Nachrichten hinzu; ein Anteil davon
+(--topic-share) dreht sich um dieselben Themen, die Suchwörter kommen also
+auch bei allen anderen vor. Pro Stufe werden die Fragen aus PLANTED gestellt:
+- pro User:        search_user_messages (Wörter mit User-Präfix, Migration 13)
+- global + Filter: die frühere Form – MATCH über alle, dann user_id = ?
+
+Die Latenz pro User soll flach bleiben, die globale wächst mit der DB.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_retrieval_scaling.py --steps 0,50,200,800
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_retrieval import FILLER, PLANTED
+
+def global_match(terms):
+    """Frühere Retrieval-Query: Terme gequotet, als Präfix, mit OR"""
+    return " OR ".join(f'"{term}"*' for term in terms)
+
+GLOBAL_QUERY = """
+    SELECT f.rowid AS id, f.role, f.content, m.timestamp, bm25(messages_fts, 1.0, 0.0) AS rank
+    FROM messages_fts f
+    LEFT JOIN messages m ON m.id = f.rowid
+    WHERE messages_fts MATCH 'content : (' || ? || ')' AND f.user_id = ? AND f.rowid < ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+TOPICS = [text for pair in PLANTED for text in pair]
+
+def seed_users(db, user_ids, n_messages, rng, topic_share=0.0):
+    """
+    Legt User an: Alltags-Chat, die PLANTED-Aussagen an zufälligen Stellen und
+    topic_share Nachrichten zu denselben Themen
+    """
+    conn = db.get_connection()
+    now = datetime.now()
+    for user_id in user_ids:
+        db.add_user(user_id, f"user{user_id}", f"User{user_id}")
+        positions = set(rng.sample(range(n_messages), len(PLANTED)))
+        rows = []
+        for i in range(n_messages):
+            if i in positions:
+                rows.append((user_id, 'user', rng.choice(PLANTED)[0], now))
+            else:
+                text = rng.choice(TOPICS) if rng.random() < topic_share else rng.choice(FILLER)
+                rows.append((user_id, 'user' if i % 2 == 0 else 'assistant', text, now))
+        with conn:
+            conn.executemany("INSERT INTO messages (user_id, role, content, timestamp) VALUES (?, ?, ?, ?)", rows)
+
+def measure(fn, repeats):
+    """Median in ms über alle PLANTED-Fragen × repeats"""
+    times = []
+    for _ in range(repeats):
+        for _, question in PLANTED:
+            start = time.perf_counter()
+            hits = fn(question)
+            times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), hits
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000, help="Nachrichten des Ziel-Users")
+    parser.add_argument("--other-messages", type=int, default=1000, help="Nachrichten pro anderem User")
+    parser.add_argument("--topic-share", type=float, default=0.2, help="Anteil Themen-Nachrichten bei anderen Usern")
+    parser.add_argument("--steps", default="0,50,200,800", help="Anzahl anderer User pro Stufe")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    steps = [int(step) for step in args.steps.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db, retrieval
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        seed_users(db, [1], args.messages, rng)
+        conn = db.get_connection()
+        before_id = conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] + 1
+        limit = retrieval.RETRIEVAL_TOP_K * 3
+
+        def per_user(question):
+            return db.search_user_messages(1, retrieval.query_terms(question), before_id, limit)
+
+        def global_filter(question):
+            return conn.execute(GLOBAL_QUERY, (global_match(retrieval.query_terms(question)), 1, before_id, limit)).fetchall()
+
+        print(f"\n🔎 Ziel-User: {args.messages} Nachrichten, andere User je {args.other_messages} "
+              f"({args.topic_share:.0%} zu denselben Themen)")
+        print(f"{'andere User':>12} {'Nachrichten':>12} {'pro User':>10} {'global + Filter':>16} {'Treffer gleich':>15}")
+        others = 0
+        for step in steps:
+            if step > others:
+                seed_users(db, range(others + 2, step + 2), args.other_messages, rng, args.topic_share)
+                others = step
+            total = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            scoped_ms, scoped = measure(per_user, args.repeats)
+            global_ms, unscoped = measure(global_filter, args.repeats)
+            same = [hit['id'] for hit in scoped] == [row['id'] for row in unscoped]
+            print(f"{others:>12} {total:>12} {scoped_ms:>8.2f}ms {global_ms:>14.2f}ms {'ja' if same else 'nein':>15}")
+        db.close_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: Abstand zwischen erster und zweiter Nachricht bei [2 NACHRICHTEN].
+
+Der Fake-Server antwortet auf jeden Text-Aufruf mit "[2 NACHRICHTEN] ...",
+damit der Stratege immer zwei Nachrichten plant. Die geskripteten Pausen
+(2-5s Pause, 2-4s Tippen) werden auf ihren Minimalwert fixiert, damit
+der Sollwert feststeht: Pause + Tippen = 4s.
+
+Gemessen wird die Zeit zwischen dem Senden der ersten und der zweiten
+Antwort durch die Outbox (src/outbox.py). Die zweite Nachricht entsteht,
+während die erste dort noch wartet, und wird relativ zu deren Fälligkeit
+geplant – die LLM-Latenz darf also nicht im Abstand auftauchen.
+
+Aufruf (aus dem Repo-Root):
+    python benchmarks/bench_second_message.py --users 5 --latency-ms 1500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_openai import start_server
+from bench_reply_latency import fake_update, TELEGRAM
+
+SCRIPTED_GAP = 2 + 2  # Minimum von Pause (2-5s) + Tippen (2-4s)
+
+async def run(bot, adb, n_users):
+    from src.outbox import start_dispatcher
+    start_dispatcher(TELEGRAM)
+    user_ids = range(1, n_users + 1)
+    for user_id in user_ids:
+        await adb.add_user(user_id, f"user{user_id}", f"User{user_id}")
+        await adb.toggle_human_mode(user_id)
+
+    gaps = []
+
+    async def one(user_id):
+        context = SimpleNamespace(bot=TELEGRAM)
+        await bot.handle_message(fake_update(user_id, "ich bin 29 und wohne in köln"), context)
+        if await TELEGRAM.wait_sent(user_id, 2, timeout=30):
+            (first, _), (second, _) = TELEGRAM.sent[user_id][:2]
+            gaps.append(second - first)
+
+    await asyncio.gather(*(one(u) for u in user_ids))
+    await bot.drain_analyses()
+    return gaps
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=1500, help="Latenz pro LLM-Aufruf")
+    args = parser.parse_args()
+
+    server, url = start_server(latency_ms=args.latency_ms, jitter_ms=0, reply="[2 NACHRICHTEN] jo passt")
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_BACKEND"] = "off"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from src import db
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        from src import bot, db_async
+        bot.random.randint = lambda a, b: a
+
+        gaps = asyncio.run(run(bot, db_async, args.users))
+        p50 = statistics.median(gaps)
+        print(f"\n{'Abstand p50':>12} {'max':>8} {'über Soll':>10} {'2. gesendet':>12}")
+        print(f"{p50:>11.2f}s {max(gaps):>7.2f}s {p50 - SCRIPTED_GAP:>9.2f}s {len(gaps):>6}/{args.users}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Lokaler Fake-Server mit OpenAI-kompatiblem /v1/chat/completions.
+
+Simuliert Latenz, 429 mit Retry-After, 5xx-Fehler und hängende Requests,
+damit sich src/llm.py (Timeouts, Retries, Rate Limits, Circuit Breaker)
+ohne echten API-Key und ohne Kosten belasten lässt.
+
+Eigenständig (aus dem Repo-Root):
+    python benchmarks/fake_openai.py --port 8099 --latency-ms 300 --error-rate 0.1
+
+Dann den Bot mit OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake starten.
+Andere Benchmarks nutzen start_server() und steuern das Verhalten über server.config.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONFIG = {
+    "latency_ms": 300,       # Basislatenz pro Antwort
+    "jitter_ms": 100,        # zufälliger Aufschlag
+    "error_rate": 0.0,       # Anteil 500er
+    "rpm": 0,                # > 0: 429 mit Retry-After über diesem Limit
+    "retry_after": 1,        # Sekunden im Retry-After-Header
+    "hang_rate": 0.0,        # Anteil Requests, die nie antworten (Timeout-Test)
+    "down": False,           # alles 503 (Ausfall, Circuit-Breaker-Test)
+    "fail_models": (),       # diese Modelle liefern immer 503 (Fallback-Test)
+    "script": (),            # Statuscodes für die nächsten Requests, je einer pro Request (z.B. (429, 500))
+    "cached_ratio": 0.5,     # Anteil Prompt-Tokens, die als gecacht gemeldet werden
+    "reply": "jo passt",     # Antworttext
+    "json_reply": "{}",      # Antworttext im JSON-Modus (response_format=json_object)
+    "ms_per_token": 0        # Zusatzlatenz pro Completion-Token (lange Outputs dauern länger)
+}
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    _active = False
+
+    def log_message(self, format, *args):
+        pass
+
+    def _leave(self):
+        """Request zählt nicht mehr als aktiv – vor dem Antworten, sonst zählt der nächste schon mit"""
+        if self._active:
+            self._active = False
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _send(self, status, body, headers=None):
+        self._leave()
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _rate_limited(self, config):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            server.window = [t for t in server.window if now - t < 60]
+            if len(server.window) >= config["rpm"]:
+                return True
+            server.window.append(now)
+            return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+        with self.server.lock:
+            self.server.requests += 1
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": "not found"}})
+        with self.server.lock:
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+            self._active = True
+            status = None
+            if config["script"]:
+                status, config["script"] = config["script"][0], config["script"][1:]
+        try:
+            self._complete(request, config, status)
+        finally:
+            self._leave()
+
+    def _complete(self, request, config, status):
+        if status == 429:
+            return self._send(
+                429,
+                {"error": {"message": "rate limit", "type": "rate_limit_exceeded"}},
+                {"Retry-After": str(config["retry_after"])}
+            )
+        if status:
+            kind = "server_error" if status >= 500 else "invalid_request_error"
+            return self._send(status, {"error": {"message": f"scripted {status}", "type": kind}})
+        if config["down"] or request.get("model") in config["fail_models"]:
+            return self._send(503, {"error": {"message": "service unavailable", "type": "server_error"}})
+        if config["rpm"] and self._rate_limited(config):
+            return self._send(
+                429,
+                {"error": {"message": "rate limit", "type": "rate_limit_exceeded"}},
+                {"Retry-After": str(config["retry_after"])}
+            )
+        if random.random() < config["hang_rate"]:
+            time.sleep(3600)
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 4 + 1
+        json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+        content = config["json_reply"] if json_mode else config["reply"]
+
+        latency_ms = config["latency_ms"] + config["ms_per_token"] * (len(content) // 4 + 1)
+        time.sleep((latency_ms + random.uniform(0, config["jitter_ms"])) / 1000)
+        if random.random() < config["error_rate"]:
+            return self._send(500, {"error": {"message": "internal error", "type": "server_error"}})
+
+        self._send(200, {
+            "id": f"chatcmpl-fake-{self.server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4 + 1,
+                "total_tokens": prompt_tokens + len(content) // 4 + 1,
+                "prompt_tokens_details": {"cached_tokens": int(prompt_tokens * config["cached_ratio"])}
+            }
+        })
+
+def start_server(port=0, **config):
+    """Startet den Fake-Server in einem Hintergrund-Thread. Returns: (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.config = {**DEFAULT_CONFIG, **config}
+    server.lock = threading.Lock()
+    server.window = []
+    server.requests = 0
+    server.active = 0        # gerade in Bearbeitung
+    server.peak = 0          # Maximum von active (Concurrency-Limits prüfen)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_CONFIG["latency_ms"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_server(
+        args.port,
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        rpm=args.rpm,
+        hang_rate=args.hang_rate
+    )
+    print(f"🧪 Fake OpenAI läuft auf {url} (Strg+C zum Beenden)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -2,8 +2,13 @@ import os
 import logging
 from dotenv import load_dotenv
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
-from src.bot import start_command, handle_message, error_handler, set_global_token
+from src.bot import (
+    start_command, handle_message, error_handler, 
+    start_background_jobs, stop_background_jobs
+)
 from src.db import init_db
+from src.updates import UserOrderedUpdateProcessor, BOT_CONCURRENCY
+from src.delivery import TELEGRAM_POOL_SIZE
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -26,11 +31,18 @@ if __name__ == '__main__':
     init_db()
     print("✅ Datenbank bereit\n")
     
-    # Token für proaktives Senden setzen
-    set_global_token(TOKEN)
-    
     print("🚀 Starte Bot...")
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        # Ein Keep-Alive-Pool für alle ausgehenden Nachrichten (src/delivery.py)
+        .connection_pool_size(TELEGRAM_POOL_SIZE)
+        # Verschiedene User parallel, Nachrichten eines Users in Reihenfolge
+        .concurrent_updates(UserOrderedUpdateProcessor(BOT_CONCURRENCY))
+        .post_init(start_background_jobs)
+        .post_shutdown(stop_background_jobs)
+        .build()
+    )
     
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
@@ -0,0 +1,176 @@
+"""
+Konfiguration pro Agent: Modell, Limits, Timeout, Fallback-Kette und Routing.
+
+Quellen (spätere überschreiben frühere):
+1. BASE unten (gilt für alle Agenten)
+2. TOML-Datei AGENT_CONFIG_PATH (optional), Abschnitt [defaults]
+3. DEFAULTS unten pro Agent (die bisher in src/ai.py fest verdrahteten Werte) –
+   ein globales [defaults] ändert also nicht die Werte, die ein Agent im Code
+   selbst setzt (z.B. max_tokens des Texters); dafür [<agent>] verwenden
+4. TOML-Datei, Abschnitt [<agent>]
+5. Env AGENT_<AGENT>_<FELD>, z.B. AGENT_STRATEGIST_MODEL=gpt-4.1-nano
+
+Beispiel agents.toml:
+
+    [defaults]
+    fallback = ["gpt-4o-mini"]
+
+    [strategist]
+    model = "gpt-4.1-mini"
+    max_tokens = 250
+    small_model = "gpt-4.1-nano"   # Routing-Ziel
+    small_under_tokens = 800       # kurzer Prompt → kleines Modell
+    p95_budget_ms = 4000           # p95 des Hauptmodells zu hoch → kleines Modell
+
+    [texter.params]
+    presence_penalty = 0.6
+
+Die Datei wird per mtime überwacht (höchstens alle AGENT_CONFIG_CHECK
+Sekunden ein stat) und bei Änderung ohne Neustart neu geladen. Eine kaputte
+Datei wird geloggt, die letzte gültige Konfiguration bleibt aktiv. Die
+effektive Konfiguration wird pro Agent bis zum nächsten Neuladen gecacht;
+ungültige Env-Werte werden beim Laden geloggt und ignoriert.
+"""
+import os
+import threading
+import time
+import tomllib
+
+AGENT_CONFIG_PATH = os.getenv("AGENT_CONFIG_PATH", "agents.toml")
+AGENT_CONFIG_CHECK = float(os.getenv("AGENT_CONFIG_CHECK", "5"))  # Sekunden zwischen mtime-Prüfungen
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_TIMEOUTS = os.getenv("LLM_TIMEOUTS", "texter:15,proactive:15,analyst:25,scorer:25,planner:25")
+
+def _parse_timeouts(spec):
+    """'texter:15,analyst:25' → {'texter': 15.0, 'analyst': 25.0}"""
+    timeouts = {}
+    for item in spec.split(","):
+        name, _, seconds = item.strip().partition(":")
+        if name and seconds:
+            timeouts[name] = float(seconds)
+    return timeouts
+
+AGENT_TIMEOUTS = _parse_timeouts(LLM_TIMEOUTS)
+
+# ==================== DEFAULTS ====================
+
+BASE = {
+    "model": "gpt-4o-mini",
+    "fallback": [],
+    "max_tokens": None,
+    "temperature": None,
+    "timeout": LLM_TIMEOUT,
+    "small_model": None,
+    "small_under_tokens": 0,
+    "p95_budget_ms": 0,
+    "params": {}
+}
+
+_TEXTER = {
+    "max_tokens": 150,
+    "temperature": 0.95,
+    "params": {"presence_penalty": 0.7, "frequency_penalty": 0.4}
+}
+
+DEFAULTS = {
+    "analyst": {"temperature": 0.3},
+    "strategist": {"max_tokens": 300, "temperature": 0.7},
+    "planner": {"max_tokens": 600, "temperature": 0.5},
+    "texter": _TEXTER,
+    "proactive": _TEXTER,
+    "summarizer": {"max_tokens": 250, "temperature": 0.3},
+    "scorer": {"temperature": 0.3}
+}
+
+# Env-Overrides: Feld → Parser
+_ENV_FIELDS = {
+    "model": str,
+    "fallback": lambda value: [m.strip() for m in value.split(",") if m.strip()],
+    "max_tokens": int,
+    "temperature": float,
+    "timeout": float,
+    "small_model": str,
+    "small_under_tokens": int,
+    "p95_budget_ms": float
+}
+
+# ==================== LADEN ====================
+
+_file = {"mtime": None, "data": {}, "checked": 0.0}
+_resolved = {}  # Agent → effektive Konfiguration, geleert bei jedem Neuladen
+_lock = threading.Lock()
+
+def _read_file():
+    """Lädt die TOML-Datei neu, wenn sich die mtime geändert hat"""
+    try:
+        mtime = os.stat(AGENT_CONFIG_PATH).st_mtime
+    except FileNotFoundError:
+        if _file["mtime"] is not None or _file["data"]:
+            _resolved.clear()
+        _file["mtime"], _file["data"] = None, {}
+        return
+    if mtime == _file["mtime"]:
+        return
+    try:
+        with open(AGENT_CONFIG_PATH, "rb") as f:
+            _file["data"] = tomllib.load(f)
+        _resolved.clear()
+        print(f"⚙️  Agent-Konfiguration geladen: {AGENT_CONFIG_PATH}")
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        print(f"❌ Agent-Konfiguration ungültig, alte bleibt aktiv: {e}")
+    _file["mtime"] = mtime
+
+def _merge(config, override):
+    for key, value in (override or {}).items():
+        if key == "params":
+            config["params"] = {**config["params"], **value}
+        elif key in BASE:
+            config[key] = value
+    return config
+
+def _env_overrides(agent):
+    """Geparste AGENT_<AGENT>_<FELD>-Werte; ungültige werden geloggt und ignoriert"""
+    prefix = f"AGENT_{agent.upper()}_"
+    overrides = {}
+    for field, parse in _ENV_FIELDS.items():
+        name = prefix + field.upper()
+        value = os.environ.get(name)
+        if not value:
+            continue
+        try:
+            overrides[field] = parse(value)
+        except ValueError:
+            print(f"⚠️  {name}={value!r} ungültig, wird ignoriert")
+    return overrides
+
+def _resolve(agent, data):
+    config = {**BASE, "params": dict(BASE["params"])}
+    config["timeout"] = AGENT_TIMEOUTS.get(agent, LLM_TIMEOUT)
+    _merge(config, data.get("defaults"))
+    _merge(config, DEFAULTS.get(agent))
+    _merge(config, data.get(agent))
+    config.update(_env_overrides(agent))
+    return config
+
+def get_agent_config(agent):
+    """Effektive Konfiguration eines Agenten (Kopie, darf verändert werden)"""
+    with _lock:
+        now = time.monotonic()
+        if now - _file["checked"] >= AGENT_CONFIG_CHECK:
+            _file["checked"] = now
+            _read_file()
+        config = _resolved.get(agent)
+        if config is None:
+            config = _resolved[agent] = _resolve(agent, _file["data"])
+
+    return {**config, "params": dict(config["params"]), "fallback": list(config["fallback"])}
+
+def request_params(config):
+    """API-Parameter (max_tokens, temperature, params) aus einer Agent-Konfiguration"""
+    params = dict(config["params"])
+    if config["max_tokens"] is not None:
+        params["max_tokens"] = config["max_tokens"]
+    if config["temperature"] is not None:
+        params["temperature"] = config["temperature"]
+    return params
@@ -1,48 +1,60 @@
 import asyncio
+import os
 import random
 import re
 import json
 from datetime import datetime, timedelta
-from telegram import Update, constants, Bot
+from telegram import Update
 from telegram.ext import ContextTypes
 from src.ai import (
     get_chatgpt_response, 
     extract_facts_from_text, 
     get_proactive_message, 
-    generate_sales_move
+    generate_sales_move,
+    plan_turn
 )
-from src.db import (
+from src.db import get_cache_stats
+from src.llm import get_usage_stats, get_breaker_state
+from src.llm_cache import get_llm_cache_stats
+from src.db_async import (
     add_user, save_message, get_chat_history, is_user_active, 
-    add_fact, get_fact_value, is_human_mode_on, get_user, get_user_facts,
-    add_contact, add_lead_signal
+    get_fact_value, is_human_mode_on, get_user, get_user_facts,
+    apply_analysis, archive_messages
 )
+from src.context import build_context, CONTEXT_FETCH_LIMIT
+from src.retrieval import recall, format_recalled, get_retrieval_stats
+from src.updates import (
+    get_update_stats, current_arrival, wait_unless_newer, hand_over, merge_burst,
+    BOT_DEBOUNCE_SECONDS
+)
+from src.outbox import schedule_reply, cancel_pending_replies, start_dispatcher, get_outbox_stats
+from src.delivery import send_message, get_delivery_stats
+from src.gate import gate_message, get_gate_stats, ANALYZE
 
 # Globale Variablen
-GLOBAL_BOT_TOKEN = None
 TIME_OFFSET = 1  # Zeitverschiebung (falls nötig)
-
-def set_global_token(token):
-    """Setzt das Bot-Token für proaktive Nachrichten"""
-    global GLOBAL_BOT_TOKEN
-    GLOBAL_BOT_TOKEN = token
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "300"))  # Sekunden zwischen Archiv-Läufen
+METRICS_INTERVAL = int(os.getenv("METRICS_INTERVAL", "600"))  # Sekunden zwischen Metrik-Logs
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "inline")  # inline | background (Phase 1 neben der Antwort)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "split")  # split | fused (Analyst + Stratege in einem Aufruf)
 
 def get_current_time():
     """Gibt die aktuelle Zeit mit Offset zurück"""
     return datetime.now() + timedelta(hours=TIME_OFFSET)
 
-def is_in_quiet_hours(user_id, q_start, q_end):
+def is_in_quiet_hours(user_id, q_start, q_end, at=None):
     """
-    Prüft ob User in Nachtruhe ist.
+    Prüft ob User in Nachtruhe ist (at: Zeitpunkt statt jetzt, z.B. geplanter Versand).
     Fügt zufällige Varianz hinzu für natürlicheres Verhalten.
     """
-    now = get_current_time()
+    now = get_current_time() if at is None else at + timedelta(hours=TIME_OFFSET)
     current_minutes = now.hour * 60 + now.minute
     
-    # Tägliche Zufallsvariation (konsistent pro Tag)
-    seed_val = now.toordinal() + user_id
-    random.seed(seed_val)
-    offset_start = random.randint(-15, 15)
-    offset_end = random.randint(-15, 15)
+    # Tägliche Zufallsvariation (konsistent pro Tag) - eigener Generator,
+    # damit das globale random (Human Delay) nicht jedes Mal neu geseedet wird
+    rng = random.Random(now.toordinal() + user_id)
+    offset_start = rng.randint(-15, 15)
+    offset_end = rng.randint(-15, 15)
     
     start_m = (q_start * 60 + offset_start) % 1440
     end_m = (q_end * 60 + offset_end) % 1440
@@ -159,53 +171,47 @@ def calculate_lead_score(facts_dict):
     
     return int(final_score)
 
-async def trigger_ai_message(user_id):
+async def trigger_ai_message(user_id, at=None):
     """
     Löst eine proaktive KI-Nachricht aus.
-    Wird vom Dashboard über den ✨-Button aufgerufen.
+    Wird vom Dashboard über den ✨-Button und von Kampagnen (src/campaign.py,
+    at = geplanter Versand) aufgerufen – geplant wird nur in der Outbox,
+    senden tut der Bot-Prozess.
     """
-    if not GLOBAL_BOT_TOKEN:
-        print("❌ Kein Bot-Token gesetzt!")
-        return False
-    
     try:
-        history = get_chat_history(user_id, limit=20)
-        clean = [{"role": m["role"], "content": m["content"]} for m in history]
+        history = await get_chat_history(user_id, limit=CONTEXT_FETCH_LIMIT)
+        # Läuft auch unter asyncio.run (Dashboard, Kampagnen-CLI) → kein Hintergrund-Refresh
+        ctx = await build_context(user_id, history, refresh_summary=False)
         
-        ai_text = await get_proactive_message(clean)
+        ai_text = await get_proactive_message(ctx['window'], summary=ctx['summary'])
         
         if ai_text:
-            bot = Bot(token=GLOBAL_BOT_TOKEN)
-            await bot.send_message(chat_id=user_id, text=ai_text)
-            save_message(user_id, "assistant", ai_text)
-            print(f"✅ Proaktive Nachricht an {user_id} gesendet")
+            await schedule_reply(user_id, user_id, ai_text, after=at, kind="proactive")
+            print(f"✅ Proaktive Nachricht an {user_id} geplant")
             return True
     except Exception as e:
         print(f"❌ Fehler bei proaktiver Nachricht: {e}")
     
     return False
 
-async def simulate_human_delay(user_id, context, chat_id, ai_response_text):
+async def plan_human_delay(user_id, ai_response_text):
     """
-    Simuliert menschliches Antwortverhalten mit:
+    Plant menschliches Antwortverhalten mit:
     - Realistischen Verzögerungen
     - Typing-Anzeige
     - Kontextabhängigem Timing
+    Gewartet wird nicht hier, sondern über die Outbox (src/outbox.py).
+    Returns: (delay_seconds, typing_seconds), (0, 0) ohne Human Mode
     """
-    if not is_human_mode_on(user_id):
-        return
+    if not await is_human_mode_on(user_id):
+        return 0, 0
     
-    now = get_current_time()
-    history = get_chat_history(user_id, limit=2)
+    history = await get_chat_history(user_id, limit=2)
     
-    # Prüfe ob Gespräch "im Flow" ist
+    # Prüfe ob Gespräch "im Flow" ist (timestamp ist bereits ein datetime)
     last_msg_time = None
     if len(history) >= 2:
-        try:
-            time_str = str(history[-2]['timestamp']).split('.')[0]
-            last_msg_time = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            last_msg_time = now
+        last_msg_time = history[-2]['timestamp']
     
     in_flow = False
     if last_msg_time:
@@ -219,33 +225,181 @@ async def simulate_human_delay(user_id, context, chat_id, ai_response_text):
     else:
         delay_seconds = random.randint(15, 60)  # Gemütliche Antwort
     
-    print(f"⏳ Warte {delay_seconds}s vor Antwort...")
-    
-    if delay_seconds > 0:
-        await asyncio.sleep(delay_seconds)
-    
     # Typing-Simulation
     typing_seconds = min(12, 1.5 + (len(ai_response_text) * 0.05))
     
-    await context.bot.send_chat_action(
-        chat_id=chat_id, 
-        action=constants.ChatAction.TYPING
-    )
+    print(f"⏳ Antwort in {delay_seconds}s, dann ⌨️  {typing_seconds:.1f}s tippen")
+    return delay_seconds, typing_seconds
+
+# ==================== HINTERGRUND-JOBS ====================
+
+async def archive_loop():
+    """
+    Archiviert alte Nachrichten inkrementell im Hintergrund.
+    Kleine Batches, damit der DB-Writer für Live-Nachrichten frei bleibt.
+    """
+    while True:
+        try:
+            moved = await archive_messages()
+            if moved:
+                print(f"🗄️  {moved} Nachrichten archiviert")
+                await asyncio.sleep(1)  # Rückstand zügig, aber nicht am Stück abbauen
+                continue
+        except Exception as e:
+            print(f"❌ Archiv-Fehler: {e}")
+        
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+async def metrics_loop():
+    """Loggt regelmäßig die Laufzeit-Kennzahlen des Bot-Prozesses"""
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL)
+        stats = get_cache_stats()
+        print(f"📈 Profil-Cache: {stats['hits']} Hits / {stats['misses']} Misses "
+              f"({stats['hit_rate']:.0%}), {stats['size']} Einträge")
+        for agent, usage in get_usage_stats().items():
+            print(f"📈 LLM {agent}: {usage['calls']} Calls, {usage['cached_ratio']:.0%} Prompt-Tokens gecacht, "
+                  f"Ø {usage['avg_latency_cached_ms']}ms (Cache) / {usage['avg_latency_uncached_ms']}ms (ohne), "
+                  f"p95 {usage['p95_latency_ms']}ms, {usage['routed']}x geroutet, {usage['fallbacks']}x Fallback")
+        for agent, cache in get_llm_cache_stats()['agents'].items():
+            print(f"📈 LLM-Cache {agent}: {cache['hits']} Hits / {cache['misses']} Misses ({cache['hit_rate']:.0%})")
+        updates = get_update_stats()
+        print(f"📈 Updates: {updates['processed']} verarbeitet, {updates['active']} aktiv, "
+              f"{updates['waiting_user']} warten auf eigenen User, {updates['waiting_slot']} auf freien Slot, "
+              f"{updates['coalesced']} zusammengefasst")
+        outbox = await get_outbox_stats()
+        print(f"📈 Outbox: {outbox['pending']} geplant, {outbox['sent']} gesendet, {outbox['retried']} Retries, "
+              f"{outbox['failed']} fehlgeschlagen, {outbox['expired']} verfallen, {outbox['superseded']} neu geplant, "
+              f"Verspätung p50 {outbox['late_p50_ms']}ms / p95 {outbox['late_p95_ms']}ms")
+        for kind, delivery in get_delivery_stats().items():
+            print(f"📈 Versand {kind}: {delivery['sent']} gesendet, {delivery['failed']} fehlgeschlagen, "
+                  f"{delivery['retry_after']}x RetryAfter, p50 {delivery['p50_ms']}ms / p95 {delivery['p95_ms']}ms")
+        retrieval = get_retrieval_stats()
+        print(f"📈 Retrieval: {retrieval['queries']} Abfragen, {retrieval['hit_rate']:.0%} mit Treffern, "
+              f"Ø {retrieval['avg_recalled']} Nachrichten in {retrieval['avg_ms']}ms")
+        gate = get_gate_stats()
+        print(f"📈 Vorfilter: {gate['analyst_skip_rate']:.0%} ohne Analyst-Call "
+              f"({gate['skip']} übersprungen, {gate['defer']} zurückgestellt)")
+        for model, breaker in get_breaker_state().items():
+            print(f"📈 Circuit Breaker {model}: {breaker['state']} ({breaker['trips']}x ausgelöst)")
+
+async def start_background_jobs(application):
+    """post_init-Hook: startet die Hintergrund-Jobs im Event Loop des Bots"""
+    application.bot_data['archive_task'] = asyncio.create_task(archive_loop())
+    application.bot_data['metrics_task'] = asyncio.create_task(metrics_loop())
+    application.bot_data['outbox_task'] = start_dispatcher(application.bot)
+    # Erst hier importiert: src.campaign nutzt selbst src.bot
+    from src.campaign import campaign_loop, CAMPAIGN_INTERVAL
+    if CAMPAIGN_INTERVAL > 0:
+        application.bot_data['campaign_task'] = asyncio.create_task(campaign_loop())
+
+async def stop_background_jobs(application):
+    """post_shutdown-Hook: offene Hintergrund-Analysen noch speichern, Loops beenden"""
+    try:
+        await asyncio.wait_for(drain_analyses(), timeout=30)
+    except asyncio.TimeoutError:
+        print(f"⚠️  {len(_analysis_tasks)} Hintergrund-Analyse(n) beim Beenden abgebrochen")
+    for name in ('archive_task', 'metrics_task', 'outbox_task', 'campaign_task'):
+        task = application.bot_data.get(name)
+        if task:
+            task.cancel()
+
+# ==================== ANALYSE (PHASE 1) ====================
+
+# Pro User höchstens eine Kette von Hintergrund-Analysen: jede neue wartet auf
+# die vorherige, damit Fakten und Score in Nachrichtenreihenfolge geschrieben werden.
+_analysis_tasks = {}
+
+async def run_analysis(user_id, analysis_text, ctx):
+    """
+    Analyst + Speichern von Fakten, Meta, Kontakten, Signals und Lead Score.
+    Returns: (all_known_facts, lead_score)
+    """
+    try:
+        analysis_result = await extract_facts_from_text(
+            analysis_text, 
+            conversation_context=ctx['analyst_window'],
+            summary=ctx['summary']
+        )
+        
+        # Fakten, Meta, Kontakte, Signals + Lead Score in einer Transaktion
+        all_known_facts, lead_score = await apply_analysis(
+            user_id, 
+            analysis_result, 
+            score_fn=calculate_lead_score
+        )
+        
+        for key, value in (analysis_result.get('facts') or {}).items():
+            print(f"  ✓ Fakt: {key} = {value}")
+        for key, value in (analysis_result.get('meta') or {}).items():
+            print(f"  ✓ Meta: {key} = {value}")
+        if analysis_result.get('contacts'):
+            print(f"  ✓ {len(analysis_result['contacts'])} Kontakt(e) gespeichert")
+        if analysis_result.get('lead_signals'):
+            print(f"  ✓ {len(analysis_result['lead_signals'])} Lead Signal(s)")
+        
+    except Exception as e:
+        print(f"❌ Analysis Error: {e}")
+        
+        # Bekannte Fakten trotzdem nutzen
+        all_known_facts = await get_user_facts(user_id)
+        lead_score = calculate_lead_score(all_known_facts)
     
-    print(f"⌨️  Tippt {typing_seconds:.1f}s...")
-    await asyncio.sleep(typing_seconds)
+    return all_known_facts, lead_score
+
+def schedule_analysis(user_id, analysis_text, ctx):
+    """Startet run_analysis im Hintergrund, nach allen offenen Analysen desselben Users"""
+    previous = _analysis_tasks.get(user_id)
+    
+    async def run():
+        if previous is not None:
+            await asyncio.wait([previous])
+        _, lead_score = await run_analysis(user_id, analysis_text, ctx)
+        print(f"📊 Lead Score (Hintergrund) für {user_id}: {lead_score}/10")
+    
+    task = asyncio.create_task(run())
+    _analysis_tasks[user_id] = task
+    
+    def cleanup(done):
+        if _analysis_tasks.get(user_id) is done:
+            del _analysis_tasks[user_id]
+    
+    task.add_done_callback(cleanup)
+    return task
+
+async def drain_analyses():
+    """Wartet auf alle laufenden Hintergrund-Analysen (Shutdown, Benchmarks)"""
+    while _analysis_tasks:
+        await asyncio.wait(list(_analysis_tasks.values()))
+
+# ==================== ZWEITE NACHRICHT ====================
+
+async def generate_second_message(history_with_first, all_known_facts, ctx):
+    """
+    Texter-Aufruf für die zweite Nachricht eines [2 NACHRICHTEN]-Plans.
+    history_with_first: Kontextfenster inkl. der (noch nicht gesendeten) ersten Antwort
+    ctx: Kontext aus handle_message (Zusammenfassung, abgerufene ältere Nachrichten)
+    Returns: Text oder None, wenn der Texter nicht verfügbar ist
+    """
+    follow_up_instruction = "Jetzt die zweite Nachricht senden. Halte dich an den Plan. Kurz und natürlich."
+    
+    return await get_chatgpt_response(
+        history_with_first,
+        user_meta=all_known_facts.get('meta', {}),
+        strategic_instruction=follow_up_instruction,
+        summary=ctx['summary'],
+        recalled=ctx['recalled']
+    )
 
 # ==================== TELEGRAM HANDLERS ====================
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler für /start Command"""
     user = update.effective_user
-    add_user(user.id, user.username, user.first_name)
+    await add_user(user.id, user.username, user.first_name)
     
     msg = "Hey! Ich bin Benni. Was geht?"
-    save_message(user.id, "assistant", msg)
-    
-    await update.message.reply_text(msg)
+    await schedule_reply(user.id, update.effective_chat.id, msg)
     print(f"👤 Neuer User: {user.first_name} (@{user.username})")
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -258,8 +412,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
 
     # User in DB speichern/aktualisieren
-    add_user(user.id, user.username, user.first_name)
-    save_message(user.id, "user", user_text)
+    await add_user(user.id, user.username, user.first_name)
+    await save_message(user.id, "user", user_text)
     
     print(f"\n{'='*50}")
     print(f"📩 NEUE NACHRICHT von {user.first_name}")
@@ -267,13 +421,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     print(f"User: {user_text}")
     
     # Prüfen ob Bot aktiv
-    if not is_user_active(user.id):
+    if not await is_user_active(user.id):
         print("⏸️  Bot ist für diesen User deaktiviert")
         return
 
     # Nachtruhe prüfen
-    if is_human_mode_on(user.id):
-        db_user = get_user(user.id)
+    if await is_human_mode_on(user.id):
+        db_user = await get_user(user.id)
         is_sleeping, _, _ = is_in_quiet_hours(
             user.id, 
             db_user['quiet_start'], 
@@ -283,85 +437,84 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             print("😴 Nachtruhe aktiv - keine Antwort")
             return
 
-    # Chat-Historie laden
-    history = get_chat_history(user.id, limit=50)
-    clean_history = [{"role": m["role"], "content": m["content"]} for m in history]
+    # Noch nicht gesendete Antworten sind durch die neue Nachricht überholt:
+    # zurückziehen und die Nachrichten, auf die sie antworten sollten, mit beantworten
+    superseded = await cancel_pending_replies(user.id)
+    if superseded:
+        user_text = "\n".join(superseded + [user_text])
+        print(f"🔄 {len(superseded)} geplante Antwort(en) zurückgezogen - wird neu geplant")
+
+    # Burst: kurz warten, ob der User weiterschreibt - dann beantwortet der Lauf
+    # der neuesten Nachricht alle zusammen (ein Pipeline-Durchlauf statt mehrerer)
+    arrival = current_arrival()
+    if arrival and not await wait_unless_newer(arrival, asyncio.sleep(BOT_DEBOUNCE_SECONDS)):
+        hand_over(arrival, user_text)
+        print("🧺 Weitere Nachricht eingegangen - wird zusammen beantwortet")
+        return
+    user_text = merge_burst(arrival, user_text)
+
+    # Chat-Historie laden und auf das Token-Budget kürzen
+    history = await get_chat_history(user.id, limit=CONTEXT_FETCH_LIMIT)
+    ctx = await build_context(user.id, history)
+    clean_history = ctx['window']
     
-    # ==================== PHASE 1: ANALYST ====================
-    print("\n🔍 PHASE 1: Analysiere Nachricht...")
+    # Ältere, zur Nachricht passende Aussagen des Users (außerhalb des Fensters)
+    ctx['recalled'] = format_recalled(await recall(user.id, user_text, ctx['window_start_id']))
     
-    try:
-        analysis_result = await extract_facts_from_text(
-            user_text, 
-            conversation_context=clean_history
+    # ==================== PHASE 1: ANALYST ====================
+    # Vorfilter: "ok", "haha", Emojis usw. brauchen keinen Analyst-Aufruf
+    previous_bot_message = next(
+        (m['content'] for m in reversed(history[:-1]) if m['role'] == 'assistant'), 
+        None
+    )
+    decision, reason, analysis_text = gate_message(user.id, user_text, previous_bot_message)
+    
+    # Fused: Analyst + Stratege in einem JSON-Aufruf, bei ungültigem Output getrennter Weg
+    fused_plan = None
+    if decision == ANALYZE and PIPELINE_MODE == "fused":
+        print(f"\n🧭 PHASE 1+2: Analyse + Strategie in einem Aufruf... ({reason})")
+        fused_plan = await plan_turn(
+            analysis_text,
+            conversation_context=ctx['analyst_window'],
+            current_facts=await get_user_facts(user.id),
+            summary=ctx['summary'],
+            recalled=ctx['recalled']
         )
-        
-        # Fakten speichern
-        if analysis_result.get('facts'):
-            for key, value in analysis_result['facts'].items():
-                if value and str(value).lower() not in ['unbekannt', 'keine angabe', '']:
-                    add_fact(user.id, key, value, fact_type="fact")
-                    print(f"  ✓ Fakt gespeichert: {key} = {value}")
-        
-        # Meta-Infos speichern
-        if analysis_result.get('meta'):
-            for key, value in analysis_result['meta'].items():
-                add_fact(user.id, key, value, fact_type="meta")
-                print(f"  ✓ Meta gespeichert: {key} = {value}")
-        
-        # Kontakte speichern
-        if analysis_result.get('contacts'):
-            contacts_json = json.dumps(
-                analysis_result['contacts'], 
-                ensure_ascii=False
-            )
-            add_fact(user.id, 'kontakte', contacts_json, fact_type="contacts")
-            
-            # Auch in separate Tabelle
-            for contact in analysis_result['contacts']:
-                if isinstance(contact, dict):
-                    add_contact(
-                        user.id,
-                        contact.get('name', ''),
-                        contact.get('beziehung', ''),
-                        contact.get('info', ''),
-                        contact.get('potential', 'unbekannt')
-                    )
-            print(f"  ✓ {len(analysis_result['contacts'])} Kontakt(e) gespeichert")
-        
-        # Lead Signals speichern
-        if analysis_result.get('lead_signals'):
-            signals_json = json.dumps(
-                analysis_result['lead_signals'], 
-                ensure_ascii=False
-            )
-            add_fact(user.id, 'lead_signals', signals_json, fact_type="signals")
-            
-            # Auch einzeln speichern
-            for signal in analysis_result['lead_signals']:
-                add_lead_signal(user.id, signal)
-            
-            print(f"  ✓ {len(analysis_result['lead_signals'])} Lead Signal(s)")
-            
-    except Exception as e:
-        print(f"❌ Analysis Error: {e}")
     
-    # Alle gesammelten Fakten laden
-    all_known_facts = get_user_facts(user.id)
+    if fused_plan:
+        all_known_facts, lead_score = await apply_analysis(
+            user.id, 
+            fused_plan, 
+            score_fn=calculate_lead_score
+        )
+    elif decision != ANALYZE:
+        print(f"\n⏭️  PHASE 1 übersprungen ({decision}: {reason})")
+        all_known_facts = await get_user_facts(user.id)
+        lead_score = calculate_lead_score(all_known_facts)
+    elif ANALYSIS_MODE == "background":
+        # Antwort sofort mit dem letzten bekannten Stand, Analyse läuft nebenher
+        print(f"\n🔍 PHASE 1 im Hintergrund ({reason})")
+        schedule_analysis(user.id, analysis_text, ctx)
+        all_known_facts = await get_user_facts(user.id)
+        lead_score = calculate_lead_score(all_known_facts)
+    else:
+        print(f"\n🔍 PHASE 1: Analysiere Nachricht... ({reason})")
+        all_known_facts, lead_score = await run_analysis(user.id, analysis_text, ctx)
     
-    # Lead Score berechnen
-    lead_score = calculate_lead_score(all_known_facts)
-    add_fact(user.id, 'lead_score', str(lead_score), fact_type="score")
     print(f"\n📊 Lead Score: {lead_score}/10")
     
     # ==================== PHASE 2: STRATEGE ====================
-    print("\n🎯 PHASE 2: Plane Gesprächsstrategie...")
-    
-    strategic_plan = await generate_sales_move(
-        user_text=user_text,
-        current_facts=all_known_facts,
-        chat_history=clean_history
-    )
+    if fused_plan:
+        strategic_plan = fused_plan['strategy']
+    else:
+        print("\n🎯 PHASE 2: Plane Gesprächsstrategie...")
+        
+        strategic_plan = await generate_sales_move(
+            user_text=user_text,
+            current_facts=all_known_facts,
+            chat_history=clean_history,
+            recalled=ctx['recalled']
+        )
     
     # ==================== PHASE 3: TEXTER ====================
     print("\n✍️  PHASE 3: Generiere Antwort...")
@@ -376,52 +529,50 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ai_response_1 = await get_chatgpt_response(
         clean_history,
         user_meta=all_known_facts.get('meta', {}),
-        strategic_instruction=strategic_plan
+        strategic_instruction=strategic_plan,
+        summary=ctx['summary'],
+        recalled=ctx['recalled']
     )
     
-    # Human Delay & Senden
-    await simulate_human_delay(user.id, context, chat_id, ai_response_1)
-    save_message(user.id, "assistant", ai_response_1)
-    await update.message.reply_text(ai_response_1)
+    if not ai_response_1:
+        print("⚠️  Texter nicht verfügbar - keine Antwort gesendet")
+        print("="*50 + "\n")
+        return
+    
+    # Senden übernimmt die Outbox: Human Delay + Tippen als Fälligkeit statt Sleep
+    delay_seconds, typing_seconds = await plan_human_delay(user.id, ai_response_1)
+    first_due = await schedule_reply(
+        user.id, chat_id, ai_response_1, 
+        delay=delay_seconds, typing=typing_seconds, reply_to=user_text
+    )
     
-    # Zweite Nachricht (falls geplant)
+    # Zweite Nachricht (falls geplant) - entsteht, während die erste noch wartet
     if num_messages == 2:
-        print("📤 Sende 2. Nachricht...")
-        
-        # Kurze Pause (2-5 Sekunden)
-        await asyncio.sleep(random.randint(2, 5))
-        
-        # Historie aktualisieren mit erster Nachricht
-        clean_history.append({"role": "assistant", "content": ai_response_1})
-        
-        # Zweite Nachricht mit angepasster Instruktion
-        follow_up_instruction = "Jetzt die zweite Nachricht senden. Halte dich an den Plan. Kurz und natürlich."
+        history_with_first = clean_history + [{"role": "assistant", "content": ai_response_1}]
+        ai_response_2 = await generate_second_message(history_with_first, all_known_facts, ctx)
         
-        ai_response_2 = await get_chatgpt_response(
-            clean_history,
-            user_meta=all_known_facts.get('meta', {}),
-            strategic_instruction=follow_up_instruction
-        )
-        
-        # Typing simulation
-        await context.bot.send_chat_action(chat_id=chat_id, action=constants.ChatAction.TYPING)
-        await asyncio.sleep(random.randint(2, 4))
-        
-        save_message(user.id, "assistant", ai_response_2)
-        await update.message.reply_text(ai_response_2)
-        
-        print(f"✅ 2 Nachrichten gesendet")
+        if ai_response_2:
+            # Kurze Pause (2-5 Sekunden) nach der ersten, dann Typing (2-4 Sekunden)
+            await schedule_reply(
+                user.id, chat_id, ai_response_2, 
+                delay=random.randint(2, 5), typing=random.randint(2, 4), after=first_due
+            )
+            print(f"✅ 2 Nachrichten geplant")
+        else:
+            print(f"⚠️  2. Nachricht übersprungen (Texter nicht verfügbar)")
     else:
-        print(f"✅ Antwort gesendet")
+        print(f"✅ Antwort geplant")
     
     print("="*50 + "\n")
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Globaler Error Handler"""
     print(f"❌ ERROR: {context.error}")
-    if update and update.effective_message:
+    if update and update.effective_chat:
         try:
-            await update.effective_message.reply_text(
+            await send_message(
+                context.bot, 
+                update.effective_chat.id, 
                 "Ups, da ist was schiefgelaufen. Versuch's nochmal?"
             )
         except:
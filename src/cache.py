@@ -0,0 +1,87 @@
+"""
+Kleiner, thread-sicherer In-Process-Cache mit LRU-Verdrängung und TTL.
+Wird vom Profil-Cache in src/db.py genutzt.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    LRU-Cache mit maximaler Größe und Ablaufzeit pro Eintrag.
+    Zählt Hits, Misses, Verdrängungen und abgelaufene Einträge.
+    """
+
+    def __init__(self, maxsize=1000, ttl=600, name="cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, validator=None):
+        """
+        Liefert den Wert oder None.
+        validator(value) -> bool kann einen Eintrag zusätzlich verwerfen
+        (z.B. weil die Version in der DB nicht mehr passt); das zählt als Miss.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+
+        value = entry[1]
+        if validator is not None and not validator(value):
+            self.invalidate(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Kennzahlen für Logs/Dashboard"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
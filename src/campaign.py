@@ -0,0 +1,171 @@
+"""
+Proaktive Kampagnen: alle passenden User auf einmal statt einzeln über den
+✨-Button anschreiben.
+
+Ein Lauf (run_campaign):
+1. Auswahl in einem SQL-Query (get_campaign_candidates): aktiv, seit
+   CAMPAIGN_INACTIVE_HOURS still (aber höchstens CAMPAIGN_MAX_INACTIVE_DAYS),
+   Lead Score ≥ CAMPAIGN_MIN_SCORE, Human Mode an/aus/egal und in den letzten
+   CAMPAIGN_COOLDOWN_HOURS keine proaktive Nachricht – bessere Leads zuerst
+2. Versandplan in einem Durchgang: der n-te User bekommt den Slot
+   start + n / CAMPAIGN_RATE. Die Nachtruhe (nur mit Human Mode, wie in
+   handle_message) wird für den Slot geprüft, nicht für jetzt – wer dann
+   schläft, wird übersprungen und beim nächsten Lauf wieder ausgewählt
+3. Generierung parallel, höchstens CAMPAIGN_CONCURRENCY LLM-Aufrufe (unter
+   LLM_MAX_CONCURRENCY, damit Live-Antworten Platz behalten); jede Nachricht
+   landet mit ihrem Slot als kind 'proactive' in der Outbox, den Versand
+   übernimmt der Bot-Prozess (src/delivery.py, Live-Antworten haben Vorrang).
+   Das Tempo begrenzen LLM_RPM/LLM_TPM (src/llm.py), nicht die Kampagne
+
+Schreibt ein User vor seinem Slot, wird die geplante Nachricht verworfen
+(cancel_pending_replies). Dry-Run: nur Auswahl und Plan – keine LLM-Aufrufe,
+nichts in der Outbox.
+
+Aufruf (aus dem Repo-Root, der laufende Bot sendet):
+    python -m src.campaign --dry-run
+    python -m src.campaign --min-score 5 --inactive-hours 72
+Im Bot regelmäßig: CAMPAIGN_INTERVAL > 0
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from src.bot import is_in_quiet_hours, trigger_ai_message
+from src.db_async import get_campaign_candidates
+from src.llm import run as run_async
+
+CAMPAIGN_INTERVAL = float(os.getenv("CAMPAIGN_INTERVAL", "0"))                # Sekunden zwischen Läufen im Bot (0 = aus)
+CAMPAIGN_INACTIVE_HOURS = float(os.getenv("CAMPAIGN_INACTIVE_HOURS", "48"))   # mindestens so lange still
+CAMPAIGN_MAX_INACTIVE_DAYS = float(os.getenv("CAMPAIGN_MAX_INACTIVE_DAYS", "30"))  # länger still → nicht mehr anschreiben
+CAMPAIGN_MIN_SCORE = int(os.getenv("CAMPAIGN_MIN_SCORE", "0"))
+CAMPAIGN_HUMAN_MODE = os.getenv("CAMPAIGN_HUMAN_MODE", "any")                  # on | off | any
+CAMPAIGN_COOLDOWN_HOURS = float(os.getenv("CAMPAIGN_COOLDOWN_HOURS", "72"))   # Abstand zwischen proaktiven Nachrichten
+CAMPAIGN_RATE = float(os.getenv("CAMPAIGN_RATE", "5"))                         # Nachrichten/s (Rest des Telegram-Limits für Live)
+CAMPAIGN_CONCURRENCY = int(os.getenv("CAMPAIGN_CONCURRENCY", "8"))            # parallele Generierungen
+CAMPAIGN_START_DELAY = float(os.getenv("CAMPAIGN_START_DELAY", "30"))         # Sekunden bis zum ersten Slot
+
+_HUMAN_MODE = {"on": True, "off": False, "any": None}
+
+# ==================== AUSWAHL & PLAN ====================
+
+def plan_campaign(candidates, start, rate=CAMPAIGN_RATE):
+    """
+    Verteilt die Kandidaten gleichmäßig ab start (ein Slot alle 1/rate
+    Sekunden) und lässt aus, wer zu seinem Slot Nachtruhe hat.
+    Returns: (Liste (User, Slot), Anzahl wegen Nachtruhe übersprungen)
+    """
+    step = timedelta(seconds=1 / rate)
+    plan, quiet = [], 0
+    for user in candidates:
+        slot = start + step * len(plan)
+        if user['human_mode'] and is_in_quiet_hours(user['id'], user['quiet_start'], user['quiet_end'], at=slot)[0]:
+            quiet += 1
+            continue
+        plan.append((user, slot))
+    return plan, quiet
+
+async def _generate(plan, concurrency):
+    """Generiert und plant die Nachrichten, höchstens concurrency gleichzeitig"""
+    result = {"scheduled": 0, "failed": 0}
+    pending = iter(plan)  # gemeinsamer Iterator: jeder Eintrag genau einmal
+
+    async def worker():
+        for user, slot in pending:
+            if await trigger_ai_message(user['id'], at=slot):
+                result["scheduled"] += 1
+            else:
+                result["failed"] += 1
+            done = result["scheduled"] + result["failed"]
+            if done % 1000 == 0:
+                print(f"📣 Kampagne: {done}/{len(plan)} generiert")
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(plan)))))
+    return result
+
+# ==================== LAUF ====================
+
+async def run_campaign(dry_run=False, inactive_hours=None, max_inactive_days=None, min_score=None,
+                       human_mode=None, cooldown_hours=None, rate=None, concurrency=None, limit=None):
+    """
+    Ein Kampagnen-Lauf (Parameter überschreiben die CAMPAIGN_*-Werte, auch
+    mit 0 – nur None heißt Standard). rate und concurrency müssen > 0 sein.
+    Returns: Kennzahlen (Kandidaten, Nachtruhe, geplant, Slots, Laufzeiten)
+    """
+    started = time.perf_counter()
+    now = datetime.now()
+    rate = CAMPAIGN_RATE if rate is None else rate
+    concurrency = CAMPAIGN_CONCURRENCY if concurrency is None else concurrency
+    if rate <= 0 or concurrency <= 0:
+        raise ValueError(f"rate und concurrency müssen > 0 sein (rate={rate}, concurrency={concurrency})")
+
+    candidates = await get_campaign_candidates(
+        inactive_since=now - timedelta(hours=CAMPAIGN_INACTIVE_HOURS if inactive_hours is None else inactive_hours),
+        active_since=now - timedelta(days=CAMPAIGN_MAX_INACTIVE_DAYS if max_inactive_days is None else max_inactive_days),
+        min_score=CAMPAIGN_MIN_SCORE if min_score is None else min_score,
+        human_mode=_HUMAN_MODE[CAMPAIGN_HUMAN_MODE if human_mode is None else human_mode],
+        contacted_since=now - timedelta(hours=CAMPAIGN_COOLDOWN_HOURS if cooldown_hours is None else cooldown_hours),
+        limit=limit
+    )
+    selected = time.perf_counter()
+
+    plan, quiet = plan_campaign(candidates, now + timedelta(seconds=CAMPAIGN_START_DELAY), rate)
+    planned = time.perf_counter()
+
+    stats = {
+        "candidates": len(candidates),
+        "quiet": quiet,
+        "planned": len(plan),
+        "first_slot": plan[0][1] if plan else None,
+        "last_slot": plan[-1][1] if plan else None,
+        "select_ms": round((selected - started) * 1000),
+        "plan_ms": round((planned - selected) * 1000),
+        "scheduled": 0,
+        "failed": 0
+    }
+    mode = "Dry-Run" if dry_run else "Lauf"
+    print(f"📣 Kampagne ({mode}): {len(candidates)} Kandidaten in {stats['select_ms']}ms, "
+          f"{quiet} in Nachtruhe, {len(plan)} geplant in {stats['plan_ms']}ms")
+    if plan:
+        print(f"📣 Versand {plan[0][1]:%d.%m. %H:%M:%S} bis {plan[-1][1]:%d.%m. %H:%M:%S} ({rate:g}/s)")
+
+    if not dry_run and plan:
+        stats.update(await _generate(plan, concurrency))
+        print(f"✅ Kampagne: {stats['scheduled']} Nachrichten geplant, {stats['failed']} fehlgeschlagen")
+
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    return stats
+
+async def campaign_loop():
+    """Regelmäßige Kampagnen im Bot-Prozess (CAMPAIGN_INTERVAL > 0)"""
+    while True:
+        await asyncio.sleep(CAMPAIGN_INTERVAL)
+        try:
+            await run_campaign()
+        except Exception as e:
+            print(f"❌ Kampagnen-Fehler: {e}")
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="nur Auswahl und Plan, nichts generieren/planen")
+    parser.add_argument("--inactive-hours", type=float, help=f"Standard {CAMPAIGN_INACTIVE_HOURS:g}")
+    parser.add_argument("--max-inactive-days", type=float, help=f"Standard {CAMPAIGN_MAX_INACTIVE_DAYS:g}")
+    parser.add_argument("--min-score", type=int, help=f"Standard {CAMPAIGN_MIN_SCORE}")
+    parser.add_argument("--human-mode", choices=list(_HUMAN_MODE), help=f"Standard {CAMPAIGN_HUMAN_MODE}")
+    parser.add_argument("--cooldown-hours", type=float, help=f"Standard {CAMPAIGN_COOLDOWN_HOURS:g}")
+    parser.add_argument("--rate", type=float, help=f"Nachrichten/s, Standard {CAMPAIGN_RATE:g}")
+    parser.add_argument("--concurrency", type=int, help=f"Standard {CAMPAIGN_CONCURRENCY}")
+    parser.add_argument("--limit", type=int, help="höchstens so viele User")
+    args = parser.parse_args()
+
+    from src.db import init_db
+    init_db()
+    stats = run_async(run_campaign(**vars(args)))
+    if args.dry_run:
+        print(f"💡 Ohne --dry-run: {stats['planned']} LLM-Aufrufe, "
+              f"bei {CAMPAIGN_CONCURRENCY if args.concurrency is None else args.concurrency} parallel")
+
+if __name__ == '__main__':
+    main()
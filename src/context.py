@@ -0,0 +1,113 @@
+"""
+Kontext-Builder für die Agenten.
+
+Statt fester Nachrichtenzahlen (50 für den Texter, 20 für den Analysten)
+bekommt jeder Agent nur so viel Verlauf, wie in sein Token-Budget passt.
+Was aus dem Fenster fällt, wird in eine rollierende Zusammenfassung
+eingearbeitet. Sie liegt pro User in conversation_summaries (Migration 12) und
+wird erneuert, sobald SUMMARY_EVERY Nachrichten zwischen ihrem Stand (upto_id)
+und dem Fensteranfang liegen – gezählt in der DB, nicht nur unter den
+CONTEXT_FETCH_LIMIT geladenen Zeilen. Dadurch bleibt die Prompt-Größe über die
+Lebenszeit eines Chats ungefähr konstant: Budget + Zusammenfassung.
+"""
+import asyncio
+import os
+from src.ai import summarize_conversation
+from src.db_async import get_summary, save_summary, count_messages_between, get_messages_between
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))  # Verlauf für den Texter
+ANALYST_TOKEN_BUDGET = int(os.getenv("ANALYST_TOKEN_BUDGET", "600"))   # Verlauf für den Analysten
+CONTEXT_FETCH_LIMIT = int(os.getenv("CONTEXT_FETCH_LIMIT", "60"))      # Nachrichten aus der DB
+SUMMARY_EVERY = int(os.getenv("SUMMARY_EVERY", "20"))                  # Neue Zusammenfassung alle N Nachrichten
+SUMMARY_MAX_BATCH = int(os.getenv("SUMMARY_MAX_BATCH", "100"))         # höchstens so viele auf einmal einarbeiten
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Rolle + Trennzeichen pro Chat-Nachricht
+
+_refreshing = set()
+_tasks = set()
+
+# ==================== TOKEN-SCHÄTZUNG ====================
+
+def estimate_tokens(text):
+    """Grobe Schätzung: ~4 Zeichen pro Token"""
+    return (len(text) + 3) // 4
+
+def message_tokens(message):
+    return estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+def trim_to_budget(history, budget):
+    """
+    Neueste Nachrichten, die zusammen ins Budget passen.
+    Die letzte Nachricht ist immer dabei, auch wenn sie allein zu groß ist.
+    """
+    total = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = message_tokens(history[i])
+        if total + cost > budget and start < len(history):
+            break
+        total += cost
+        start = i
+    return history[start:]
+
+# ==================== ZUSAMMENFASSUNG ====================
+
+async def _refresh_summary(user_id, previous, upto_id, window_start_id):
+    try:
+        # Bei langem Rückstand (z.B. Altbestand) nur die neuesten SUMMARY_MAX_BATCH
+        pending = await get_messages_between(user_id, upto_id, window_start_id, SUMMARY_MAX_BATCH)
+        if not pending:
+            return
+        text = await summarize_conversation(
+            previous,
+            [{"role": m["role"], "content": m["content"]} for m in pending]
+        )
+        if text:
+            await save_summary(user_id, text, pending[-1]['id'])
+    except Exception as e:
+        print(f"❌ Summary-Refresh Error: {e}")
+    finally:
+        _refreshing.discard(user_id)
+
+def _schedule_summary(user_id, previous, upto_id, window_start_id):
+    """Startet höchstens einen Refresh pro User, ohne die Antwort zu blockieren"""
+    if user_id in _refreshing:
+        return
+    _refreshing.add(user_id)
+    task = asyncio.create_task(_refresh_summary(user_id, previous, upto_id, window_start_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+# ==================== KONTEXT ====================
+
+async def build_context(user_id, history, budget=None, refresh_summary=True):
+    """
+    Baut den Kontext aus get_chat_history(user_id, limit=CONTEXT_FETCH_LIMIT).
+    Returns: {
+        'window': Verlauf für den Texter (role/content),
+        'analyst_window': kürzerer Verlauf für den Analysten,
+        'summary': Zusammenfassung älterer Nachrichten oder None,
+        'window_start_id': id der ältesten Nachricht im Fenster (Grenze für Retrieval)
+    }
+    Sind seit der letzten Zusammenfassung SUMMARY_EVERY Nachrichten aus dem
+    Fenster gefallen, wird im Hintergrund eine neue erzeugt. refresh_summary=False
+    für Aufrufe unter asyncio.run (Dashboard, CLI): dort stürbe der
+    Hintergrund-Task mit dem Loop – die nächste Live-Nachricht holt es nach.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    window = trim_to_budget(history, budget)
+    analyst_window = trim_to_budget(window, ANALYST_TOKEN_BUDGET)
+    window_start_id = window[0].get('id') if window else None
+
+    summary, upto_id = await get_summary(user_id)
+    if refresh_summary and window_start_id and user_id not in _refreshing:
+        pending = await count_messages_between(user_id, upto_id, window_start_id, SUMMARY_EVERY)
+        if pending >= SUMMARY_EVERY:
+            _schedule_summary(user_id, summary, upto_id, window_start_id)
+
+    return {
+        "window": [{"role": m["role"], "content": m["content"]} for m in window],
+        "analyst_window": [{"role": m["role"], "content": m["content"]} for m in analyst_window],
+        "summary": summary,
+        "window_start_id": window_start_id
+    }
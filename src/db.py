@@ -1,17 +1,111 @@
 import sqlite3
+import copy
 import datetime
+import html
 import json
+import os
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from itertools import groupby
 from pathlib import Path
+from src.cache import TTLCache
+from src.migrations import migrate
 
 DB_PATH = Path("data/chat.db")
 
-def get_connection():
-    """Erstellt eine Datenbankverbindung mit Row Factory"""
+# Verbindungs-Tuning (per ENV überschreibbar)
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "10"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_STATEMENT_CACHE = 256
+
+# Archivierung alter Nachrichten (siehe archive_messages)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_KEEP_RECENT = int(os.getenv("ARCHIVE_KEEP_RECENT", "200"))
+ARCHIVE_SEGMENT_SIZE = int(os.getenv("ARCHIVE_SEGMENT_SIZE", "500"))
+ARCHIVE_BATCH_USERS = int(os.getenv("ARCHIVE_BATCH_USERS", "20"))
+
+# Profil-Cache (User-Zeile + geparste Fakten)
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "5000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "600"))
+PROFILE_CACHE_REVALIDATE = float(os.getenv("PROFILE_CACHE_REVALIDATE", "1.0"))
+
+# Eine langlebige Verbindung pro Thread (und damit pro Event Loop)
+_local = threading.local()
+
+# ==================== TYPEN ====================
+# Zeitstempel liegen als Integer (Epoch-Millisekunden) in der DB: sortier- und
+# filterbar über Indizes ohne String-Vergleiche. Python-Code sieht nur datetime.
+
+def to_epoch_ms(value):
+    """datetime (lokale Zeit) → Epoch-Millisekunden"""
+    return int(value.timestamp() * 1000)
+
+def from_epoch_ms(value):
+    """Epoch-Millisekunden → datetime (lokale Zeit)"""
+    return datetime.datetime.fromtimestamp(value / 1000)
+
+def _convert_timestamp(raw):
+    text = raw.decode()
+    if text.lstrip('-').isdigit():
+        return from_epoch_ms(int(text))
+    # Altbestand vor Migration 7 (datetime-Repr als Text)
+    return datetime.datetime.fromisoformat(text)
+
+def _convert_boolean(raw):
+    return raw not in (b'0', b'', b'False', b'false')
+
+sqlite3.register_adapter(datetime.datetime, to_epoch_ms)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+sqlite3.register_converter("BOOLEAN", _convert_boolean)
+
+def _open_connection():
+    """Öffnet eine neue Verbindung und setzt die Performance-Pragmas"""
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE,
+        detect_types=sqlite3.PARSE_DECLTYPES
+    )
     conn.row_factory = sqlite3.Row
+    
+    # WAL: Leser (Dashboard) blockieren den Schreiber (Bot) nicht mehr
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT * 1000)}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
     return conn
 
+def get_connection():
+    """
+    Liefert die Datenbankverbindung des aktuellen Threads.
+    Die Verbindung bleibt offen und wird wiederverwendet (inkl. Statement-Cache).
+    Nach einem Fork (z.B. gunicorn Worker) wird eine neue Verbindung geöffnet.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == DB_PATH:
+        return conn
+    
+    conn = _open_connection()
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.path = DB_PATH
+    return conn
+
+def close_connection():
+    """Schließt die Verbindung des aktuellen Threads (z.B. beim Shutdown)"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        if _local.pid == os.getpid():
+            conn.close()
+        _local.conn = None
+
 def init_db():
     """Initialisiert die Datenbank mit allen benötigten Tabellen"""
     conn = get_connection()
@@ -84,48 +178,122 @@ def init_db():
     ''')
     
     conn.commit()
-    conn.close()
+    
+    # Versionierte Upgrades (Indizes etc.)
+    migrate(conn)
     print("✅ Datenbankstruktur erstellt")
 
+# ==================== PROFIL-CACHE ====================
+
+# Einträge: {'version': n, 'checked': monotonic, 'value': ...}
+# Gültigkeit wird über profile_versions (per Trigger gepflegt, Migration 6)
+# geprüft – so sieht der Bot auch Änderungen aus dem Dashboard-Prozess.
+_profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL, name="profile")
+
+_VERSION_COLUMNS = {'user': 'user_version', 'facts': 'facts_version'}
+
+def _profile_version(conn, kind, user_id):
+    row = conn.execute(
+        f"SELECT {_VERSION_COLUMNS[kind]} FROM profile_versions WHERE user_id = ?", 
+        (user_id,)
+    ).fetchone()
+    return row[0] if row else 0
+
+def _cached_profile(kind, user_id, loader):
+    """
+    Liefert user/facts aus dem Cache. Innerhalb von PROFILE_CACHE_REVALIDATE
+    Sekunden nach der letzten Prüfung ohne DB-Zugriff, danach genügt ein
+    Lookup der Versionsnummer statt Zeile + Fakten neu zu laden und zu parsen.
+    """
+    key = (kind, user_id)
+    conn = get_connection()
+    
+    def still_valid(entry):
+        now = time.monotonic()
+        if now - entry['checked'] < PROFILE_CACHE_REVALIDATE:
+            return True
+        if entry['version'] == _profile_version(conn, kind, user_id):
+            entry['checked'] = now
+            return True
+        return False
+    
+    entry = _profile_cache.get(key, validator=still_valid)
+    if entry is not None:
+        return entry['value']
+    
+    # Version VOR den Daten lesen: ein paralleler Write führt höchstens zu
+    # einem unnötigen Reload, nie zu veralteten Daten mit neuer Version
+    version = _profile_version(conn, kind, user_id)
+    value = loader(conn, user_id)
+    _profile_cache.set(key, {'version': version, 'checked': time.monotonic(), 'value': value})
+    return value
+
+def _invalidate_profile(user_id, kind=None):
+    for k in ([kind] if kind else _VERSION_COLUMNS):
+        _profile_cache.invalidate((k, user_id))
+
+def get_cache_stats():
+    """Hit/Miss-Kennzahlen des Profil-Caches"""
+    return _profile_cache.stats()
+
 # ==================== USER MANAGEMENT ====================
 
 def add_user(user_id, username, first_name):
     """Fügt einen neuen User hinzu oder aktualisiert bestehenden"""
     conn = get_connection()
-    c = conn.cursor()
     now = datetime.datetime.now()
     
-    c.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-    if c.fetchone() is None:
-        c.execute("""
-            INSERT INTO users (id, username, first_name, joined_at, human_mode, quiet_start, quiet_end, last_message_at) 
-            VALUES (?, ?, ?, ?, 1, 23, 7, ?)
-        """, (user_id, username, first_name, now, now))
-    else:
-        c.execute("""
-            UPDATE users 
-            SET username = ?, first_name = ?, last_message_at = ?
-            WHERE id = ?
-        """, (username, first_name, now, user_id))
+    # with conn: Commit bei Erfolg, Rollback bei Fehler – sonst bliebe auf der
+    # langlebigen Thread-Verbindung eine halbe Transaktion offen
+    with conn:
+        c = conn.cursor()
+        c.execute("SELECT username, first_name FROM users WHERE id = ?", (user_id,))
+        row = c.fetchone()
+        if row is None:
+            c.execute("""
+                INSERT INTO users (id, username, first_name, joined_at, human_mode, quiet_start, quiet_end, last_message_at) 
+                VALUES (?, ?, ?, ?, 1, 23, 7, ?)
+            """, (user_id, username, first_name, now, now))
+        else:
+            c.execute("""
+                UPDATE users 
+                SET username = ?, first_name = ?, last_message_at = ?
+                WHERE id = ?
+            """, (username, first_name, now, user_id))
     
-    conn.commit()
-    conn.close()
+    # Nur echte Profiländerungen invalidieren – last_message_at ändert sich bei
+    # jeder Nachricht und ist nicht Teil des gecachten Profils (siehe _load_user)
+    if row is None or (row['username'], row['first_name']) != (username, first_name):
+        _invalidate_profile(user_id, 'user')
+
+# Ohne last_message_at: ändert sich bei jeder Nachricht und zählt nicht als
+# Profiländerung (Trigger aus Migration 6) – wer es braucht, liest users direkt
+_PROFILE_COLUMNS = "id, username, first_name, joined_at, is_active, human_mode, quiet_start, quiet_end"
+
+def _load_user(conn, user_id):
+    row = conn.execute(f"SELECT {_PROFILE_COLUMNS} FROM users WHERE id = ?", (user_id,)).fetchone()
+    return dict(row) if row else None
 
 def get_user(user_id):
-    """Holt einen User aus der Datenbank"""
-    conn = get_connection()
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
-    return user
+    """Holt einen User (aus dem Profil-Cache, falls aktuell)"""
+    user = _cached_profile('user', user_id, _load_user)
+    return dict(user) if user else None
 
 def get_all_users():
     """Holt alle User sortiert nach letzter Aktivität"""
     conn = get_connection()
     users = conn.execute("""
-        SELECT * FROM users 
-        ORDER BY last_message_at DESC
+        SELECT u.*, 
+               COALESCE(s.message_count, 0) AS message_count,
+               COALESCE(s.fact_count, 0) AS fact_count,
+               COALESCE(s.contact_count, 0) AS contact_count,
+               COALESCE(s.signal_count, 0) AS signal_count,
+               COALESCE(s.lead_score, 0) AS lead_score,
+               s.last_message
+        FROM users u
+        LEFT JOIN user_stats s ON s.user_id = u.id
+        ORDER BY u.last_message_at DESC
     """).fetchall()
-    conn.close()
     
     # Convert Row objects to dicts
     return [dict(user) for user in users]
@@ -133,10 +301,9 @@ def get_all_users():
 def toggle_user_active(user_id):
     """Schaltet den aktiven Status eines Users um"""
     conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET is_active = NOT is_active WHERE id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE users SET is_active = NOT is_active WHERE id = ?", (user_id,))
+    _invalidate_profile(user_id, 'user')
 
 def is_user_active(user_id):
     """Prüft ob ein User aktiv ist"""
@@ -148,10 +315,9 @@ def is_user_active(user_id):
 def toggle_human_mode(user_id):
     """Schaltet den Human Mode um"""
     conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET human_mode = NOT human_mode WHERE id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE users SET human_mode = NOT human_mode WHERE id = ?", (user_id,))
+    _invalidate_profile(user_id, 'user')
 
 def is_human_mode_on(user_id):
     """Prüft ob Human Mode aktiv ist"""
@@ -163,40 +329,37 @@ def is_human_mode_on(user_id):
 def update_quiet_hours(user_id, start, end):
     """Aktualisiert die Nachtruhe-Zeiten"""
     conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET quiet_start = ?, quiet_end = ? WHERE id = ?", (start, end, user_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("UPDATE users SET quiet_start = ?, quiet_end = ? WHERE id = ?", (start, end, user_id))
+    _invalidate_profile(user_id, 'user')
 
 # ==================== MESSAGES ====================
 
 def save_message(user_id, role, content):
     """Speichert eine Nachricht"""
     conn = get_connection()
-    c = conn.cursor()
     now = datetime.datetime.now()
-    c.execute("""
-        INSERT INTO messages (user_id, role, content, timestamp) 
-        VALUES (?, ?, ?, ?)
-    """, (user_id, role, content, now))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("""
+            INSERT INTO messages (user_id, role, content, timestamp) 
+            VALUES (?, ?, ?, ?)
+        """, (user_id, role, content, now))
 
 def get_chat_history(user_id, limit=50):
     """Holt den Chat-Verlauf"""
     conn = get_connection()
     c = conn.cursor()
     c.execute("""
-        SELECT role, content, timestamp 
+        SELECT id, role, content, timestamp 
         FROM messages 
         WHERE user_id = ? 
         ORDER BY id DESC 
         LIMIT ?
     """, (user_id, limit))
     rows = c.fetchall()
-    conn.close()
     
     history = [{
+        "id": row["id"],
         "role": row["role"], 
         "content": row["content"], 
         "timestamp": row["timestamp"]
@@ -205,29 +368,263 @@ def get_chat_history(user_id, limit=50):
     return history[::-1]  # Chronologisch sortieren
 
 def get_full_chat(user_id):
-    """Holt alle Nachrichten eines Users"""
+    """
+    Holt alle Nachrichten eines Users (archivierte + aktuelle).
+    Archivierte Segmente werden transparent entpackt.
+    """
     conn = get_connection()
-    messages = conn.execute("""
+    segments = conn.execute("""
+        SELECT id, payload FROM message_archive 
+        WHERE user_id = ? 
+        ORDER BY first_message_id ASC
+    """, (user_id,)).fetchall()
+    
+    messages = []
+    for segment in segments:
+        messages.extend(_unpack_segment(segment['id'], segment['payload'], user_id))
+    
+    hot = conn.execute("""
         SELECT * FROM messages 
         WHERE user_id = ? 
         ORDER BY timestamp ASC
     """, (user_id,)).fetchall()
-    conn.close()
+    messages.extend(dict(row) for row in hot)
     return messages
 
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "100"))  # Nachrichten pro Seite im Dashboard
+
+def get_chat_page(user_id, before_id=None, limit=CHAT_PAGE_SIZE):
+    """
+    Eine Seite des Verlaufs: die limit neuesten Nachrichten vor before_id
+    (ohne: die neuesten überhaupt). Archiv-Segmente werden nur entpackt,
+    wenn die heiße Tabelle für die Seite nicht reicht.
+    Returns: (Nachrichten chronologisch, ob es ältere gibt)
+    """
+    conn = get_connection()
+    before_id = before_id or 2 ** 63 - 1
+    
+    hot = conn.execute("""
+        SELECT id, user_id, role, content, timestamp FROM messages 
+        WHERE user_id = ? AND id < ? 
+        ORDER BY id DESC 
+        LIMIT ?
+    """, (user_id, before_id, limit + 1)).fetchall()
+    messages = [dict(row) for row in hot]
+    
+    if len(messages) <= limit:
+        segments = conn.execute("""
+            SELECT id, payload FROM message_archive 
+            WHERE user_id = ? AND first_message_id < ? 
+            ORDER BY first_message_id DESC
+        """, (user_id, before_id))
+        for segment in segments:
+            older = [m for m in _unpack_segment(segment['id'], segment['payload'], user_id) if m['id'] < before_id]
+            messages.extend(reversed(older))
+            if len(messages) > limit:
+                break
+    
+    has_more = len(messages) > limit
+    return messages[:limit][::-1], has_more
+
+def get_chat_tail(user_id, after_id, limit=CHAT_PAGE_SIZE):
+    """
+    Neue Nachrichten nach after_id (Live-Updates im Dashboard). Neue
+    Nachrichten liegen immer in der heißen Tabelle – kein Archiv-Zugriff.
+    """
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT id, user_id, role, content, timestamp FROM messages 
+        WHERE user_id = ? AND id > ? 
+        ORDER BY id ASC 
+        LIMIT ?
+    """, (user_id, after_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+# ==================== ZUSAMMENFASSUNG ====================
+# Rollierende Zusammenfassung älterer Nachrichten (src/context.py, Migration 12)
+
+def get_summary(user_id):
+    """Returns: (text, upto_id) – (None, 0), wenn es noch keine gibt"""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT text, upto_id FROM conversation_summaries WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return (row['text'], row['upto_id']) if row else (None, 0)
+
+def save_summary(user_id, text, upto_id):
+    """Speichert die Zusammenfassung – nie eine ältere über eine neuere"""
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO conversation_summaries (user_id, text, upto_id, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET 
+                text = excluded.text,
+                upto_id = excluded.upto_id,
+                updated_at = excluded.updated_at
+            WHERE excluded.upto_id > conversation_summaries.upto_id
+        """, (user_id, text, upto_id, datetime.datetime.now()))
+
+def count_messages_between(user_id, after_id, before_id, limit):
+    """Nachrichten mit after_id < id < before_id, gezählt bis höchstens limit"""
+    conn = get_connection()
+    return conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM messages 
+            WHERE user_id = ? AND id > ? AND id < ? 
+            LIMIT ?
+        )
+    """, (user_id, after_id, before_id, limit)).fetchone()[0]
+
+def get_messages_between(user_id, after_id, before_id, limit):
+    """Die neuesten limit Nachrichten mit after_id < id < before_id, chronologisch"""
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT id, role, content FROM messages 
+        WHERE user_id = ? AND id > ? AND id < ? 
+        ORDER BY id DESC 
+        LIMIT ?
+    """, (user_id, after_id, before_id, limit)).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+# ==================== ARCHIV ====================
+
+def _pack_segment(rows):
+    """Komprimiert Nachrichten-Zeilen zu einem Archiv-Blob"""
+    data = [[r['id'], r['role'], r['content'], to_epoch_ms(r['timestamp'])] for r in rows]
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(raw.encode('utf-8'), 6)
+
+@lru_cache(maxsize=256)
+def _decode_segment(segment_id, payload):
+    """Entpackt ein Segment (Segmente sind unveränderlich → cachebar)"""
+    return tuple(tuple(m) for m in json.loads(zlib.decompress(payload)))
+
+def _unpack_segment(segment_id, payload, user_id):
+    return [{
+        "id": msg_id,
+        "user_id": user_id,
+        "role": role,
+        "content": content,
+        "timestamp": from_epoch_ms(timestamp)
+    } for msg_id, role, content, timestamp in _decode_segment(segment_id, payload)]
+
+_archive_cursor = 0
+
+def plan_archive(max_age_days=None, keep_recent=None, segment_size=None, max_users=None):
+    """
+    Nächste Archiv-Kandidaten ab dem Cursor – reiner Lesezugriff auf
+    user_stats (eine Zeile pro User) statt GROUP BY über alle Nachrichten.
+    Heiße Nachrichten = message_count - archived_count (Migration 11).
+    Returns: dict mit user_ids und den aufgelösten Parametern für archive_user
+    """
+    global _archive_cursor
+    
+    max_age_days = ARCHIVE_AFTER_DAYS if max_age_days is None else max_age_days
+    keep_recent = ARCHIVE_KEEP_RECENT if keep_recent is None else keep_recent
+    segment_size = ARCHIVE_SEGMENT_SIZE if segment_size is None else segment_size
+    max_users = ARCHIVE_BATCH_USERS if max_users is None else max_users
+    
+    conn = get_connection()
+    candidates = conn.execute("""
+        SELECT user_id FROM user_stats 
+        WHERE user_id > ? AND message_count - archived_count >= ? 
+        ORDER BY user_id 
+        LIMIT ?
+    """, (_archive_cursor, keep_recent + segment_size, max_users)).fetchall()
+    
+    # Am Ende angekommen → nächster Durchlauf beginnt von vorne
+    _archive_cursor = candidates[-1]['user_id'] if len(candidates) == max_users else 0
+    
+    return {
+        "user_ids": [row['user_id'] for row in candidates],
+        "keep_recent": keep_recent,
+        "segment_size": segment_size,
+        "age_cutoff": datetime.datetime.now() - datetime.timedelta(days=max_age_days)
+    }
+
+def archive_user(user_id, keep_recent, segment_size, age_cutoff):
+    """
+    Verschiebt höchstens ein volles Segment eines Users ins Archiv (eine
+    kurze Transaktion, nur Index-Lookups auf messages). Returns: Anzahl
+    """
+    conn = get_connection()
+    with conn:
+        newest_kept = conn.execute("""
+            SELECT id FROM messages 
+            WHERE user_id = ? 
+            ORDER BY id DESC 
+            LIMIT 1 OFFSET ?
+        """, (user_id, keep_recent - 1)).fetchone()
+        if newest_kept is None:
+            return 0
+        
+        rows = conn.execute("""
+            SELECT id, role, content, timestamp FROM messages 
+            WHERE user_id = ? AND id < ? AND timestamp < ? 
+            ORDER BY id ASC 
+            LIMIT ?
+        """, (user_id, newest_kept['id'], age_cutoff, segment_size)).fetchall()
+        
+        # Nur volle Segmente schreiben, sonst zerfasert das Archiv
+        if len(rows) < segment_size:
+            return 0
+        
+        conn.execute("""
+            INSERT INTO message_archive (
+                user_id, first_message_id, last_message_id, 
+                first_timestamp, last_timestamp, message_count, payload
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            user_id, rows[0]['id'], rows[-1]['id'],
+            rows[0]['timestamp'], rows[-1]['timestamp'], len(rows),
+            _pack_segment(rows)
+        ))
+        conn.execute("""
+            DELETE FROM messages 
+            WHERE user_id = ? AND id BETWEEN ? AND ?
+        """, (user_id, rows[0]['id'], rows[-1]['id']))
+    
+    return len(rows)
+
+def archive_messages(max_age_days=None, keep_recent=None, segment_size=None, max_users=None):
+    """
+    Verschiebt alte Nachrichten inkrementell in komprimierte Archiv-Segmente.
+    
+    Archiviert wird nur, was ÄLTER als max_age_days ist UND nicht zu den
+    keep_recent neuesten Nachrichten des Users gehört (get_chat_history
+    arbeitet also immer auf der heißen Tabelle). Pro Aufruf werden höchstens
+    max_users User bearbeitet; der nächste Aufruf macht beim nächsten User weiter.
+    Im Bot teilt db_async.archive_messages das in Lesen + kurze Writes auf.
+    
+    Returns: Anzahl archivierter Nachrichten
+    """
+    plan = plan_archive(max_age_days, keep_recent, segment_size, max_users)
+    return sum(
+        archive_user(user_id, plan['keep_recent'], plan['segment_size'], plan['age_cutoff'])
+        for user_id in plan['user_ids']
+    )
+
 # ==================== FACTS & META ====================
 
+# Echtes Upsert statt INSERT OR REPLACE: behält die rowid und löst den
+# UPDATE-Trigger aus (wichtig für den FTS-Index facts_fts)
+UPSERT_FACT_SQL = """
+    INSERT INTO user_facts (user_id, fact_key, fact_value, fact_type, updated_at) 
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, fact_key) DO UPDATE SET 
+        fact_value = excluded.fact_value,
+        fact_type = excluded.fact_type,
+        updated_at = excluded.updated_at
+"""
+
 def add_fact(user_id, key, value, fact_type="fact"):
     """Speichert ein Faktum mit Typ und Timestamp"""
     conn = get_connection()
-    c = conn.cursor()
     now = datetime.datetime.now()
-    c.execute("""
-        INSERT OR REPLACE INTO user_facts (user_id, fact_key, fact_value, fact_type, updated_at) 
-        VALUES (?, ?, ?, ?, ?)
-    """, (user_id, key, value, fact_type, now))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(UPSERT_FACT_SQL, (user_id, key, value, fact_type, now))
+    _invalidate_profile(user_id, 'facts')
 
 def get_fact_value(user_id, key):
     """Holt einen einzelnen Fakt"""
@@ -237,7 +634,6 @@ def get_fact_value(user_id, key):
         FROM user_facts 
         WHERE user_id = ? AND fact_key = ?
     """, (user_id, key)).fetchone()
-    conn.close()
     
     if row:
         return row['fact_value']
@@ -248,14 +644,19 @@ def get_user_facts(user_id):
     Holt alle Fakten eines Users strukturiert nach Typ
     Returns: { 'facts': {}, 'meta': {}, 'score': {}, ... }
     """
-    conn = get_connection()
+    facts = _cached_profile('facts', user_id, _load_user_facts)
+    
+    # Tiefe Kopie, damit Aufrufer den Cache auch über verschachtelte Werte nicht verändern
+    return copy.deepcopy(facts)
+
+def _load_user_facts(conn, user_id):
+    """Liest und parst die Fakten über eine bestehende Verbindung"""
     rows = conn.execute("""
         SELECT fact_key, fact_value, fact_type, updated_at 
         FROM user_facts 
         WHERE user_id = ?
         ORDER BY updated_at DESC
     """, (user_id,)).fetchall()
-    conn.close()
     
     result = {}
     
@@ -276,17 +677,105 @@ def get_user_facts(user_id):
 
 # ==================== CONTACTS ====================
 
+IGNORED_POTENTIALS = ('', 'unbekannt')
+
+def contact_key(name, relationship):
+    """
+    Normalisierte Identität eines Kontakts: 'Lisa ', 'lisa' und 'LISA!'
+    mit Beziehung 'Schwester' landen alle auf 'lisa|schwester'.
+    """
+    def norm(text):
+        text = re.sub(r'[^\w\s]', ' ', str(text or '').casefold())
+        return ' '.join(text.split())
+    return f"{norm(name)}|{norm(relationship)}"
+
+# Upsert über (user_id, contact_key): Info wird ergänzt statt dupliziert,
+# ein bekanntes Potential wird nicht durch 'unbekannt' überschrieben
+UPSERT_CONTACT_SQL = """
+    INSERT INTO user_contacts (user_id, name, relationship, info, potential, created_at, contact_key)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, contact_key) DO UPDATE SET
+        info = CASE
+            WHEN COALESCE(excluded.info, '') = '' OR instr(COALESCE(info, ''), excluded.info) > 0 THEN info
+            WHEN COALESCE(info, '') = '' THEN excluded.info
+            ELSE info || '; ' || excluded.info
+        END,
+        potential = CASE
+            WHEN COALESCE(excluded.potential, '') IN ('', 'unbekannt') THEN potential
+            ELSE excluded.potential
+        END
+"""
+
+def _merge_info(current, new):
+    """Python-Gegenstück zur Info-Merge-Regel in UPSERT_CONTACT_SQL"""
+    if not new or new in (current or ''):
+        return current
+    if not current:
+        return new
+    return f"{current}; {new}"
+
+def _contact_row(user_id, name, relationship, info, potential, now):
+    return (user_id, name, relationship, info, potential, now, contact_key(name, relationship))
+
 def add_contact(user_id, name, relationship, info="", potential="unbekannt"):
-    """Fügt einen Kontakt/Verwandten hinzu"""
+    """Fügt einen Kontakt/Verwandten hinzu oder ergänzt den bestehenden"""
     conn = get_connection()
-    c = conn.cursor()
     now = datetime.datetime.now()
-    c.execute("""
-        INSERT INTO user_contacts (user_id, name, relationship, info, potential, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (user_id, name, relationship, info, potential, now))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(UPSERT_CONTACT_SQL, _contact_row(user_id, name, relationship, info, potential, now))
+
+def compact_contacts(conn=None):
+    """
+    Einmaliger Aufräum-Job: vergibt fehlende contact_keys und führt
+    Duplikate pro (user_id, contact_key) in der ältesten Zeile zusammen.
+    Läuft automatisch mit Migration 5, kann aber auch manuell gestartet werden.
+    Returns: Anzahl entfernter Duplikate
+    """
+    own_transaction = conn is None
+    conn = conn or get_connection()
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    
+    try:
+        conn.create_function("normalize_contact", 2, contact_key, deterministic=True)
+        conn.execute("""
+            UPDATE user_contacts 
+            SET contact_key = normalize_contact(name, relationship) 
+            WHERE contact_key IS NULL
+        """)
+        
+        rows = conn.execute("""
+            SELECT id, user_id, contact_key, info, potential 
+            FROM user_contacts 
+            ORDER BY user_id, contact_key, id
+        """).fetchall()
+        
+        updates, deletes = [], []
+        for _, group in groupby(rows, key=lambda r: (r['user_id'], r['contact_key'])):
+            group = list(group)
+            if len(group) == 1:
+                continue
+            
+            keeper = group[0]
+            info, potential = keeper['info'], keeper['potential']
+            for dup in group[1:]:
+                info = _merge_info(info, dup['info'])
+                if (dup['potential'] or '') not in IGNORED_POTENTIALS:
+                    potential = dup['potential']
+                deletes.append((dup['id'],))
+            updates.append((info, potential, keeper['id']))
+        
+        conn.executemany("UPDATE user_contacts SET info = ?, potential = ? WHERE id = ?", updates)
+        conn.executemany("DELETE FROM user_contacts WHERE id = ?", deletes)
+        
+        if own_transaction:
+            conn.commit()
+    except Exception:
+        if own_transaction:
+            conn.rollback()
+        raise
+    
+    return len(deletes)
 
 def get_contacts(user_id):
     """Holt alle Kontakte eines Users"""
@@ -296,7 +785,6 @@ def get_contacts(user_id):
         WHERE user_id = ?
         ORDER BY created_at DESC
     """, (user_id,)).fetchall()
-    conn.close()
     
     return [{
         'name': c['name'],
@@ -310,14 +798,12 @@ def get_contacts(user_id):
 def add_lead_signal(user_id, signal, category="general"):
     """Fügt ein Lead Signal hinzu"""
     conn = get_connection()
-    c = conn.cursor()
     now = datetime.datetime.now()
-    c.execute("""
-        INSERT INTO lead_signals (user_id, signal, category, timestamp)
-        VALUES (?, ?, ?, ?)
-    """, (user_id, signal, category, now))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("""
+            INSERT INTO lead_signals (user_id, signal, category, timestamp)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, signal, category, now))
 
 def get_lead_signals(user_id, limit=20):
     """Holt die Lead Signals eines Users"""
@@ -329,7 +815,6 @@ def get_lead_signals(user_id, limit=20):
         ORDER BY timestamp DESC
         LIMIT ?
     """, (user_id, limit)).fetchall()
-    conn.close()
     
     return [{
         'signal': s['signal'],
@@ -337,37 +822,507 @@ def get_lead_signals(user_id, limit=20):
         'timestamp': s['timestamp']
     } for s in signals]
 
-# ==================== STATISTICS ====================
+# ==================== ANALYSE (BATCH) ====================
 
-def get_user_stats(user_id):
-    """Holt Statistiken über einen User"""
+IGNORED_FACT_VALUES = ('unbekannt', 'keine angabe', '')
+
+def _storable(value):
+    """Listen/Dicts als JSON speichern (get_user_facts parst sie zurück)"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def apply_analysis(user_id, analysis, score_fn=None):
+    """
+    Schreibt ein komplettes Analyst-Ergebnis atomar in EINER Transaktion:
+    Fakten, Meta, Kontakte, Lead Signals und den Lead Score.
+    
+    score_fn bekommt die aktualisierten Fakten (wie get_user_facts) und
+    liefert den Lead Score, der in derselben Transaktion gespeichert wird.
+    
+    Returns: (alle Fakten des Users, lead_score oder None)
+    """
+    now = datetime.datetime.now()
+    
+    fact_rows = []
+    for key, value in (analysis.get('facts') or {}).items():
+        if value and str(value).lower() not in IGNORED_FACT_VALUES:
+            fact_rows.append((user_id, key, _storable(value), 'fact', now))
+    
+    for key, value in (analysis.get('meta') or {}).items():
+        fact_rows.append((user_id, key, _storable(value), 'meta', now))
+    
+    contacts = [c for c in (analysis.get('contacts') or []) if isinstance(c, dict)]
+    if analysis.get('contacts'):
+        contacts_json = json.dumps(analysis['contacts'], ensure_ascii=False)
+        fact_rows.append((user_id, 'kontakte', contacts_json, 'contacts', now))
+    
+    signals = analysis.get('lead_signals') or []
+    if signals:
+        signals_json = json.dumps(signals, ensure_ascii=False)
+        fact_rows.append((user_id, 'lead_signals', signals_json, 'signals', now))
+    
     conn = get_connection()
+    with conn:
+        conn.executemany(UPSERT_FACT_SQL, fact_rows)
+        
+        conn.executemany(UPSERT_CONTACT_SQL, [_contact_row(
+            user_id,
+            c.get('name', ''),
+            c.get('beziehung', ''),
+            c.get('info', ''),
+            c.get('potential', 'unbekannt'),
+            now
+        ) for c in contacts])
+        
+        conn.executemany("""
+            INSERT INTO lead_signals (user_id, signal, category, timestamp)
+            VALUES (?, ?, 'general', ?)
+        """, [(user_id, _storable(signal), now) for signal in signals])
+        
+        all_facts = _load_user_facts(conn, user_id)
+        
+        lead_score = None
+        if score_fn:
+            lead_score = score_fn(all_facts)
+            conn.execute(UPSERT_FACT_SQL, (user_id, 'lead_score', str(lead_score), 'score', now))
+            all_facts.setdefault('score', {})['lead_score'] = lead_score
+        
+        # Write-through: frisch geladene Fakten samt neuer Version cachen
+        version = _profile_version(conn, 'facts', user_id)
     
-    # Nachrichtenanzahl
-    msg_count = conn.execute("""
-        SELECT COUNT(*) as count 
-        FROM messages 
-        WHERE user_id = ?
-    """, (user_id,)).fetchone()['count']
+    _profile_cache.set(('facts', user_id), {
+        'version': version, 
+        'checked': time.monotonic(), 
+        'value': {ftype: dict(values) for ftype, values in all_facts.items()}
+    })
+    return all_facts, lead_score
+
+# ==================== SUCHE ====================
+
+# Marker, die in normalem Chat-Text nicht vorkommen (werden nach dem
+# HTML-Escaping durch <mark> ersetzt)
+_HL_START, _HL_END = '\x02', '\x03'
+
+_SEARCH_QUERIES = {
+    'messages': """
+        SELECT 'message' AS type, f.rowid AS ref_id, f.user_id, u.first_name,
+               f.role AS label,
+               snippet(messages_fts, 0, '\x02', '\x03', '…', 16) AS snippet,
+               m.timestamp, bm25(messages_fts, 1.0, 0.0) AS rank
+        FROM messages_fts f
+        LEFT JOIN users u ON u.id = f.user_id
+        LEFT JOIN messages m ON m.id = f.rowid
+        WHERE messages_fts MATCH 'content : (' || ? || ')'
+    """,
+    'facts': """
+        SELECT 'fact' AS type, f.rowid AS ref_id, f.user_id, u.first_name,
+               f.fact_key AS label,
+               snippet(facts_fts, -1, '\x02', '\x03', '…', 16) AS snippet,
+               NULL AS timestamp, bm25(facts_fts) AS rank
+        FROM facts_fts f
+        LEFT JOIN users u ON u.id = f.user_id
+        WHERE facts_fts MATCH ?
+    """,
+    'contacts': """
+        SELECT 'contact' AS type, f.rowid AS ref_id, f.user_id, u.first_name,
+               f.relationship AS label,
+               snippet(contacts_fts, -1, '\x02', '\x03', '…', 16) AS snippet,
+               NULL AS timestamp, bm25(contacts_fts) AS rank
+        FROM contacts_fts f
+        LEFT JOIN users u ON u.id = f.user_id
+        WHERE contacts_fts MATCH ?
+    """,
+}
+
+SEARCH_SCOPES = tuple(_SEARCH_QUERIES) + ('all',)
+
+def _fts_query(text):
+    """
+    Macht aus Freitext eine sichere FTS5-Query.
+    Jedes Wort wird gequotet (keine Syntax-Injection) und als Präfix
+    gesucht, damit 'Bauspar' auch 'Bausparvertrag' findet.
+    """
+    terms = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{t}"*' for t in terms)
+
+def _highlight(snippet):
+    """Escaped den Snippet-Text und setzt <mark> um die Treffer"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>')
+
+def search(query, scope='all', page=1, per_page=20):
+    """
+    Volltextsuche (FTS5, nach bm25 gerankt) über Nachrichten, Fakten und Kontakte.
+    Returns: { 'results': [...], 'page': n, 'per_page': n, 'has_more': bool }
+    """
+    match = _fts_query(query)
+    result = {'results': [], 'page': page, 'per_page': per_page, 'has_more': False}
+    if not match:
+        return result
     
-    # Fakten-Anzahl
-    facts_count = conn.execute("""
-        SELECT COUNT(*) as count 
-        FROM user_facts 
-        WHERE user_id = ?
-    """, (user_id,)).fetchone()['count']
+    scopes = list(_SEARCH_QUERIES) if scope == 'all' else [scope]
+    sql = " UNION ALL ".join(_SEARCH_QUERIES[s] for s in scopes)
+    sql = f"SELECT * FROM ({sql}) ORDER BY rank LIMIT ? OFFSET ?"
+    params = [match] * len(scopes) + [per_page + 1, (page - 1) * per_page]
+    
+    rows = get_connection().execute(sql, params).fetchall()
+    
+    def timestamp(value):
+        # UNION ALL verliert den Spaltentyp (Integer), ein einzelner Scope
+        # behält TIMESTAMP und kommt schon als datetime vom Converter
+        return from_epoch_ms(value) if isinstance(value, int) else value
     
-    # Kontakte-Anzahl
-    contacts_count = conn.execute("""
-        SELECT COUNT(*) as count 
-        FROM user_contacts 
+    result['has_more'] = len(rows) > per_page
+    result['results'] = [{
+        'type': row['type'],
+        'id': row['ref_id'],
+        'user_id': row['user_id'],
+        'first_name': row['first_name'],
+        'label': row['label'],
+        'snippet': _highlight(row['snippet']),
+        'timestamp': timestamp(row['timestamp']),
+        'rank': row['rank']
+    } for row in rows[:per_page]]
+    return result
+
+def user_term(user_id, term):
+    """Suchwort in messages_fts.user_content (jedes Wort mit User-Präfix, Migration 13)"""
+    return f"u{int(user_id)}x{term}"
+
+def search_user_messages(user_id, terms, before_id, limit=20):
+    """
+    bm25-Suche in den Nachrichten EINES Users (inkl. archivierter) für die
+    Retrieval-Schicht (src/retrieval.py). Nur Nachrichten mit id < before_id,
+    also älter als das aktuelle Kontextfenster.
+    terms: Suchwörter, als Präfix und mit OR verknüpft – eine ältere Nachricht
+    muss nicht alle enthalten. Returns: [{id, role, content, timestamp, rank}, ...]
+    
+    Gesucht wird in user_content: die Präfix-Terme gehören nur diesem User,
+    die Kosten hängen also nicht von den Nachrichten anderer User ab.
+    """
+    if not terms:
+        return []
+    # Gequotet (keine Syntax-Injection)
+    match = " OR ".join('"{}"*'.format(user_term(user_id, term).replace('"', '""')) for term in terms)
+    rows = get_connection().execute("""
+        SELECT f.rowid AS id, f.role, f.content, m.timestamp, bm25(messages_fts, 0.0, 1.0) AS rank
+        FROM messages_fts f
+        LEFT JOIN messages m ON m.id = f.rowid
+        WHERE messages_fts MATCH ? AND f.rowid < ?
+        ORDER BY rank
+        LIMIT ?
+    """, (f"user_content : ({match})", before_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+# ==================== LLM-CACHE ====================
+
+def get_llm_cache(cache_key):
+    """Liefert die gecachte LLM-Antwort (dict) oder None, wenn sie fehlt oder abgelaufen ist"""
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT response FROM llm_cache
+        WHERE cache_key = ? AND expires_at > ?
+    """, (cache_key, datetime.datetime.now())).fetchone()
+    return json.loads(row['response']) if row else None
+
+def touch_llm_cache(cache_key):
+    """Markiert einen Eintrag als benutzt (für die LRU-Verdrängung)"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE llm_cache SET last_used_at = ? WHERE cache_key = ?",
+            (datetime.datetime.now(), cache_key)
+        )
+
+def put_llm_cache(cache_key, agent, response, ttl, max_entries):
+    """
+    Speichert eine LLM-Antwort für ttl Sekunden.
+    Räumt dabei abgelaufene Einträge ab und verdrängt die am längsten
+    unbenutzten, sobald mehr als max_entries im Cache liegen.
+    Returns: Anzahl entfernter Einträge
+    """
+    conn = get_connection()
+    now = datetime.datetime.now()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_cache
+            (cache_key, agent, response, created_at, expires_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (cache_key, agent, json.dumps(response, ensure_ascii=False), now,
+              now + datetime.timedelta(seconds=ttl), now))
+        removed = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute("""
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM llm_cache
+                ORDER BY last_used_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (max_entries,)).rowcount
+    return removed
+
+# ==================== OUTBOX ====================
+# Geplante Nachrichten (Migration 9). Status: pending → (typing) → sending →
+# sent | cancelled | failed | expired. next_at = nächste Aktion des Dispatchers,
+# bei 'sending' das Ende der Lease (danach gibt release_stale_outbox sie frei).
+
+_OPEN = "('pending', 'typing')"
+
+def enqueue_outbox(user_id, chat_id, text, due_at, typing_at=None, kind="live", reply_to=None):
+    """Plant eine Nachricht. Returns: ID der Outbox-Zeile"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute("""
+            INSERT INTO outbox (user_id, chat_id, text, kind, reply_to, typing_at, due_at, next_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, chat_id, text, kind, reply_to, typing_at, due_at,
+              typing_at or due_at, datetime.datetime.now()))
+    return cursor.lastrowid
+
+def cancel_outbox(user_id, kind="live"):
+    """
+    Zieht alle noch nicht gesendeten Nachrichten eines Users zurück.
+    Returns: reply_to der zurückgezogenen Zeilen (älteste zuerst, ohne leere)
+    """
+    conn = get_connection()
+    with conn:
+        rows = conn.execute(f"""
+            SELECT id, reply_to FROM outbox
+            WHERE user_id = ? AND kind = ? AND status IN {_OPEN}
+            ORDER BY id
+        """, (user_id, kind)).fetchall()
+        conn.executemany(
+            f"UPDATE outbox SET status = 'cancelled' WHERE id = ? AND status IN {_OPEN}",
+            [(row['id'],) for row in rows]
+        )
+    return [row['reply_to'] for row in rows if row['reply_to']]
+
+def due_outbox(now, limit=50):
+    """
+    Fällige Zeilen, höchstens eine pro User und Art (die älteste offene) – so
+    kann eine zweite Nachricht nie vor der ersten rausgehen, auch nicht nach
+    Retries. Bei Rückstau zuerst Live-Antworten, dann proaktive, dann manuelle.
+    """
+    conn = get_connection()
+    rows = conn.execute(f"""
+        SELECT * FROM outbox o
+        WHERE o.status IN {_OPEN} AND o.next_at <= ?
+          AND NOT EXISTS (
+              SELECT 1 FROM outbox p
+              WHERE p.user_id = o.user_id AND p.kind = o.kind
+                AND p.status IN ('pending', 'typing', 'sending') AND p.id < o.id
+          )
+        ORDER BY CASE o.kind WHEN 'live' THEN 0 WHEN 'proactive' THEN 1 ELSE 2 END, o.next_at
+        LIMIT ?
+    """, (now, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def next_outbox_at():
+    """Zeitpunkt der nächsten fälligen Aktion oder None"""
+    conn = get_connection()
+    row = conn.execute(f"SELECT MIN(next_at) AS next_at FROM outbox WHERE status IN {_OPEN}").fetchone()
+    return from_epoch_ms(row['next_at']) if row['next_at'] is not None else None
+
+def mark_outbox_typing(outbox_id):
+    """Typing-Anzeige ist raus, nächste Aktion ist das Senden"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE outbox SET status = 'typing', next_at = due_at WHERE id = ? AND status = 'pending'",
+            (outbox_id,)
+        )
+
+def claim_outbox(outbox_id, lease_until):
+    """
+    Reserviert eine Zeile zum Senden bis lease_until.
+    Returns: False, wenn sie inzwischen zurückgezogen wurde
+    """
+    conn = get_connection()
+    with conn:
+        return conn.execute(
+            f"UPDATE outbox SET status = 'sending', next_at = ? WHERE id = ? AND status IN {_OPEN}",
+            (lease_until, outbox_id)
+        ).rowcount == 1
+
+def complete_outbox(outbox_id):
+    """Markiert eine Zeile als gesendet und speichert die Nachricht im Verlauf (eine Transaktion)"""
+    conn = get_connection()
+    now = datetime.datetime.now()
+    with conn:
+        row = conn.execute("SELECT user_id, text FROM outbox WHERE id = ?", (outbox_id,)).fetchone()
+        conn.execute(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id = ?",
+            (now, outbox_id)
+        )
+        conn.execute(
+            "INSERT INTO messages (user_id, role, content, timestamp) VALUES (?, 'assistant', ?, ?)",
+            (row['user_id'], row['text'], now)
+        )
+
+def retry_outbox(outbox_id, next_at, error):
+    """Senden fehlgeschlagen: erneut versuchen ab next_at"""
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            UPDATE outbox SET status = 'pending', typing_at = NULL, next_at = ?,
+                   attempts = attempts + 1, error = ?
+            WHERE id = ?
+        """, (next_at, str(error)[:500], outbox_id))
+
+def close_outbox(outbox_id, status, error=None):
+    """Beendet eine Zeile ohne Versand (failed/expired)"""
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE outbox SET status = ?, error = COALESCE(?, error) WHERE id = ?",
+            (status, str(error)[:500] if error else None, outbox_id)
+        )
+
+def release_stale_outbox(now):
+    """
+    Gibt 'sending'-Zeilen mit abgelaufener Lease wieder frei (z.B. wenn
+    complete_outbox nach dem Versand fehlschlug) – sonst blockiert so eine
+    Zeile alle weiteren Nachrichten des Users in due_outbox. Ob sie
+    rausging, ist unbekannt: lieber einmal doppelt senden als eine Antwort
+    verlieren. Returns: IDs der freigegebenen Zeilen
+    """
+    conn = get_connection()
+    with conn:
+        rows = conn.execute(
+            "SELECT id FROM outbox WHERE status = 'sending' AND next_at <= ?", (now,)
+        ).fetchall()
+        conn.executemany("""
+            UPDATE outbox SET status = 'pending', next_at = ?, attempts = attempts + 1,
+                   error = 'Versand nicht bestätigt (Lease abgelaufen)'
+            WHERE id = ? AND status = 'sending'
+        """, [(now, row['id']) for row in rows])
+    return [row['id'] for row in rows]
+
+def recover_outbox():
+    """
+    Nach einem Absturz mitten im Senden: 'sending' wieder freigeben.
+    Lieber einmal doppelt senden als eine Antwort verlieren.
+    Returns: Anzahl offener Zeilen
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE outbox SET status = 'pending', next_at = due_at WHERE status = 'sending'")
+        return conn.execute(f"SELECT COUNT(*) FROM outbox WHERE status IN {_OPEN}").fetchone()[0]
+
+def get_outbox_status(outbox_id):
+    """Versand-Status einer Zeile (z.B. manuelle Nachricht im Dashboard) oder None"""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT id, kind, status, attempts, error, due_at, sent_at FROM outbox WHERE id = ?",
+        (outbox_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def get_outbox_counts():
+    """Anzahl Zeilen pro Status"""
+    conn = get_connection()
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+    return {row['status']: row['n'] for row in rows}
+
+def get_delivery_report(hours=24):
+    """
+    Versand der letzten hours Stunden pro Art (live/proactive/manual) aus der
+    Outbox – auch im Dashboard-Prozess verfügbar, der selbst nichts sendet.
+    Verspätung = Versand gegenüber geplanter Fälligkeit.
+    """
+    conn = get_connection()
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    rows = conn.execute("""
+        SELECT kind,
+               SUM(status = 'sent') AS sent,
+               SUM(status = 'failed') AS failed,
+               SUM(status = 'expired') AS expired,
+               SUM(status IN ('pending', 'typing', 'sending')) AS pending,
+               AVG(CASE WHEN status = 'sent' THEN sent_at - due_at END) AS avg_late_ms,
+               MAX(CASE WHEN status = 'sent' THEN sent_at - due_at END) AS max_late_ms
+        FROM outbox
+        WHERE created_at >= ?
+        GROUP BY kind
+    """, (since,)).fetchall()
+    return {
+        row['kind']: {
+            "sent": row['sent'], "failed": row['failed'], "expired": row['expired'], "pending": row['pending'],
+            "avg_late_ms": round(max(0, row['avg_late_ms'] or 0)), "max_late_ms": max(0, row['max_late_ms'] or 0)
+        }
+        for row in rows
+    }
+
+# ==================== KAMPAGNEN ====================
+
+def get_campaign_candidates(inactive_since, active_since=None, min_score=0, human_mode=None,
+                            contacted_since=None, limit=None):
+    """
+    User für eine proaktive Kampagne, in einem Query über users + user_stats:
+    aktiv, letzte Nachricht vor inactive_since (und nach active_since),
+    Lead Score ≥ min_score, human_mode True/False/None (egal), in der Outbox
+    seit contacted_since keine proaktive Nachricht (außer zurückgezogene).
+    Bessere Leads zuerst, bei gleichem Score die zuletzt aktiven.
+    """
+    conn = get_connection()
+    sql = """
+        SELECT u.id, u.first_name, u.human_mode, u.quiet_start, u.quiet_end, u.last_message_at,
+               COALESCE(s.lead_score, 0) AS lead_score
+        FROM users u
+        LEFT JOIN user_stats s ON s.user_id = u.id
+        WHERE u.is_active = 1 AND u.last_message_at < ?
+          AND COALESCE(s.lead_score, 0) >= ?
+    """
+    params = [inactive_since, min_score]
+    if active_since is not None:
+        sql += " AND u.last_message_at >= ?"
+        params.append(active_since)
+    if human_mode is not None:
+        sql += " AND u.human_mode = ?"
+        params.append(bool(human_mode))
+    if contacted_since is not None:
+        sql += """
+          AND u.id NOT IN (
+              SELECT user_id FROM outbox
+              WHERE kind = 'proactive' AND created_at >= ? AND status != 'cancelled'
+          )
+        """
+        params.append(contacted_since)
+    sql += " ORDER BY lead_score DESC, u.last_message_at DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+# ==================== STATISTICS ====================
+
+def get_user_stats(user_id):
+    """
+    Holt Statistiken über einen User aus der user_stats Rollup-Tabelle.
+    Die Zähler werden per Trigger gepflegt (siehe Migration 2).
+    """
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT * FROM user_stats 
         WHERE user_id = ?
-    """, (user_id,)).fetchone()['count']
+    """, (user_id,)).fetchone()
     
-    conn.close()
+    if row is None:
+        return {
+            'messages': 0,
+            'facts': 0,
+            'contacts': 0,
+            'signals': 0,
+            'lead_score': 0,
+            'last_message': None,
+            'last_message_at': None
+        }
     
     return {
-        'messages': msg_count,
-        'facts': facts_count,
-        'contacts': contacts_count
-    }
\ No newline at end of file
+        'messages': row['message_count'],
+        'facts': row['fact_count'],
+        'contacts': row['contact_count'],
+        'signals': row['signal_count'],
+        'lead_score': row['lead_score'],
+        'last_message': row['last_message'],
+        'last_message_at': row['last_message_at']
+    }
@@ -0,0 +1,106 @@
+"""
+Async-Gegenstück zu src/db.py für den Telegram Event Loop.
+
+Jede Funktion hat denselben Namen und dieselbe Signatur wie in src/db.py,
+muss aber mit await aufgerufen werden. Die eigentliche SQLite-Arbeit läuft
+außerhalb des Event Loops:
+- Schreibzugriffe seriell über EINEN Writer-Thread (kein Lock-Gerangel)
+- Lesezugriffe über einen kleinen Reader-Pool (WAL erlaubt parallele Leser)
+Jeder Thread hat dank get_connection() seine eigene, langlebige Verbindung.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from src import db
+
+DB_READ_THREADS = int(os.getenv("DB_READ_THREADS", "4"))
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_readers = ThreadPoolExecutor(max_workers=DB_READ_THREADS, thread_name_prefix="db-reader")
+
+def _offload(executor, fn):
+    """Macht aus einer blockierenden DB-Funktion eine Coroutine"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+def _write(fn):
+    return _offload(_writer, fn)
+
+def _read(fn):
+    return _offload(_readers, fn)
+
+def shutdown(wait=True):
+    """Beendet die DB-Threads (ausstehende Schreibzugriffe werden abgearbeitet)"""
+    _writer.shutdown(wait=wait)
+    _readers.shutdown(wait=wait)
+
+# ==================== SCHREIBEN ====================
+
+init_db = _write(db.init_db)
+add_user = _write(db.add_user)
+toggle_user_active = _write(db.toggle_user_active)
+toggle_human_mode = _write(db.toggle_human_mode)
+update_quiet_hours = _write(db.update_quiet_hours)
+save_message = _write(db.save_message)
+add_fact = _write(db.add_fact)
+add_contact = _write(db.add_contact)
+add_lead_signal = _write(db.add_lead_signal)
+apply_analysis = _write(db.apply_analysis)
+put_llm_cache = _write(db.put_llm_cache)
+save_summary = _write(db.save_summary)
+touch_llm_cache = _write(db.touch_llm_cache)
+enqueue_outbox = _write(db.enqueue_outbox)
+cancel_outbox = _write(db.cancel_outbox)
+mark_outbox_typing = _write(db.mark_outbox_typing)
+claim_outbox = _write(db.claim_outbox)
+complete_outbox = _write(db.complete_outbox)
+retry_outbox = _write(db.retry_outbox)
+close_outbox = _write(db.close_outbox)
+release_stale_outbox = _write(db.release_stale_outbox)
+recover_outbox = _write(db.recover_outbox)
+
+_plan_archive = _read(db.plan_archive)
+_archive_user = _write(db.archive_user)
+
+async def archive_messages(max_age_days=None, keep_recent=None, segment_size=None, max_users=None):
+    """
+    Wie db.archive_messages, aber die Kandidatensuche läuft auf einem Reader
+    und jeder User ist ein eigener kurzer Write – Live-Nachrichten müssen
+    nicht auf den ganzen Batch warten.
+    """
+    plan = await _plan_archive(max_age_days, keep_recent, segment_size, max_users)
+    moved = 0
+    for user_id in plan['user_ids']:
+        moved += await _archive_user(
+            user_id, plan['keep_recent'], plan['segment_size'], plan['age_cutoff']
+        )
+    return moved
+
+# ==================== LESEN ====================
+
+get_user = _read(db.get_user)
+get_all_users = _read(db.get_all_users)
+is_user_active = _read(db.is_user_active)
+is_human_mode_on = _read(db.is_human_mode_on)
+get_chat_history = _read(db.get_chat_history)
+get_full_chat = _read(db.get_full_chat)
+get_chat_page = _read(db.get_chat_page)
+get_chat_tail = _read(db.get_chat_tail)
+get_summary = _read(db.get_summary)
+count_messages_between = _read(db.count_messages_between)
+get_messages_between = _read(db.get_messages_between)
+get_fact_value = _read(db.get_fact_value)
+get_user_facts = _read(db.get_user_facts)
+get_contacts = _read(db.get_contacts)
+get_lead_signals = _read(db.get_lead_signals)
+get_user_stats = _read(db.get_user_stats)
+get_llm_cache = _read(db.get_llm_cache)
+search_user_messages = _read(db.search_user_messages)
+due_outbox = _read(db.due_outbox)
+next_outbox_at = _read(db.next_outbox_at)
+get_outbox_counts = _read(db.get_outbox_counts)
+get_campaign_candidates = _read(db.get_campaign_candidates)
@@ -0,0 +1,246 @@
+"""
+Zentraler Versand an Telegram: Rate Limits, RetryAfter und Prioritäten.
+
+Alle ausgehenden Nachrichten laufen über diese Funktionen – Antworten,
+proaktive und manuelle Nachrichten kommen über die Outbox (src/outbox.py),
+/start und Fehlermeldungen direkt. Gesendet wird über den Bot der
+Application (ein gemeinsamer Keep-Alive-Pool, TELEGRAM_POOL_SIZE
+Verbindungen) statt über einen neuen Client pro Aufruf.
+
+Limits (Bot API): ~30 Nachrichten/s über alle Chats, ~1/s pro Chat. Wird
+es eng, bekommen Live-Antworten den nächsten freien Slot vor proaktiven
+und manuellen Nachrichten. Ein 429 (RetryAfter) pausiert den gesamten
+Versand für die verlangte Zeit (wie PTBs AIORateLimiter), danach wird die
+Nachricht bis zu TELEGRAM_MAX_RETRIES mal erneut gesendet.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from telegram import constants
+from telegram.error import RetryAfter
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))    # Nachrichten/s über alle Chats
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1"))  # Sekunden zwischen Nachrichten an einen Chat
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))        # Wiederholungen nach RetryAfter
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "256"))          # HTTP-Verbindungen des Bots
+
+LIVE, PROACTIVE, MANUAL = 0, 1, 2
+PRIORITIES = {"live": LIVE, "proactive": PROACTIVE, "manual": MANUAL}
+_PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+# ==================== RATE LIMITS ====================
+
+class _PriorityBucket:
+    """
+    Token Bucket, bei dem Wartende nach Priorität (dann Ankunft) bedient
+    werden. Kapazität 1: Sendungen gleichmäßig verteilt statt Bursts von
+    rate Nachrichten, sonst wären in der ersten Sekunde bis zu 2*rate möglich.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump = None
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def enqueue(self, priority):
+        """Stellt sich an. Returns: Future, das erfüllt ist, sobald ein Token frei ist"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump is None or self._pump.done() or self._pump.get_loop() is not loop:
+            self._pump = loop.create_task(self._run())
+        return future
+
+    def boost(self, future, priority):
+        """Zieht einen Wartenden auf höhere Priorität vor (alter Eintrag verfällt beim Pop)"""
+        if not future.done():
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+
+    async def acquire(self, priority):
+        await self.enqueue(priority)
+
+    async def _run(self):
+        while self._waiters:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():  # abgebrochene/vorgezogene verbrauchen kein Token
+                self.tokens -= 1
+                future.set_result(None)
+
+class _Chat:
+    """
+    Versand-Zustand eines Chats: Lock, der bei Freigabe an den Wartenden mit
+    der höchsten Priorität übergibt. Wartet eine Live-Antwort auf eine
+    proaktive Nachricht, die gerade auf ein globales Token wartet, wird diese
+    vorgezogen (Prioritätsvererbung) – sonst stünde die Live-Antwort indirekt
+    hinter allen proaktiven Nachrichten an.
+    """
+
+    def __init__(self):
+        self.locked = False
+        self.users = 0
+        self.ticket = None  # Bucket-Future des aktuellen Besitzers
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority):
+        if not self.locked and not self._waiters:
+            self.locked = True
+            return
+        if self.ticket is not None:
+            _bucket.boost(self.ticket, priority)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Lock wurde schon übergeben → weiterreichen
+            raise
+
+    def top_priority(self, priority):
+        """Höchste Priorität aus eigener und der der Wartenden"""
+        return min([priority] + [p for p, _, f in self._waiters if not f.done()])
+
+    def release(self):
+        self.ticket = None
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # bleibt gesperrt, neuer Besitzer
+                return
+        self.locked = False
+
+_bucket = _PriorityBucket(TELEGRAM_GLOBAL_RATE)
+_next_send = {}  # chat_id → frühester nächster Versand (monotonic)
+_chats = {}      # chat_id → _Chat (nur solange jemand sendet oder wartet)
+
+def _join_chat(chat_id):
+    chat = _chats.get(chat_id)
+    if chat is None:
+        chat = _chats[chat_id] = _Chat()
+    chat.users += 1
+    return chat
+
+def _leave_chat(chat_id, chat):
+    chat.users -= 1
+    if chat.users == 0:
+        del _chats[chat_id]
+    now = time.monotonic()
+    if len(_next_send) > 10000:
+        for stale in [c for c, t in _next_send.items() if t < now]:
+            del _next_send[stale]
+
+async def _wait_for_chat(chat_id):
+    """Wartet, bis der Chat wieder eine Nachricht bekommen darf (Aufrufer hält den Chat-Lock)"""
+    wait = _next_send.get(chat_id, 0.0) - time.monotonic()
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+# ==================== METRIKEN ====================
+
+_LATENCY_WINDOW = 500
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(priority, outcome, latency=None):
+    with _stats_lock:
+        entry = _stats.setdefault(_PRIORITY_NAMES[priority], {
+            "sent": 0, "failed": 0, "retry_after": 0, "latencies_ms": []
+        })
+        entry[outcome] += 1
+        if latency is not None:
+            entry["latencies_ms"].append(latency * 1000)
+            del entry["latencies_ms"][:-_LATENCY_WINDOW]
+
+def get_delivery_stats():
+    """
+    Pro Priorität: gesendet, fehlgeschlagen, 429er und Latenz (inkl. Warten
+    auf Rate Limits) über die letzten Sendungen
+    """
+    with _stats_lock:
+        result = {}
+        for name, entry in _stats.items():
+            latencies = sorted(entry["latencies_ms"])
+            result[name] = {
+                "sent": entry["sent"],
+                "failed": entry["failed"],
+                "retry_after": entry["retry_after"],
+                "p50_ms": round(latencies[len(latencies) // 2]) if latencies else 0,
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]) if latencies else 0
+            }
+        return result
+
+# ==================== VERSAND ====================
+
+def _seconds(retry_after):
+    """RetryAfter.retry_after ist je nach PTB-Version int oder timedelta"""
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+async def _send_with_retries(bot, chat, chat_id, text, priority):
+    """Versand mit Chat- und globalem Limit; RetryAfter wird abgewartet und wiederholt"""
+    for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+        await _wait_for_chat(chat_id)
+        chat.ticket = _bucket.enqueue(chat.top_priority(priority))
+        await chat.ticket
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+        except RetryAfter as e:
+            seconds = _seconds(e.retry_after)
+            _record(priority, "retry_after")
+            _bucket.pause(seconds)
+            _next_send[chat_id] = time.monotonic() + seconds
+            print(f"🚦 Telegram Flood Control: {seconds}s Pause (Chat {chat_id}, Versuch {attempt + 1})")
+            if attempt == TELEGRAM_MAX_RETRIES:
+                raise
+            continue
+        _next_send[chat_id] = time.monotonic() + TELEGRAM_CHAT_INTERVAL
+        return
+
+async def send_message(bot, chat_id, text, priority=LIVE):
+    """
+    Sendet eine Nachricht unter Einhaltung der Rate Limits.
+    Pro Chat nacheinander, im Chat wie über alle Chats nach Priorität.
+    Fehler außer RetryAfter (und RetryAfter nach TELEGRAM_MAX_RETRIES)
+    werden weitergereicht – die Outbox plant dann selbst neu.
+    """
+    start = time.monotonic()
+    chat = _join_chat(chat_id)
+    try:
+        await chat.acquire(priority)
+        try:
+            await _send_with_retries(bot, chat, chat_id, text, priority)
+        finally:
+            chat.release()
+    except Exception:
+        _record(priority, "failed")
+        raise
+    finally:
+        _leave_chat(chat_id, chat)
+    _record(priority, "sent", time.monotonic() - start)
+
+async def send_chat_action(bot, chat_id, priority=LIVE):
+    """Typing-Anzeige: nur globales Limit, blockiert keinen Nachrichten-Slot im Chat"""
+    await _bucket.acquire(priority)
+    try:
+        await bot.send_chat_action(chat_id=chat_id, action=constants.ChatAction.TYPING)
+    except RetryAfter as e:
+        _bucket.pause(_seconds(e.retry_after))
@@ -0,0 +1,180 @@
+"""
+Vorfilter für Phase 1 (Analyst).
+
+Ein großer Teil der Nachrichten ("ok", "haha", "😂", "jo") enthält keine neuen
+Fakten – dafür lohnt sich kein gpt-4o-mini JSON-Aufruf. classify() entscheidet
+lokal und ohne Abhängigkeiten anhand von Länge, Füllwort-Anteil und
+Regex-Detektoren (Zahlen, Orte, Beruf, Geld, Familie, Hobbies):
+
+- ANALYZE: Analyst läuft, inkl. zurückgestellter Kurzantworten
+- DEFER:   kurze Antwort, die im Kontext Infos tragen kann ("müde" auf "Wie
+           gehts dir?") → wird gesammelt und mit der nächsten Analyse geschickt
+- SKIP:    reines Rauschen, wird nie analysiert
+
+Skip-Rate und verpasste Fakten misst benchmarks/bench_gate.py auf einem
+gelabelten Fixture-Set.
+"""
+import os
+import re
+import threading
+
+GATE_ENABLED = os.getenv("GATE_ENABLED", "1") == "1"
+GATE_MIN_WORDS = int(os.getenv("GATE_MIN_WORDS", "8"))            # ab hier immer analysieren
+GATE_STOPWORD_RATIO = float(os.getenv("GATE_STOPWORD_RATIO", "0.6"))
+GATE_MAX_DEFERRED = int(os.getenv("GATE_MAX_DEFERRED", "3"))      # spätestens dann analysieren
+
+ANALYZE = "analyze"
+DEFER = "defer"
+SKIP = "skip"
+
+# ==================== DETEKTOREN ====================
+
+_CITIES = (
+    "berlin|hamburg|münchen|muenchen|köln|koeln|frankfurt|stuttgart|düsseldorf|duesseldorf|"
+    "leipzig|dortmund|essen|bremen|dresden|hannover|nürnberg|nuernberg|duisburg|bochum|"
+    "wuppertal|bielefeld|bonn|münster|mannheim|karlsruhe|augsburg|wiesbaden|leverkusen|"
+    "aachen|kiel|freiburg|mainz|rostock|kassel|potsdam|wien|zürich|zuerich|"
+    "nrw|bayern|sachsen|hessen|schwaben|ruhrpott|österreich|schweiz|dorf|land|stadt"
+)
+
+DETECTORS = {
+    "zahl": re.compile(r"\d|\b(zwanzig|dreißig|dreissig|vierzig|fünfzig|hundert|tausend)\b", re.IGNORECASE),
+    "alter": re.compile(r"\b(jahre?|alt|geburtstag|jung)\b", re.IGNORECASE),
+    "ort": re.compile(
+        rf"\b(wohne?n?|lebe|komme?|umgezogen|umzug|zieh\w*|heimat|\b(?:{_CITIES}))\b"
+        # Ortsname nur großgeschrieben: (?-i:...) hebt IGNORECASE für den Anfangsbuchstaben auf
+        r"|\b(?:aus|in|nach)\s+(?!der\b|die\b|das\b|dem\b|den\b|ein\w*\b|ruhe\b|ordnung\b|hause\b)"
+        r"(?-i:[A-ZÄÖÜ])[a-zäöüß]{2,}",
+        re.IGNORECASE
+    ),
+    "beruf": re.compile(
+        r"\b(arbeit\w*|job\w*|beruf\w*|studier\w*|studium|student\w*|ausbildung|azubi|schule|schüler\w*|"
+        r"chef\w*|firma|büro|buero|schicht\w*|selbstständig|selbständig|angestellt\w*|praktikum|"
+        r"uni|bachelor|master|kollegen?|kunden?|projekt\w*|feierabend|homeoffice)\b"
+        r"|\bals\s+\w+(er|in|ist|eur|ant)\b",
+        re.IGNORECASE
+    ),
+    "geld": re.compile(
+        r"€|\$|\b(euro|gehalt|verdien\w*|lohn|netto|brutto|geld|spar\w*|rente|renten\w*|vorsorge|"
+        r"altersvorsorge|etf|aktien?|fonds|depot|kredit|schulden|miete|versicherung\w*|invest\w*|"
+        r"teuer|leisten|finanz\w*|bausparer?)\b",
+        re.IGNORECASE
+    ),
+    "familie": re.compile(
+        r"\b(freundin|freund|frau|mann|verheiratet|hochzeit|heirat\w*|kind\w*|sohn|tochter|bruder|"
+        r"schwester|geschwister|mama|papa|mutter|vater|eltern|oma|opa|familie|baby|schwanger|single|"
+        r"verlobt\w*|beziehung|wg|mitbewohner\w*)\b",
+        re.IGNORECASE
+    ),
+    "hobby": re.compile(
+        r"\b(hobby\w*|sport|fußball|fussball|gym|fitness|laufen|joggen|zock\w*|gaming|playstation|"
+        r"konsole|musik|gitarre|kochen|backen|lesen|reisen|urlaub|auto|motorrad|wandern|verein|"
+        r"training|serien?|netflix|hund|katze)\b",
+        re.IGNORECASE
+    ),
+}
+
+# ==================== FÜLLWÖRTER ====================
+
+STOPWORDS = set("""
+ich du er sie es wir ihr mich dich mir dir uns euch sich mein dein sein ihr unser
+der die das den dem des ein eine einen einem einer eines kein keine
+und oder aber doch denn weil wenn dass ob als wie so auch noch schon nur mal halt
+eben ja nein nee ne nö nicht nichts was wer wo wann warum wieso weshalb
+ist bin bist sind seid war waren hab habe hast hat haben hatte gibt geht gehts
+kann kannst muss musst will willst soll würde wäre werd werde wird
+zu zum zur im in am an auf aus bei mit nach von vor für über unter um
+da dann hier dort jetzt heute grad gerade eigentlich irgendwie bisschen ganz sehr
+gut schön cool nice super krass echt wirklich safe stimmt genau klar sicher
+""".split())
+
+FILLERS = set("""
+ok okay oki okey k kk jo joa jup jap yes yep no nope hm hmm hmmm mhm aha achso ah oh
+haha hahaha hehe hihi lol lul xd rofl omg wow boah alter digga bro
+danke thx dito same true facts top passt läuft laeuft geil nice gn gute nacht
+morgen moin hey hi hallo servus na und so tschüss bye cu
+""".split())
+
+_WORD_RE = re.compile(r"[a-zäöüß]+", re.IGNORECASE)
+_HAS_LETTER_OR_DIGIT = re.compile(r"[a-zA-Z0-9äöüÄÖÜß]")
+
+# ==================== KLASSIFIKATION ====================
+
+def classify(text, previous_bot_message=None):
+    """
+    Returns: (ANALYZE | DEFER | SKIP, Grund)
+    previous_bot_message: letzte Bot-Nachricht vor text (für Antworten auf Fragen)
+    """
+    if not GATE_ENABLED:
+        return ANALYZE, "gate aus"
+
+    stripped = (text or "").strip()
+    if not _HAS_LETTER_OR_DIGIT.search(stripped):
+        return SKIP, "emoji/leer"
+
+    hits = [name for name, pattern in DETECTORS.items() if pattern.search(stripped)]
+    if hits:
+        return ANALYZE, "detektor:" + ",".join(hits)
+
+    words = [w.lower() for w in _WORD_RE.findall(stripped)]
+    if len(words) >= GATE_MIN_WORDS:
+        return ANALYZE, "lang"
+
+    content = [w for w in words if w not in STOPWORDS and w not in FILLERS]
+    stopword_ratio = 1 - len(content) / len(words) if words else 1.0
+    if len(words) >= 3 and stopword_ratio < GATE_STOPWORD_RATIO:
+        return ANALYZE, f"inhalt ({stopword_ratio:.0%} füllwörter)"
+
+    # Kurze Antwort auf eine Frage kann im Kontext ein Fakt sein ("lehrer" auf
+    # "Was machst du beruflich?") → sofort, wenn die Frage selbst ein Fakten-Thema hat
+    if previous_bot_message and previous_bot_message.rstrip().endswith("?"):
+        topics = [name for name, pattern in DETECTORS.items() if pattern.search(previous_bot_message)]
+        if topics:
+            return ANALYZE, "antwort auf frage:" + ",".join(topics)
+        return DEFER, "kurze antwort auf frage"
+    if content:
+        return DEFER, "kurz"
+    return SKIP, "füllwörter"
+
+# ==================== ZURÜCKGESTELLTE NACHRICHTEN ====================
+
+_deferred = {}
+_counts = {ANALYZE: 0, DEFER: 0, SKIP: 0, "forced": 0}
+_lock = threading.Lock()
+
+def gate_message(user_id, text, previous_bot_message=None):
+    """
+    Entscheidet für eine eingehende Nachricht.
+    Returns: (decision, reason, analysis_text)
+    analysis_text ist bei ANALYZE die Nachricht inkl. zurückgestellter
+    Kurzantworten (älteste zuerst), sonst None.
+    """
+    decision, reason = classify(text, previous_bot_message)
+
+    with _lock:
+        pending = _deferred.get(user_id, [])
+        if decision == DEFER and len(pending) + 1 >= GATE_MAX_DEFERRED:
+            decision, reason = ANALYZE, f"{len(pending) + 1} zurückgestellt"
+            _counts["forced"] += 1
+        _counts[decision] += 1
+
+        if decision == DEFER:
+            _deferred.setdefault(user_id, []).append(text)
+            return decision, reason, None
+        if decision == SKIP:
+            return decision, reason, None
+
+        batch = pending + [text]
+        _deferred.pop(user_id, None)
+
+    return decision, reason, "\n".join(batch)
+
+def get_gate_stats():
+    """Wie viele Nachrichten analysiert, zurückgestellt oder übersprungen wurden"""
+    with _lock:
+        total = _counts[ANALYZE] + _counts[DEFER] + _counts[SKIP]
+        return {
+            **_counts,
+            "pending_users": len(_deferred),
+            "analyst_skip_rate": round((_counts[DEFER] + _counts[SKIP]) / total, 3) if total else 0.0
+        }
@@ -0,0 +1,482 @@
+"""
+Gemeinsamer LLM-Zugang für alle Agenten.
+
+chat() ist der einzige Ort, an dem chat.completions.create aufgerufen
+wird. Pro Agent werden Latenz und die Token-Aufteilung aus response.usage
+mitgeschrieben (gecachte vs. ungecachte Prompt-Tokens), damit sichtbar wird,
+wie viel der stabile System-Prefix aus src/prompts.py tatsächlich spart.
+Für Agenten mit Opt-in (siehe src/llm_cache.py) werden Antworten gecacht.
+
+Modell, max_tokens, temperature, Timeout und Fallback-Kette kommen pro Agent
+aus src/agent_config.py (Env/TOML, hot-reload). Routing: ist ein small_model
+konfiguriert, geht der Aufruf dorthin, wenn der Prompt kurz ist
+(small_under_tokens) oder das p95 des Hauptmodells über p95_budget_ms liegt.
+Die Latenzen dafür werden pro Agent und Modell über LLM_LATENCY_WINDOW
+Sekunden mitgeschrieben.
+
+Schutz gegen einen langsamen oder überlasteten Upstream:
+- Timeout pro Agent (Agent-Konfiguration), kein endloses Warten
+- Semaphore global (LLM_MAX_CONCURRENCY) und pro Modell (LLM_MODEL_CONCURRENCY)
+- Token-Bucket für Requests und Tokens pro Minute (LLM_RPM / LLM_TPM)
+- Retries mit Jitter-Backoff, Retry-After vom Server hat Vorrang
+- Circuit Breaker pro Modell: nach LLM_BREAKER_THRESHOLD Fehlern in Folge
+  wird LLM_BREAKER_COOLDOWN Sekunden lang sofort LLMUnavailable geworfen
+"""
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from dotenv import load_dotenv
+from src import llm_cache
+from src.agent_config import BASE, get_agent_config, request_params
+
+load_dotenv()
+
+DEFAULT_MODEL = BASE["model"]
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "8"))
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+LLM_LATENCY_WINDOW = float(os.getenv("LLM_LATENCY_WINDOW", "300"))  # Sekunden für p50/p95 und Routing
+
+
+class LLMUnavailable(Exception):
+    """Upstream nicht erreichbar: Circuit Breaker offen oder Retries erschöpft"""
+
+# ==================== RATE LIMITS ====================
+
+class TokenBucket:
+    """
+    Token-Bucket mit Reservierung: acquire() bucht sofort ab (auch ins Minus)
+    und wartet dann, bis der Bucket die Menge wieder hergegeben hätte.
+    So gibt es keine Warteschlange und keinen Lock über await hinweg.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Bucht amount ab, gibt die nötige Wartezeit in Sekunden zurück"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self, amount=1):
+        delay = self.reserve(amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+_request_bucket = TokenBucket(LLM_RPM)
+_token_bucket = TokenBucket(LLM_TPM)
+
+def estimate_prompt_tokens(messages):
+    """Grobe Schätzung: ~4 Zeichen pro Token"""
+    return sum(len(m.get('content') or '') for m in messages) // 4
+
+def estimate_request_tokens(messages, params):
+    """Schätzung für das TPM-Limit: Prompt + erwartete Antwort"""
+    return estimate_prompt_tokens(messages) + (params.get('max_tokens') or 256)
+
+# asyncio-Semaphoren und der HTTP-Pool des Clients sind an einen Event Loop
+# gebunden; das Dashboard startet pro Request einen neuen Loop (asyncio.run)
+# → pro Loop anlegen. Kurzlebige Loops laufen über run(), das den Client
+# am Ende schließt – sonst bliebe pro Request ein offener HTTP-Pool zurück.
+_loop_state = weakref.WeakKeyDictionary()
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        state = {
+            # Retries macht chat() selbst (mit Retry-After und Circuit Breaker)
+            "client": AsyncOpenAI(max_retries=0, timeout=LLM_TIMEOUT),
+            "global": asyncio.Semaphore(LLM_MAX_CONCURRENCY),
+            "models": {}
+        }
+        _loop_state[loop] = state
+    return state
+
+def get_client():
+    """AsyncOpenAI-Client des laufenden Event Loops"""
+    return _state()["client"]
+
+async def close_client():
+    """Schließt den Client des laufenden Event Loops (neuer Aufruf legt wieder einen an)"""
+    state = _loop_state.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state["client"].close()
+
+def run(coro):
+    """
+    asyncio.run für kurzlebige Loops (Dashboard, CLI): schließt danach den
+    HTTP-Pool des Loops, auch bei Fehlern.
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+    return asyncio.run(main())
+
+def _semaphores(model):
+    state = _state()
+    model_sem = state["models"].get(model)
+    if model_sem is None:
+        model_sem = state["models"][model] = asyncio.Semaphore(LLM_MODEL_CONCURRENCY)
+    return state["global"], model_sem
+
+# ==================== CIRCUIT BREAKER ====================
+
+class CircuitBreaker:
+    """
+    closed → (threshold Fehler in Folge) → open → (cooldown) → half_open
+    half_open lässt genau einen Probe-Request durch: Erfolg schließt, Fehler öffnet wieder.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release_probe(self):
+        """Probe abgebrochen (z.B. Task gecancelt) → nächster Request darf proben"""
+        with self._lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def snapshot(self):
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+_breakers = {}
+
+def _breaker(model):
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers.setdefault(model, CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN))
+    return breaker
+
+def get_breaker_state():
+    """Zustand der Circuit Breaker pro Modell"""
+    return {model: breaker.snapshot() for model, breaker in _breakers.items()}
+
+# ==================== USAGE-STATISTIK ====================
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+def _empty_usage():
+    return {
+        "calls": 0,
+        "prompt_tokens": 0,
+        "cached_tokens": 0,
+        "completion_tokens": 0,
+        "cached_calls": 0,
+        "latency_cached": 0.0,
+        "latency_uncached": 0.0,
+        "retries": 0,
+        "failures": 0,
+        "rejected": 0,
+        "routed": 0,
+        "fallbacks": 0,
+        "models": {}
+    }
+
+# Gleitendes Latenzfenster pro (Agent, Modell): (Zeitpunkt, Sekunden)
+_latencies = {}
+
+def _window(agent, model):
+    """Latenzen der letzten LLM_LATENCY_WINDOW Sekunden (Lock muss gehalten werden)"""
+    samples = _latencies.setdefault((agent, model), deque(maxlen=1000))
+    cutoff = time.monotonic() - LLM_LATENCY_WINDOW
+    while samples and samples[0][0] < cutoff:
+        samples.popleft()
+    return samples
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+def latency_percentile(agent, model, q=0.95):
+    """Latenz-Perzentil in ms für agent auf model im aktuellen Fenster, None ohne Daten"""
+    with _usage_lock:
+        value = _percentile([latency for _, latency in _window(agent, model)], q)
+    return round(value * 1000, 1) if value is not None else None
+
+def _count(agent, field):
+    with _usage_lock:
+        _usage.setdefault(agent, _empty_usage())[field] += 1
+
+def _record_usage(agent, model, response, latency):
+    usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+
+    with _usage_lock:
+        entry = _usage.setdefault(agent, _empty_usage())
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["cached_tokens"] += cached_tokens
+        entry["completion_tokens"] += completion_tokens
+        entry["models"][model] = entry["models"].get(model, 0) + 1
+        _window(agent, model).append((time.monotonic(), latency))
+        if cached_tokens:
+            entry["cached_calls"] += 1
+            entry["latency_cached"] += latency
+        else:
+            entry["latency_uncached"] += latency
+
+    print(f"🧮 {agent} ({model}): {prompt_tokens} Prompt-Tokens ({cached_tokens} gecacht), "
+          f"{completion_tokens} Completion, {latency * 1000:.0f}ms")
+
+def get_usage_stats():
+    """
+    Token-Aufteilung und Latenz pro Agent.
+    avg_latency_cached/uncached vergleichen Aufrufe mit und ohne Prefix-Cache-Treffer,
+    p50/p95 gelten für das aktuelle Latenzfenster über alle Modelle des Agenten.
+    routed = Aufrufe aufs small_model, fallbacks = Wechsel in der Fallback-Kette.
+    """
+    with _usage_lock:
+        stats = {}
+        for agent, entry in _usage.items():
+            uncached_calls = entry["calls"] - entry["cached_calls"]
+            recent = [latency for model in entry["models"] for _, latency in _window(agent, model)]
+            p50, p95 = _percentile(recent, 0.5), _percentile(recent, 0.95)
+            stats[agent] = {
+                "calls": entry["calls"],
+                "prompt_tokens": entry["prompt_tokens"],
+                "cached_tokens": entry["cached_tokens"],
+                "uncached_tokens": entry["prompt_tokens"] - entry["cached_tokens"],
+                "completion_tokens": entry["completion_tokens"],
+                "cached_ratio": round(entry["cached_tokens"] / entry["prompt_tokens"], 3) if entry["prompt_tokens"] else 0.0,
+                "avg_latency_cached_ms": round(entry["latency_cached"] / entry["cached_calls"] * 1000, 1) if entry["cached_calls"] else None,
+                "avg_latency_uncached_ms": round(entry["latency_uncached"] / uncached_calls * 1000, 1) if uncached_calls else None,
+                "p50_latency_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "retries": entry["retries"],
+                "failures": entry["failures"],
+                "rejected": entry["rejected"],
+                "routed": entry["routed"],
+                "fallbacks": entry["fallbacks"],
+                "models": dict(entry["models"])
+            }
+        return stats
+
+# ==================== RETRIES ====================
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError
+)
+
+def _retry_after(error):
+    """Wartezeit aus Retry-After / retry-after-ms (Sekunden oder HTTP-Datum), sonst None"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        if value.replace('.', '', 1).isdigit():
+            return float(value)
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt, error):
+    """Retry-After hat Vorrang, sonst exponentiell mit Full Jitter"""
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        return min(LLM_BACKOFF_MAX, retry_after) + random.uniform(0, LLM_BACKOFF_BASE)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+# ==================== API-AUFRUF ====================
+
+async def _create(messages, model, params, timeout):
+    """Ein API-Aufruf unter Semaphoren, Rate Limit und Timeout"""
+    global_sem, model_sem = _semaphores(model)
+    async with global_sem, model_sem:
+        await _request_bucket.acquire(1)
+        await _token_bucket.acquire(estimate_request_tokens(messages, params))
+        return await asyncio.wait_for(
+            get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=timeout,
+                **params
+            ),
+            timeout=timeout + 1
+        )
+
+# ==================== ROUTING ====================
+
+def route(agent, config, messages):
+    """
+    Wählt das Modell für einen Aufruf.
+    Returns: (model, Grund oder None)
+    """
+    model, small = config["model"], config["small_model"]
+    if not small or small == model:
+        return model, None
+    
+    if config["small_under_tokens"] and estimate_prompt_tokens(messages) < config["small_under_tokens"]:
+        return small, "kurzer Prompt"
+    if config["p95_budget_ms"]:
+        p95 = latency_percentile(agent, model)
+        if p95 is not None and p95 > config["p95_budget_ms"]:
+            return small, f"p95 {p95:.0f}ms > {config['p95_budget_ms']:.0f}ms"
+    return model, None
+
+# ==================== AUFRUF ====================
+
+async def _chat_model(agent, messages, model, params, timeout):
+    """Aufruf auf genau einem Modell mit Retries und Circuit Breaker"""
+    breaker = _breaker(model)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if not breaker.allow():
+            _count(agent, "rejected")
+            raise LLMUnavailable(f"Circuit Breaker für {model} ist offen")
+
+        start = time.perf_counter()
+        try:
+            response = await _create(messages, model, params, timeout)
+        except _RETRYABLE as e:
+            # 429 heißt "langsamer", nicht "kaputt" → zählt nicht für den Breaker
+            if isinstance(e, openai.RateLimitError):
+                breaker.release_probe()
+            else:
+                breaker.record_failure()
+            _count(agent, "failures")
+            if attempt == LLM_MAX_RETRIES:
+                raise LLMUnavailable(f"{agent}: {type(e).__name__} nach {attempt + 1} Versuchen") from e
+            delay = _backoff(attempt, e)
+            _count(agent, "retries")
+            print(f"🔁 {agent}: {type(e).__name__}, neuer Versuch in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        except openai.APIStatusError:
+            # Upstream hat geantwortet (z.B. 400) → kein Ausfall, aber auch kein Retry
+            breaker.record_success()
+            _count(agent, "failures")
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+
+        breaker.record_success()
+        _record_usage(agent, model, response, time.perf_counter() - start)
+        return response
+
+async def chat(agent, messages, model=None, **params):
+    """
+    Ruft die Chat-Completions-API auf und schreibt Usage/Latenz für agent mit.
+    Modell und Parameter kommen aus der Agent-Konfiguration; explizit
+    übergebene Werte haben Vorrang (model=... schaltet das Routing ab).
+    Gibt die komplette Response zurück. Vorübergehende Fehler (429, 5xx,
+    Timeouts) werden wiederholt; ist ein Modell danach nicht erreichbar, geht
+    es mit dem nächsten der Fallback-Kette weiter. Erst wenn alle ausfallen,
+    kommt LLMUnavailable, alle anderen Fehler werden durchgereicht.
+    Cache-Treffer liefern eine rekonstruierte Response ohne API-Aufruf.
+    """
+    config = get_agent_config(agent)
+    params = {**request_params(config), **params}
+    primary = model or config["model"]
+    
+    cache_key = None
+    if llm_cache.is_cached_agent(agent):
+        cache_key = llm_cache.make_key(primary, messages, params)
+        cached = await llm_cache.lookup(agent, cache_key)
+        if cached is not None:
+            print(f"♻️  {agent}: Antwort aus dem Cache")
+            return ChatCompletion.model_validate(cached)
+    
+    chain = [primary]
+    if model is None:
+        routed, reason = route(agent, config, messages)
+        if reason:
+            _count(agent, "routed")
+            print(f"🔀 {agent}: {routed} statt {primary} ({reason})")
+            chain.insert(0, routed)
+    chain += [m for m in config["fallback"] if m not in chain]
+    
+    for i, candidate in enumerate(chain):
+        try:
+            response = await _chat_model(agent, messages, candidate, params, config["timeout"])
+            break
+        except LLMUnavailable as e:
+            if i == len(chain) - 1:
+                raise
+            _count(agent, "fallbacks")
+            print(f"↪️  {agent}: {candidate} nicht verfügbar ({e}), weiter mit {chain[i + 1]}")
+    
+    # Nur Antworten des angefragten Modells unter dessen Key ablegen – eine
+    # Antwort von small_model oder Fallback soll später keinen Treffer liefern
+    if cache_key is not None and candidate == primary:
+        await llm_cache.store(agent, cache_key, response.model_dump(mode="json"))
+    return response
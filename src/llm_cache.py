@@ -0,0 +1,131 @@
+"""
+Content-adressierter Cache für LLM-Antworten.
+
+Der Schlüssel ist ein SHA-256 über Modell, Parameter und Nachrichten –
+identische Eingaben (unveränderte Facts, wiederholter Dashboard-Trigger,
+erneut verarbeitete Nachricht) liefern dieselbe Antwort ohne API-Aufruf.
+
+Gecacht wird nur für Agenten, die in LLM_CACHE_AGENTS stehen
+("agent:ttl_sekunden", kommagetrennt). Der Texter (temperature 0.95) ist
+bewusst nicht dabei, sonst würde Benni sich wörtlich wiederholen.
+
+Backends:
+- sqlite: Tabelle llm_cache (Migration 8), geteilt zwischen Bot und Dashboard
+- memory: TTLCache im Prozess
+"""
+import hashlib
+import json
+import os
+import threading
+from src.cache import TTLCache
+from src import db_async
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite")  # sqlite | memory | off
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "5000"))
+LLM_CACHE_AGENTS = os.getenv("LLM_CACHE_AGENTS", "analyst:3600,scorer:3600,proactive:300")
+
+def _parse_agents(spec):
+    """'analyst:3600,scorer' → {'analyst': 3600, 'scorer': 3600}"""
+    agents = {}
+    for item in spec.split(","):
+        name, _, ttl = item.strip().partition(":")
+        if name:
+            agents[name] = int(ttl) if ttl else 3600
+    return agents
+
+CACHED_AGENTS = _parse_agents(LLM_CACHE_AGENTS)
+
+# ==================== BACKENDS ====================
+
+class MemoryBackend:
+    """In-Process LRU mit TTL"""
+    name = "memory"
+
+    def __init__(self, maxsize):
+        self._cache = TTLCache(maxsize=maxsize, name="llm")
+
+    @property
+    def evictions(self):
+        return self._cache.evictions
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def set(self, agent, key, value, ttl):
+        self._cache.set(key, value, ttl=ttl)
+
+class SQLiteBackend:
+    """Persistenter Cache in der Haupt-DB (über die DB-Threads aus src/db_async.py)"""
+    name = "sqlite"
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.evictions = 0
+
+    async def get(self, key):
+        value = await db_async.get_llm_cache(key)
+        if value is not None:
+            await db_async.touch_llm_cache(key)
+        return value
+
+    async def set(self, agent, key, value, ttl):
+        self.evictions += await db_async.put_llm_cache(key, agent, value, ttl, self.maxsize)
+
+_BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+
+_backend = _BACKENDS[LLM_CACHE_BACKEND](LLM_CACHE_SIZE) if LLM_CACHE_BACKEND in _BACKENDS else None
+
+# ==================== SCHNITTSTELLE ====================
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def make_key(model, messages, params):
+    """Stabiler Hash über alles, was die Antwort beeinflusst"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def is_cached_agent(agent):
+    return _backend is not None and agent in CACHED_AGENTS
+
+def _count(agent, hit):
+    with _stats_lock:
+        entry = _stats.setdefault(agent, {"hits": 0, "misses": 0})
+        entry["hits" if hit else "misses"] += 1
+
+async def lookup(agent, key):
+    """Gecachte Antwort (dict) oder None; Fehler im Cache sind nie fatal"""
+    try:
+        value = await _backend.get(key)
+    except Exception as e:
+        print(f"⚠️  LLM-Cache Lesefehler: {e}")
+        value = None
+    _count(agent, value is not None)
+    return value
+
+async def store(agent, key, value):
+    try:
+        await _backend.set(agent, key, value, CACHED_AGENTS[agent])
+    except Exception as e:
+        print(f"⚠️  LLM-Cache Schreibfehler: {e}")
+
+def get_llm_cache_stats():
+    """Hit-Rate pro Agent"""
+    with _stats_lock:
+        agents = {}
+        for agent, entry in _stats.items():
+            total = entry["hits"] + entry["misses"]
+            agents[agent] = {
+                "hits": entry["hits"],
+                "misses": entry["misses"],
+                "hit_rate": round(entry["hits"] / total, 3) if total else 0.0,
+                "ttl": CACHED_AGENTS.get(agent)
+            }
+    return {
+        "backend": _backend.name if _backend else "off",
+        "evictions": _backend.evictions if _backend else 0,
+        "agents": agents
+    }
@@ -0,0 +1,621 @@
+"""
+Versionierte Schema-Migrationen für data/chat.db.
+
+Die aktuelle Version steht in PRAGMA user_version. Jede Migration läuft
+genau einmal, in aufsteigender Reihenfolge und in einer eigenen Transaktion.
+Ein Schritt ist entweder ein SQL-Statement oder eine Funktion, die die
+Verbindung bekommt (für Datenumbauten, die sich nicht in SQL ausdrücken lassen).
+"""
+import json
+import zlib
+
+def _index_archived_messages(conn):
+    """Nimmt bereits archivierte Nachrichten in messages_fts auf"""
+    segments = conn.execute("SELECT user_id, payload FROM message_archive").fetchall()
+    for user_id, payload in segments:
+        conn.executemany(
+            "INSERT INTO messages_fts (rowid, content, user_id, role) VALUES (?, ?, ?, ?)",
+            [(msg_id, content, user_id, role)
+             for msg_id, role, content, _ in json.loads(zlib.decompress(payload))]
+        )
+
+# Zeichen, die vor einem Wort ohne Leerzeichen stehen können – werden für
+# user_content zu Leerzeichen, damit auch dieses Wort das User-Präfix bekommt.
+# Was an anderen Zeichen klebt (z.B. Emojis), findet nur die globale Suche.
+_USER_TERM_SEPARATORS = ["char(10)", "char(13)", "char(9)", "','", "'.'", "'!'", "'?'", "':'", "';'",
+                         "'('", "')'", "'/'", "'-'", "'\"'", "'„'", "'“'"]
+
+def _user_terms_sql(content, user_id):
+    """
+    SQL-Ausdruck für messages_fts.user_content: jedes Wort von content mit
+    'u<user_id>x' davor (Gegenstück: db.user_term)
+    """
+    expr = content
+    for char in _USER_TERM_SEPARATORS:
+        expr = f"replace({expr}, {char}, ' ')"
+    prefix = f"'u' || {user_id} || 'x'"
+    return f"{prefix} || replace({expr}, ' ', ' ' || {prefix})"
+
+def _index_archived_user_terms(conn):
+    """Wie _index_archived_messages, mit user_content (Migration 13)"""
+    segments = conn.execute("SELECT user_id, payload FROM message_archive").fetchall()
+    for user_id, payload in segments:
+        conn.executemany(f"""
+            INSERT INTO messages_fts (rowid, content, user_content, user_id, role) 
+            VALUES (:id, :content, {_user_terms_sql(":content", ":user_id")}, :user_id, :role)
+        """, [{"id": msg_id, "content": content, "user_id": user_id, "role": role}
+              for msg_id, role, content, _ in json.loads(zlib.decompress(payload))])
+
+def _add_contact_key_column(conn):
+    """ALTER TABLE ist nicht idempotent → Spalte nur anlegen, wenn sie fehlt"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(user_contacts)")]
+    if 'contact_key' not in columns:
+        conn.execute("ALTER TABLE user_contacts ADD COLUMN contact_key TEXT")
+
+def _add_archived_count_column(conn):
+    """Wie _add_contact_key_column: Spalte nur anlegen, wenn sie fehlt"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(user_stats)")]
+    if 'archived_count' not in columns:
+        conn.execute("ALTER TABLE user_stats ADD COLUMN archived_count INTEGER NOT NULL DEFAULT 0")
+
+def _compact_contacts(conn):
+    from src.db import compact_contacts
+    removed = compact_contacts(conn)
+    if removed:
+        print(f"  ✓ {removed} doppelte Kontakte zusammengeführt")
+
+# Text-Zeitstempel (lokale Zeit) → Epoch-Millisekunden
+_TEXT_TO_EPOCH_MS = "CAST(round((julianday({col}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+_TIMESTAMP_COLUMNS = [
+    ('users', 'joined_at'),
+    ('users', 'last_message_at'),
+    ('messages', 'timestamp'),
+    ('user_facts', 'updated_at'),
+    ('user_contacts', 'created_at'),
+    ('lead_signals', 'timestamp'),
+    ('user_stats', 'last_message_at'),
+    ('message_archive', 'first_timestamp'),
+    ('message_archive', 'last_timestamp'),
+]
+
+def _timestamps_to_epoch_ms(conn):
+    for table, col in _TIMESTAMP_COLUMNS:
+        conn.execute(
+            f"UPDATE {table} SET {col} = {_TEXT_TO_EPOCH_MS.format(col=col)} "
+            f"WHERE typeof({col}) = 'text'"
+        )
+
+def _archive_timestamps_to_epoch_ms(conn):
+    """Zeitstempel in den komprimierten Archiv-Segmenten umschreiben"""
+    segments = conn.execute("SELECT id, payload FROM message_archive").fetchall()
+    for segment_id, payload in segments:
+        messages = json.loads(zlib.decompress(payload))
+        if not any(isinstance(m[3], str) for m in messages):
+            continue
+        convert_sql = "SELECT " + _TEXT_TO_EPOCH_MS.format(col="?")
+        for message in messages:
+            if isinstance(message[3], str):
+                message[3] = conn.execute(convert_sql, (message[3],)).fetchone()[0]
+        raw = json.dumps(messages, ensure_ascii=False, separators=(',', ':'))
+        conn.execute(
+            "UPDATE message_archive SET payload = ? WHERE id = ?",
+            (zlib.compress(raw.encode('utf-8'), 6), segment_id)
+        )
+
+# (Version, Beschreibung, Schritte)
+MIGRATIONS = [
+    (1, "Indizes für Verlauf, Lead Signals, Kontakte und User-Liste", [
+        # get_chat_history (WHERE user_id ORDER BY id DESC) + COUNT(*) pro User
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages(user_id, id)",
+        # get_full_chat (WHERE user_id ORDER BY timestamp)
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages(user_id, timestamp)",
+        # get_lead_signals (WHERE user_id ORDER BY timestamp DESC LIMIT ?)
+        "CREATE INDEX IF NOT EXISTS idx_lead_signals_user_ts ON lead_signals(user_id, timestamp)",
+        # get_contacts (WHERE user_id ORDER BY created_at DESC)
+        "CREATE INDEX IF NOT EXISTS idx_user_contacts_user_created ON user_contacts(user_id, created_at)",
+        # get_all_users (ORDER BY last_message_at DESC)
+        "CREATE INDEX IF NOT EXISTS idx_users_last_message ON users(last_message_at)",
+    ]),
+    (2, "user_stats Rollup-Tabelle mit Triggern", [
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            fact_count INTEGER NOT NULL DEFAULT 0,
+            contact_count INTEGER NOT NULL DEFAULT 0,
+            signal_count INTEGER NOT NULL DEFAULT 0,
+            lead_score INTEGER NOT NULL DEFAULT 0,
+            last_message TEXT,
+            last_message_at TIMESTAMP
+        )
+        """,
+        # Hinweis: Kein INSERT OR IGNORE in den Triggern – bei INSERT OR REPLACE
+        # auf user_facts würde die äußere REPLACE-Policy die Stats-Zeile überschreiben.
+        
+        # Nachrichten
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_messages_insert AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO user_stats (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = NEW.user_id);
+            UPDATE user_stats
+            SET message_count = message_count + 1,
+                last_message = substr(NEW.content, 1, 200),
+                last_message_at = NEW.timestamp
+            WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_messages_delete AFTER DELETE ON messages
+        BEGIN
+            UPDATE user_stats SET message_count = message_count - 1 WHERE user_id = OLD.user_id;
+        END
+        """,
+        # Fakten: neu zählen, weil INSERT OR REPLACE keinen DELETE-Trigger auslöst
+        # (Lookup über den Primary Key, pro User nur eine Handvoll Zeilen)
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_facts_insert AFTER INSERT ON user_facts
+        BEGIN
+            INSERT INTO user_stats (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = NEW.user_id);
+            UPDATE user_stats
+            SET fact_count = (SELECT COUNT(*) FROM user_facts WHERE user_id = NEW.user_id)
+            WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_facts_delete AFTER DELETE ON user_facts
+        BEGIN
+            UPDATE user_stats
+            SET fact_count = (SELECT COUNT(*) FROM user_facts WHERE user_id = OLD.user_id)
+            WHERE user_id = OLD.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_lead_score_insert AFTER INSERT ON user_facts
+        WHEN NEW.fact_key = 'lead_score' AND NEW.fact_type = 'score'
+        BEGIN
+            INSERT INTO user_stats (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = NEW.user_id);
+            UPDATE user_stats SET lead_score = CAST(NEW.fact_value AS INTEGER) WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_lead_score_update AFTER UPDATE OF fact_value ON user_facts
+        WHEN NEW.fact_key = 'lead_score' AND NEW.fact_type = 'score'
+        BEGIN
+            INSERT INTO user_stats (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = NEW.user_id);
+            UPDATE user_stats SET lead_score = CAST(NEW.fact_value AS INTEGER) WHERE user_id = NEW.user_id;
+        END
+        """,
+        # Kontakte
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_contacts_insert AFTER INSERT ON user_contacts
+        BEGIN
+            INSERT INTO user_stats (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = NEW.user_id);
+            UPDATE user_stats SET contact_count = contact_count + 1 WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_contacts_delete AFTER DELETE ON user_contacts
+        BEGIN
+            UPDATE user_stats SET contact_count = contact_count - 1 WHERE user_id = OLD.user_id;
+        END
+        """,
+        # Lead Signals
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_signals_insert AFTER INSERT ON lead_signals
+        BEGIN
+            INSERT INTO user_stats (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = NEW.user_id);
+            UPDATE user_stats SET signal_count = signal_count + 1 WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_signals_delete AFTER DELETE ON lead_signals
+        BEGIN
+            UPDATE user_stats SET signal_count = signal_count - 1 WHERE user_id = OLD.user_id;
+        END
+        """,
+        # Bestehende Daten einmalig hochrechnen
+        """
+        INSERT OR REPLACE INTO user_stats (
+            user_id, message_count, fact_count, contact_count, signal_count,
+            lead_score, last_message, last_message_at
+        )
+        SELECT
+            ids.user_id,
+            (SELECT COUNT(*) FROM messages WHERE user_id = ids.user_id),
+            (SELECT COUNT(*) FROM user_facts WHERE user_id = ids.user_id),
+            (SELECT COUNT(*) FROM user_contacts WHERE user_id = ids.user_id),
+            (SELECT COUNT(*) FROM lead_signals WHERE user_id = ids.user_id),
+            COALESCE((
+                SELECT CAST(fact_value AS INTEGER) FROM user_facts
+                WHERE user_id = ids.user_id AND fact_key = 'lead_score' AND fact_type = 'score'
+            ), 0),
+            (SELECT substr(content, 1, 200) FROM messages WHERE user_id = ids.user_id ORDER BY id DESC LIMIT 1),
+            (SELECT timestamp FROM messages WHERE user_id = ids.user_id ORDER BY id DESC LIMIT 1)
+        FROM (
+            SELECT id AS user_id FROM users
+            UNION SELECT DISTINCT user_id FROM messages
+        ) AS ids
+        """,
+    ]),
+    (3, "Komprimiertes Nachrichten-Archiv", [
+        """
+        CREATE TABLE IF NOT EXISTS message_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            first_message_id INTEGER NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            first_timestamp TIMESTAMP,
+            last_timestamp TIMESTAMP,
+            message_count INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_message_archive_user ON message_archive(user_id, first_message_id)",
+        # Archivierte Nachrichten zählen weiter mit (der DELETE-Trigger auf
+        # messages zieht sie ab, dieser Trigger rechnet sie wieder drauf)
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_stats_archive_insert AFTER INSERT ON message_archive
+        BEGIN
+            UPDATE user_stats SET message_count = message_count + NEW.message_count WHERE user_id = NEW.user_id;
+        END
+        """,
+    ]),
+    (4, "FTS5-Volltextsuche über Nachrichten, Fakten und Kontakte", [
+        # Nachrichten: eigenständiger Index (rowid = messages.id). Bewusst OHNE
+        # Delete-Trigger – gelöscht wird nur beim Archivieren, und archivierte
+        # Nachrichten sollen auffindbar bleiben.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content, 
+            user_id UNINDEXED, 
+            role UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_messages_insert AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO messages_fts (rowid, content, user_id, role) 
+            VALUES (NEW.id, NEW.content, NEW.user_id, NEW.role);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_messages_update AFTER UPDATE OF content ON messages
+        BEGIN
+            UPDATE messages_fts SET content = NEW.content WHERE rowid = NEW.id;
+        END
+        """,
+        "DELETE FROM messages_fts",
+        """
+        INSERT INTO messages_fts (rowid, content, user_id, role) 
+        SELECT id, content, user_id, role FROM messages
+        """,
+        _index_archived_messages,
+        
+        # Fakten: External Content auf user_facts (rowid bleibt dank Upsert stabil)
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS facts_fts USING fts5(
+            fact_key, 
+            fact_value, 
+            user_id UNINDEXED, 
+            fact_type UNINDEXED,
+            content = 'user_facts',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_facts_insert AFTER INSERT ON user_facts
+        BEGIN
+            INSERT INTO facts_fts (rowid, fact_key, fact_value, user_id, fact_type) 
+            VALUES (NEW.rowid, NEW.fact_key, NEW.fact_value, NEW.user_id, NEW.fact_type);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_facts_delete AFTER DELETE ON user_facts
+        BEGIN
+            INSERT INTO facts_fts (facts_fts, rowid, fact_key, fact_value, user_id, fact_type) 
+            VALUES ('delete', OLD.rowid, OLD.fact_key, OLD.fact_value, OLD.user_id, OLD.fact_type);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_facts_update AFTER UPDATE ON user_facts
+        BEGIN
+            INSERT INTO facts_fts (facts_fts, rowid, fact_key, fact_value, user_id, fact_type) 
+            VALUES ('delete', OLD.rowid, OLD.fact_key, OLD.fact_value, OLD.user_id, OLD.fact_type);
+            INSERT INTO facts_fts (rowid, fact_key, fact_value, user_id, fact_type) 
+            VALUES (NEW.rowid, NEW.fact_key, NEW.fact_value, NEW.user_id, NEW.fact_type);
+        END
+        """,
+        "INSERT INTO facts_fts (facts_fts) VALUES ('rebuild')",
+        
+        # Kontakte: External Content auf user_contacts
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+            name, 
+            relationship, 
+            info, 
+            user_id UNINDEXED,
+            content = 'user_contacts',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_contacts_insert AFTER INSERT ON user_contacts
+        BEGIN
+            INSERT INTO contacts_fts (rowid, name, relationship, info, user_id) 
+            VALUES (NEW.id, NEW.name, NEW.relationship, NEW.info, NEW.user_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_contacts_delete AFTER DELETE ON user_contacts
+        BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, name, relationship, info, user_id) 
+            VALUES ('delete', OLD.id, OLD.name, OLD.relationship, OLD.info, OLD.user_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_contacts_update AFTER UPDATE ON user_contacts
+        BEGIN
+            INSERT INTO contacts_fts (contacts_fts, rowid, name, relationship, info, user_id) 
+            VALUES ('delete', OLD.id, OLD.name, OLD.relationship, OLD.info, OLD.user_id);
+            INSERT INTO contacts_fts (rowid, name, relationship, info, user_id) 
+            VALUES (NEW.id, NEW.name, NEW.relationship, NEW.info, NEW.user_id);
+        END
+        """,
+        "INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')",
+    ]),
+    (5, "Kontakt-Identität: Duplikate zusammenführen + Unique Index", [
+        _add_contact_key_column,
+        _compact_contacts,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_user_contacts_identity 
+        ON user_contacts(user_id, contact_key)
+        """,
+    ]),
+    (6, "Versionszähler für den Profil-Cache", [
+        """
+        CREATE TABLE IF NOT EXISTS profile_versions (
+            user_id INTEGER PRIMARY KEY,
+            user_version INTEGER NOT NULL DEFAULT 0,
+            facts_version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_version_users_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO profile_versions (user_id)
+            SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM profile_versions WHERE user_id = NEW.id);
+            UPDATE profile_versions SET user_version = user_version + 1 WHERE user_id = NEW.id;
+        END
+        """,
+        # last_message_at ändert sich bei jeder Nachricht → zählt nicht als Profiländerung
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_version_users_update AFTER UPDATE ON users
+        WHEN OLD.is_active IS NOT NEW.is_active
+          OR OLD.human_mode IS NOT NEW.human_mode
+          OR OLD.quiet_start IS NOT NEW.quiet_start
+          OR OLD.quiet_end IS NOT NEW.quiet_end
+          OR OLD.username IS NOT NEW.username
+          OR OLD.first_name IS NOT NEW.first_name
+        BEGIN
+            INSERT INTO profile_versions (user_id)
+            SELECT NEW.id WHERE NOT EXISTS (SELECT 1 FROM profile_versions WHERE user_id = NEW.id);
+            UPDATE profile_versions SET user_version = user_version + 1 WHERE user_id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_version_facts_insert AFTER INSERT ON user_facts
+        BEGIN
+            INSERT INTO profile_versions (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM profile_versions WHERE user_id = NEW.user_id);
+            UPDATE profile_versions SET facts_version = facts_version + 1 WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_version_facts_update AFTER UPDATE ON user_facts
+        BEGIN
+            INSERT INTO profile_versions (user_id)
+            SELECT NEW.user_id WHERE NOT EXISTS (SELECT 1 FROM profile_versions WHERE user_id = NEW.user_id);
+            UPDATE profile_versions SET facts_version = facts_version + 1 WHERE user_id = NEW.user_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_version_facts_delete AFTER DELETE ON user_facts
+        BEGIN
+            INSERT INTO profile_versions (user_id)
+            SELECT OLD.user_id WHERE NOT EXISTS (SELECT 1 FROM profile_versions WHERE user_id = OLD.user_id);
+            UPDATE profile_versions SET facts_version = facts_version + 1 WHERE user_id = OLD.user_id;
+        END
+        """,
+        # Startversion 1 für alle bestehenden Profile (0 = "noch nie gesehen")
+        """
+        INSERT OR IGNORE INTO profile_versions (user_id, user_version, facts_version)
+        SELECT id, 1, 1 FROM users
+        UNION SELECT DISTINCT user_id, 1, 1 FROM user_facts
+        """,
+    ]),
+    (7, "Zeitstempel als Epoch-Millisekunden, Booleans als 0/1", [
+        _timestamps_to_epoch_ms,
+        _archive_timestamps_to_epoch_ms,
+        """
+        UPDATE users SET 
+            is_active = CASE WHEN is_active IN (0, '0', 'False', 'false') THEN 0 ELSE 1 END,
+            human_mode = CASE WHEN human_mode IN (0, '0', 'False', 'false') THEN 0 ELSE 1 END
+        WHERE typeof(is_active) != 'integer' OR typeof(human_mode) != 'integer'
+        """,
+    ]),
+    (8, "Cache für LLM-Antworten", [
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            agent TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            last_used_at TIMESTAMP NOT NULL
+        )
+        """,
+        # LRU-Verdrängung und Aufräumen abgelaufener Einträge
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)",
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)",
+    ]),
+    (9, "Outbox für geplante Nachrichten (Human Delay)", [
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'live',
+            reply_to TEXT,
+            typing_at TIMESTAMP,
+            due_at TIMESTAMP NOT NULL,
+            next_at TIMESTAMP NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+        """,
+        # Dispatcher: nächste fällige Aktion; Neuplanung: offene Antworten eines Users
+        "CREATE INDEX IF NOT EXISTS idx_outbox_next ON outbox(next_at) WHERE status IN ('pending', 'typing')",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_user_open ON outbox(user_id, id) WHERE status IN ('pending', 'typing', 'sending')",
+    ]),
+    (10, "Index für Kampagnen (zuletzt proaktiv angeschriebene User)", [
+        "CREATE INDEX IF NOT EXISTS idx_outbox_kind_created ON outbox(kind, created_at)",
+    ]),
+    (11, "Archiv-Zähler in user_stats (Kandidatensuche ohne Scan über messages)", [
+        # message_count zählt archivierte Nachrichten mit (Migration 3) →
+        # heiße Nachrichten = message_count - archived_count
+        _add_archived_count_column,
+        """
+        UPDATE user_stats SET archived_count = COALESCE((
+            SELECT SUM(message_count) FROM message_archive WHERE user_id = user_stats.user_id
+        ), 0)
+        """,
+        "DROP TRIGGER IF EXISTS trg_stats_archive_insert",
+        """
+        CREATE TRIGGER trg_stats_archive_insert AFTER INSERT ON message_archive
+        BEGIN
+            UPDATE user_stats 
+            SET message_count = message_count + NEW.message_count,
+                archived_count = archived_count + NEW.message_count
+            WHERE user_id = NEW.user_id;
+        END
+        """,
+    ]),
+    (12, "Gesprächs-Zusammenfassung als eigene Tabelle statt user_facts", [
+        """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            user_id INTEGER PRIMARY KEY,
+            text TEXT NOT NULL,
+            upto_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO conversation_summaries (user_id, text, upto_id, updated_at)
+        SELECT user_id, json_extract(fact_value, '$.text'),
+               COALESCE(json_extract(fact_value, '$.upto_id'), 0), updated_at
+        FROM user_facts
+        WHERE fact_key = 'conversation_summary' AND fact_type = 'summary'
+          AND json_valid(fact_value) AND json_extract(fact_value, '$.text') IS NOT NULL
+        """,
+        # Trigger halten fact_count, facts_fts und Profil-Versionen konsistent
+        "DELETE FROM user_facts WHERE fact_key = 'conversation_summary' AND fact_type = 'summary'",
+    ]),
+    (13, "messages_fts mit Wörtern pro User (Retrieval-Suche unabhängig von anderen Usern)", [
+        # user_content = content mit User-Präfix vor jedem Wort ("u42xbello"):
+        # ein Präfix-MATCH darauf liest nur Terme und Doclists dieses Users.
+        # Vorher filterte die Retrieval-Suche user_id erst nach dem globalen
+        # MATCH – die Kosten wuchsen mit den Nachrichten aller anderen User.
+        "DROP TRIGGER IF EXISTS trg_fts_messages_insert",
+        "DROP TRIGGER IF EXISTS trg_fts_messages_update",
+        "DROP TABLE IF EXISTS messages_fts",
+        """
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            content, 
+            user_content, 
+            user_id UNINDEXED, 
+            role UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER trg_fts_messages_insert AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO messages_fts (rowid, content, user_content, user_id, role) 
+            VALUES (NEW.id, NEW.content, {_user_terms_sql("NEW.content", "NEW.user_id")}, NEW.user_id, NEW.role);
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_fts_messages_update AFTER UPDATE OF content ON messages
+        BEGIN
+            UPDATE messages_fts 
+            SET content = NEW.content, user_content = {_user_terms_sql("NEW.content", "NEW.user_id")}
+            WHERE rowid = NEW.id;
+        END
+        """,
+        f"""
+        INSERT INTO messages_fts (rowid, content, user_content, user_id, role) 
+        SELECT id, content, {_user_terms_sql("content", "user_id")}, user_id, role FROM messages
+        """,
+        _index_archived_user_terms,
+    ]),
+    (14, "Index für abgelaufene Sende-Leases in der Outbox", [
+        "CREATE INDEX IF NOT EXISTS idx_outbox_sending ON outbox(next_at) WHERE status = 'sending'",
+    ]),
+]
+
+def get_schema_version(conn):
+    """Liest die aktuelle Schema-Version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """
+    Bringt die Datenbank auf den neuesten Stand.
+    Returns: Liste der angewendeten Versionen
+    """
+    current = get_schema_version(conn)
+    applied = []
+    
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        
+        conn.execute("BEGIN IMMEDIATE")
+        
+        # Ein anderer Prozess (Bot/Dashboard) kann parallel migriert haben
+        if get_schema_version(conn) >= version:
+            conn.rollback()
+            continue
+        
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        print(f"  ✓ Migration {version}: {description}")
+        applied.append(version)
+    
+    return applied
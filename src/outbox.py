@@ -0,0 +1,227 @@
+"""
+Durable Outbox: geplante Nachrichten statt schlafender Coroutines.
+
+Vorher hielt handle_message für jede Antwort bis zu ~80 Sekunden lang
+Coroutine, Kontext und Update im Speicher (Human Delay, Pause vor der
+zweiten Nachricht), und ein Neustart verwarf alle ausstehenden Antworten.
+Jetzt wird jede Antwort als Zeile in der outbox-Tabelle (Migration 9) mit
+Fälligkeit geplant, und EIN Dispatcher-Task sendet fällige Typing-Anzeigen
+und Nachrichten – egal ob zehn oder zehntausend Antworten ausstehen.
+
+- Neustart: offene Zeilen bleiben in data/chat.db und werden danach
+  gesendet (zu alte, > OUTBOX_MAX_LATE, verfallen)
+- Reihenfolge: pro User und Art (kind) geht immer nur die älteste offene
+  Zeile raus; gesendet wird über src/delivery.py (Rate Limits, Priorität)
+- kind: live (Antworten), proactive (✨-Button), manual (Dashboard) – auch
+  der Web-Prozess plant nur eine Zeile ein, senden tut der Bot-Prozess
+- Neue User-Nachricht: noch nicht gesendete Antworten werden per
+  cancel_pending_replies() zurückgezogen und neu geplant, geplante
+  proaktive Nachrichten (Kampagnen) verworfen
+- Fehler beim Senden: Retry mit Backoff, nach OUTBOX_MAX_ATTEMPTS 'failed'
+- 'sending' ist eine Lease (OUTBOX_SEND_LEASE): bleibt eine Zeile darin
+  hängen (z.B. complete_outbox schlägt trotz Retries fehl), gibt der
+  Dispatcher sie danach wieder frei, statt den User dauerhaft zu blockieren
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from src.delivery import send_message, send_chat_action, PRIORITIES
+from src.db_async import (
+    enqueue_outbox, cancel_outbox, due_outbox, next_outbox_at, mark_outbox_typing,
+    claim_outbox, complete_outbox, retry_outbox, close_outbox, release_stale_outbox, recover_outbox,
+    get_outbox_counts
+)
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))  # max. Schlaf (Zeilen aus anderen Prozessen)
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "50"))                   # Zeilen pro Durchlauf
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_MAX_LATE = float(os.getenv("OUTBOX_MAX_LATE", "3600"))         # Sekunden über Fälligkeit → verfällt
+OUTBOX_SEND_LEASE = float(os.getenv("OUTBOX_SEND_LEASE", "300"))      # Sekunden 'sending' bis zur Freigabe
+OUTBOX_COMPLETE_ATTEMPTS = int(os.getenv("OUTBOX_COMPLETE_ATTEMPTS", "3"))  # Versuche, den Versand zu speichern
+
+_wakeup = {}  # Event Loop → asyncio.Event (neue Zeile, Dispatcher früher wecken)
+_dispatchers = {}  # Event Loop → Dispatcher-Task
+
+_stats = {"scheduled": 0, "sent": 0, "retried": 0, "failed": 0, "expired": 0, "superseded": 0, "released": 0,
+          "late_ms": []}
+_stats_lock = threading.Lock()
+_LATE_WINDOW = 500
+
+def _add(field, amount=1):
+    with _stats_lock:
+        _stats[field] += amount
+
+def _wake():
+    event = _wakeup.get(asyncio.get_running_loop())
+    if event is not None:
+        event.set()
+
+# ==================== PLANEN ====================
+
+async def schedule_reply(user_id, chat_id, text, delay=0, typing=0, after=None, kind="live", reply_to=None):
+    """
+    Plant eine Nachricht: delay Sekunden warten, dann typing Sekunden
+    Typing-Anzeige, dann senden. after: Bezugspunkt statt jetzt (z.B.
+    Fälligkeit der vorherigen Nachricht) – auch wenn er schon vorbei ist, so
+    zählt die Generierungszeit zur Pause. reply_to: beantwortete User-
+    Nachricht(en), damit eine zurückgezogene Antwort neu geplant werden kann.
+    Returns: Fälligkeit (datetime)
+    """
+    now = datetime.now()
+    start = after or now
+    typing_at = start + timedelta(seconds=delay) if typing else None
+    due_at = max(now, start + timedelta(seconds=delay + typing))
+    await enqueue_outbox(user_id, chat_id, text, due_at, typing_at, kind, reply_to)
+    _add("scheduled")
+    _wake()
+    return due_at
+
+async def cancel_pending_replies(user_id):
+    """
+    Zieht noch nicht gesendete Antworten an den User zurück (eine neuere
+    Nachricht hat sie überholt). Geplante proaktive Nachrichten entfallen
+    ganz – der User hat sich ja gemeldet. Returns: User-Nachrichten, auf die
+    die Antworten antworten sollten (älteste zuerst)
+    """
+    await cancel_outbox(user_id, kind="proactive")
+    reply_to = await cancel_outbox(user_id)
+    if reply_to:
+        _add("superseded", len(reply_to))
+    return reply_to
+
+# ==================== DISPATCHER ====================
+
+async def _deliver(bot, row):
+    """Eine fällige Zeile abarbeiten: Typing-Anzeige oder Nachricht"""
+    now = datetime.now()
+    if (now - row['due_at']).total_seconds() > OUTBOX_MAX_LATE:
+        await close_outbox(row['id'], 'expired')
+        _add("expired")
+        print(f"⌛ Outbox {row['id']} verfallen (fällig seit {row['due_at']:%d.%m. %H:%M})")
+        return
+
+    try:
+        if row['status'] == 'pending' and row['typing_at'] and now < row['due_at']:
+            await send_chat_action(bot, row['chat_id'], PRIORITIES[row['kind']])
+            await mark_outbox_typing(row['id'])
+            return
+
+        lease_until = datetime.now() + timedelta(seconds=OUTBOX_SEND_LEASE)
+        if not await claim_outbox(row['id'], lease_until):
+            return  # inzwischen zurückgezogen
+        await send_message(bot, row['chat_id'], row['text'], PRIORITIES[row['kind']])
+    except Exception as e:
+        attempts = row['attempts'] + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            await close_outbox(row['id'], 'failed', e)
+            _add("failed")
+            print(f"❌ Outbox {row['id']} endgültig fehlgeschlagen: {e}")
+        else:
+            await retry_outbox(row['id'], datetime.now() + timedelta(seconds=2 ** attempts), e)
+            _add("retried")
+            print(f"⚠️  Outbox {row['id']} fehlgeschlagen (Versuch {attempts}), neuer Versuch: {e}")
+        return
+
+    if not await _complete(row):
+        return
+    late_ms = max(0.0, (datetime.now() - row['due_at']).total_seconds() * 1000)
+    with _stats_lock:
+        _stats["sent"] += 1
+        _stats["late_ms"].append(late_ms)
+        del _stats["late_ms"][:-_LATE_WINDOW]
+
+async def _complete(row):
+    """
+    Speichert den Versand, mit eigenem Retry (die Nachricht ist schon raus).
+    Scheitert es endgültig, bleibt die Zeile 'sending' bis zum Lease-Ende.
+    Returns: True, wenn gespeichert
+    """
+    for attempt in range(1, OUTBOX_COMPLETE_ATTEMPTS + 1):
+        try:
+            await complete_outbox(row['id'])
+            return True
+        except Exception as e:
+            if attempt == OUTBOX_COMPLETE_ATTEMPTS:
+                print(f"❌ Outbox {row['id']} gesendet, aber nicht gespeichert: {e} "
+                      f"(Freigabe nach {OUTBOX_SEND_LEASE:g}s)")
+                return False
+            print(f"⚠️  Outbox {row['id']} gesendet, Speichern fehlgeschlagen (Versuch {attempt}): {e}")
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+async def _release_stale():
+    """Gibt hängende 'sending'-Zeilen nach Ablauf der Lease wieder frei"""
+    released = await release_stale_outbox(datetime.now())
+    if released:
+        _add("released", len(released))
+        print(f"🔓 Outbox: {len(released)} hängende Zeile(n) freigegeben ({', '.join(map(str, released))})")
+
+async def dispatch_loop(bot):
+    """
+    Einziger Sende-Task des Prozesses. Schläft bis zur nächsten fälligen
+    Aktion (höchstens OUTBOX_POLL_INTERVAL) oder bis schedule_reply() weckt.
+    Alle OUTBOX_SEND_LEASE / 10 Sekunden werden abgelaufene Leases freigegeben
+    (zwischen zwei Batches – eigene Zeilen sind dann nie mehr in Arbeit).
+    """
+    loop = asyncio.get_running_loop()
+    wakeup = _wakeup[loop] = asyncio.Event()
+    pending = await recover_outbox()
+    if pending:
+        print(f"📮 Outbox: {pending} offene Nachricht(en) beim Start")
+
+    swept = time.monotonic()
+
+    while True:
+        wakeup.clear()
+        try:
+            if time.monotonic() - swept >= OUTBOX_SEND_LEASE / 10:
+                swept = time.monotonic()
+                await _release_stale()
+
+            rows = await due_outbox(datetime.now(), OUTBOX_BATCH)
+            if rows:
+                # Höchstens eine Zeile pro User → parallel senden ist reihenfolgesicher.
+                # Ein Fehler in einer Zeile bricht die anderen nicht ab.
+                results = await asyncio.gather(*(_deliver(bot, row) for row in rows), return_exceptions=True)
+                for row, result in zip(rows, results):
+                    if isinstance(result, BaseException):
+                        print(f"❌ Outbox {row['id']} (User {row['user_id']}): {result!r}")
+                if len(rows) == OUTBOX_BATCH:
+                    continue
+
+            next_at = await next_outbox_at()
+            timeout = OUTBOX_POLL_INTERVAL
+            if next_at is not None:
+                timeout = min(timeout, max(0.0, (next_at - datetime.now()).total_seconds()))
+        except Exception as e:
+            print(f"❌ Outbox-Fehler: {e}")
+            timeout = OUTBOX_POLL_INTERVAL
+
+        if timeout > 0:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+def start_dispatcher(bot):
+    """Startet den Dispatcher im laufenden Event Loop (idempotent). Returns: Task"""
+    loop = asyncio.get_running_loop()
+    task = _dispatchers.get(loop)
+    if task is None or task.done():
+        for stale in [l for l in _dispatchers if l.is_closed()]:
+            _dispatchers.pop(stale, None)
+            _wakeup.pop(stale, None)
+        task = _dispatchers[loop] = asyncio.create_task(dispatch_loop(bot))
+    return task
+
+async def get_outbox_stats():
+    """Offene Zeilen pro Status plus Versand-Kennzahlen (Verspätung ggü. Fälligkeit)"""
+    counts = await get_outbox_counts()
+    with _stats_lock:
+        late = sorted(_stats["late_ms"])
+        stats = {k: v for k, v in _stats.items() if k != "late_ms"}
+    stats["pending"] = counts.get('pending', 0) + counts.get('typing', 0)
+    stats["late_p50_ms"] = round(late[len(late) // 2]) if late else 0
+    stats["late_p95_ms"] = round(late[min(len(late) - 1, int(len(late) * 0.95))]) if late else 0
+    return stats
@@ -0,0 +1,111 @@
+"""
+Langzeit-Gedächtnis: relevante ältere Nachrichten statt immer mehr Verlauf.
+
+Die Agenten sehen nur das Token-Fenster aus src/context.py plus die
+Zusammenfassung. Was ein User vor 300 Nachrichten gesagt hat, ist damit weg,
+wenn der Analyst es nicht als Fakt gespeichert hat. recall() sucht zur
+aktuellen Nachricht die passendsten älteren Nachrichten desselben Users und
+gibt höchstens RETRIEVAL_TOP_K davon zurück, gedeckelt auf
+RETRIEVAL_TOKEN_BUDGET. Der Prompt wächst so nicht mit der Chat-Länge.
+
+Index ist messages_fts (FTS5, bm25): lokal, inkrementell per Trigger bei
+jedem save_message und inkl. archivierter Nachrichten (Migration 4). Gesucht
+wird in den Wörtern pro User (Migration 13), Terme als Präfix mit OR
+verknüpft – eine ältere Nachricht muss nicht alle Wörter enthalten.
+"""
+import os
+import re
+import threading
+import time
+from src.context import estimate_tokens
+from src.db_async import search_user_messages
+from src.gate import STOPWORDS, FILLERS
+
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "1") == "1"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "200"))
+RETRIEVAL_MAX_TERMS = int(os.getenv("RETRIEVAL_MAX_TERMS", "12"))
+RETRIEVAL_MAX_CHARS = 240  # einzelne Treffer kürzen
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# ==================== QUERY ====================
+
+def query_terms(text):
+    """Inhaltswörter der Nachricht (ohne Füllwörter, ab 3 Zeichen, ohne Duplikate)"""
+    terms = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        if len(word) < 3 or word in STOPWORDS or word in FILLERS or word in terms:
+            continue
+        terms.append(word)
+    return terms[:RETRIEVAL_MAX_TERMS]
+
+# ==================== RECALL ====================
+
+_stats = {"queries": 0, "with_hits": 0, "recalled": 0, "time_ms": 0.0}
+_lock = threading.Lock()
+
+async def recall(user_id, text, before_id):
+    """
+    Relevante Nachrichten des Users, die älter als before_id sind
+    (before_id = erste Nachricht des Kontextfensters).
+    Returns: [{id, role, content, timestamp}, ...] chronologisch, ggf. leer
+    """
+    terms = query_terms(text)
+    if not RETRIEVAL_ENABLED or not terms or not before_id:
+        return []
+
+    start = time.perf_counter()
+    try:
+        hits = await search_user_messages(user_id, terms, before_id, RETRIEVAL_TOP_K * 3)
+    except Exception as e:
+        print(f"❌ Retrieval Error: {e}")
+        return []
+
+    selected, used, seen = [], 0, set()
+    for hit in hits:
+        content = hit['content']
+        if content in seen:
+            continue
+        seen.add(content)
+        if len(content) > RETRIEVAL_MAX_CHARS:
+            content = content[:RETRIEVAL_MAX_CHARS] + "…"
+        cost = estimate_tokens(content)
+        if used + cost > RETRIEVAL_TOKEN_BUDGET:
+            continue
+        selected.append({**hit, "content": content})
+        used += cost
+        if len(selected) >= RETRIEVAL_TOP_K:
+            break
+    selected.sort(key=lambda m: m['id'])
+
+    with _lock:
+        _stats["queries"] += 1
+        _stats["with_hits"] += bool(selected)
+        _stats["recalled"] += len(selected)
+        _stats["time_ms"] += (time.perf_counter() - start) * 1000
+
+    if selected:
+        print(f"🧷 {len(selected)} ältere Nachricht(en) abgerufen (~{used} Tokens)")
+    return selected
+
+def format_recalled(messages):
+    """Abgerufene Nachrichten als Prompt-Block, None wenn leer"""
+    if not messages:
+        return None
+    lines = []
+    for m in messages:
+        date = m['timestamp'].strftime('%d.%m.%y') if m.get('timestamp') else 'archiv'
+        lines.append(f"[{date}] {m['role'].upper()}: {m['content']}")
+    return "\n".join(lines)
+
+def get_retrieval_stats():
+    """Wie oft Retrieval lief, wie oft es etwas fand und wie lange es dauerte"""
+    with _lock:
+        queries = _stats["queries"]
+        return {
+            "queries": queries,
+            "hit_rate": round(_stats["with_hits"] / queries, 3) if queries else 0.0,
+            "avg_recalled": round(_stats["recalled"] / queries, 2) if queries else 0.0,
+            "avg_ms": round(_stats["time_ms"] / queries, 2) if queries else 0.0
+        }
@@ -0,0 +1,188 @@
+"""
+Parallele Update-Verarbeitung mit Reihenfolge pro User.
+
+Ohne concurrent_updates arbeitet python-telegram-bot Updates strikt
+nacheinander ab – ein handle_message mit 60s Human Delay blockiert damit
+alle anderen Chats. UserOrderedUpdateProcessor lässt verschiedene User
+parallel laufen, hält aber die Nachrichten EINES Users in Reihenfolge
+(FIFO-Lock pro User).
+
+Wichtig: PTBs eigener Semaphor in process_update() wird VOR
+do_process_update() genommen. Würde er das globale Limit tragen, belegten
+wartende Nachrichten eines Users Slots, die andere User bräuchten. Deshalb
+ist er nur eine großzügige Obergrenze (BOT_MAX_PENDING_UPDATES), das
+eigentliche Limit (BOT_CONCURRENCY) greift erst nach dem User-Lock.
+
+Bursts ("hey" / "kurze frage" / "was kostet sowas"): Der Processor sieht
+jede Nachricht schon beim Eingang, also bevor sie auf den User-Lock wartet,
+und zählt sie pro User hoch. handle_message fragt über current_arrival() /
+wait_unless_newer() ab, ob inzwischen eine neuere Nachricht da ist, und
+übergibt seinen Text dann per hand_over() an den nächsten Lauf, statt
+selbst zu antworten.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from telegram.ext import BaseUpdateProcessor
+
+BOT_CONCURRENCY = int(os.getenv("BOT_CONCURRENCY", "64"))                    # gleichzeitig aktive Updates
+BOT_MAX_PENDING_UPDATES = int(os.getenv("BOT_MAX_PENDING_UPDATES", "10000"))  # inkl. wartender
+BOT_DEBOUNCE_SECONDS = float(os.getenv("BOT_DEBOUNCE_SECONDS", "2"))         # Ruhe-Fenster für Bursts
+
+_stats = {
+    "processed": 0, "active": 0, "waiting_user": 0, "waiting_slot": 0, "max_user_queue": 0, "coalesced": 0
+}
+_stats_lock = threading.Lock()
+
+def _update_key(update):
+    """User-ID (sonst Chat-ID) für die Reihenfolge, None = keine Sortierung nötig"""
+    user = getattr(update, 'effective_user', None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, 'effective_chat', None)
+    return chat.id if chat is not None else None
+
+def _add(field, amount):
+    with _stats_lock:
+        _stats[field] += amount
+
+class _UserQueue:
+    """Zustand pro User: FIFO-Lock, Eingangszähler und an den nächsten Lauf übergebene Texte"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0                # wartende + aktive Updates
+        self.seq = 0                    # Nummer der neuesten eingegangenen Nachricht
+        self.newer = asyncio.Event()    # wird bei jeder neuen Nachricht gesetzt (und ersetzt)
+        self.carry = []                 # Texte abgebrochener Läufe
+
+    def arrive(self):
+        self.seq += 1
+        self.newer.set()
+        self.newer = asyncio.Event()
+        return self.seq
+
+# (Queue, Nummer) des Updates, das gerade im aktuellen Task verarbeitet wird
+_arrival = contextvars.ContextVar("arrival", default=None)
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Globales Limit über alle User, FIFO pro User"""
+
+    def __init__(self, concurrency=None, max_pending=None):
+        super().__init__(max_pending or BOT_MAX_PENDING_UPDATES)
+        self.concurrency = concurrency or BOT_CONCURRENCY
+        self._slots = None
+        self._users = {}
+
+    async def initialize(self):
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    async def shutdown(self):
+        pass
+
+    async def do_process_update(self, update, coroutine):
+        if self._slots is None:
+            await self.initialize()
+
+        key = _update_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        queue = self._users.get(key)
+        if queue is None:
+            queue = self._users[key] = _UserQueue()
+        queue.pending += 1
+        seq = queue.arrive()
+        with _stats_lock:
+            _stats["max_user_queue"] = max(_stats["max_user_queue"], queue.pending)
+
+        try:
+            _add("waiting_user", 1)
+            try:
+                await queue.lock.acquire()
+            finally:
+                _add("waiting_user", -1)
+            try:
+                # Gleicher Task wie der Handler → dort über current_arrival() sichtbar
+                _arrival.set((queue, seq))
+                await self._run(coroutine)
+            finally:
+                queue.lock.release()
+        finally:
+            queue.pending -= 1
+            if queue.pending == 0:
+                del self._users[key]
+
+    async def _run(self, coroutine):
+        _add("waiting_slot", 1)
+        try:
+            await self._slots.acquire()
+        finally:
+            _add("waiting_slot", -1)
+        _add("active", 1)
+        try:
+            await coroutine
+        finally:
+            self._slots.release()
+            _add("active", -1)
+            _add("processed", 1)
+
+# ==================== BURSTS ====================
+
+def current_arrival():
+    """Eingang des aktuell verarbeiteten Updates, None ohne UserOrderedUpdateProcessor"""
+    return _arrival.get()
+
+async def wait_unless_newer(arrival, awaitable):
+    """
+    Wartet auf awaitable, bricht aber ab, sobald eine neuere Nachricht desselben
+    Users eingeht. Returns: True, wenn awaitable durchlief, sonst False.
+    """
+    if arrival is None:
+        await awaitable
+        return True
+
+    queue, seq = arrival
+    task = asyncio.ensure_future(awaitable)
+    if queue.seq != seq:
+        task.cancel()
+        return False
+
+    newer = asyncio.ensure_future(queue.newer.wait())
+    try:
+        await asyncio.wait({task, newer}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        newer.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.wait({task})
+    if task.cancelled():
+        return False
+    task.result()
+    return True
+
+def hand_over(arrival, text):
+    """Übergibt den Text eines abgebrochenen Laufs an den nächsten Lauf desselben Users"""
+    queue, _ = arrival
+    queue.carry.append(text)
+    _add("coalesced", 1)
+
+def merge_burst(arrival, text):
+    """Text inkl. der von abgebrochenen Läufen übergebenen Nachrichten (älteste zuerst)"""
+    if arrival is None or not arrival[0].carry:
+        return text
+    queue, _ = arrival
+    merged = "\n".join(queue.carry + [text])
+    queue.carry.clear()
+    return merged
+
+def get_update_stats():
+    """
+    Aktive und wartende Updates (wartend auf den User bzw. auf einen globalen Slot).
+    coalesced: Läufe, die wegen einer neueren Nachricht im Ruhe-Fenster
+    abgebrochen und mit ihr zusammen beantwortet wurden.
+    """
+    with _stats_lock:
+        return dict(_stats)
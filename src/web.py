@@ -1,30 +1,39 @@
 import sys
 import os
-import requests
-import asyncio
 import json
+from datetime import datetime
 from dotenv import load_dotenv
 from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
 
 # Path setup
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.db import (
-    get_all_users, get_full_chat, get_user, toggle_user_active, 
-    save_message, get_user_facts, toggle_human_mode, update_quiet_hours,
-    get_user_stats, get_contacts, get_lead_signals
+    get_all_users, get_chat_page, get_chat_tail, get_user, toggle_user_active, 
+    get_user_facts, toggle_human_mode, update_quiet_hours,
+    get_user_stats, get_contacts, get_lead_signals, search, SEARCH_SCOPES,
+    get_cache_stats, enqueue_outbox, get_outbox_status, get_delivery_report
 )
-from src.bot import trigger_ai_message, set_global_token, calculate_lead_score
+from src.llm import get_usage_stats, get_breaker_state, run as run_async
+from src.llm_cache import get_llm_cache_stats
+from src.bot import trigger_ai_message, calculate_lead_score
 
 # Load environment
 load_dotenv()
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
-if TELEGRAM_TOKEN:
-    set_global_token(TELEGRAM_TOKEN)
+class DashboardJSONProvider(DefaultJSONProvider):
+    """Zeitstempel (datetime aus der DB) einheitlich als 'YYYY-MM-DD HH:MM:SS'"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return o.strftime("%Y-%m-%d %H:%M:%S")
+        return DefaultJSONProvider.default(o)
 
 # Flask App
 app = Flask(__name__, template_folder='../templates')
+app.json = DashboardJSONProvider(app)
 
 # ==================== PAGES ====================
 
@@ -39,14 +48,13 @@ def chat_view(user_id):
     """Chat-Ansicht mit kompletter Akte"""
     all_users = get_all_users()
     current_user = get_user(user_id)
-    messages = get_full_chat(user_id)
     facts = get_user_facts(user_id)
     
+    # Nachrichten lädt die Seite selbst über /api/chat_data (seitenweise)
     return render_template(
         'chat.html', 
         user=current_user, 
         users=all_users, 
-        messages=messages, 
         facts=facts
     )
 
@@ -81,19 +89,20 @@ def save_settings(user_id):
 @app.route('/api/chat_data/<int:user_id>')
 def get_chat_data(user_id):
     """
-    Liefert alle Chat-Daten als JSON (für Live-Updates).
+    Liefert die Chat-Daten als JSON (für Live-Updates).
     Inkludiert: Messages, Facts, Meta, Lead Score, Toggles
+    Ohne ?after_id die neueste Seite, mit ?after_id nur die neuen Nachrichten
+    danach – der 2-Sekunden-Poll entpackt so nie das Archiv.
     """
     try:
         # Messages
-        raw_messages = get_full_chat(user_id)
-        messages = []
-        for msg in raw_messages:
-            messages.append({
-                "role": msg["role"],
-                "content": msg["content"],
-                "timestamp": msg["timestamp"].split('.')[0] if msg["timestamp"] else ""
-            })
+        after_id = request.args.get('after_id', type=int)
+        has_more = False
+        if after_id is None:
+            raw_messages, has_more = get_chat_page(user_id)
+        else:
+            raw_messages = get_chat_tail(user_id, after_id)
+        messages = [_message_json(msg) for msg in raw_messages]
         
         # Facts (strukturiert)
         all_facts = get_user_facts(user_id)
@@ -113,6 +122,7 @@ def get_chat_data(user_id):
         if not user:
             return jsonify({
                 "messages": messages,
+                "has_more": has_more,
                 "facts": facts,
                 "meta": meta,
                 "lead_score": 0,
@@ -122,6 +132,7 @@ def get_chat_data(user_id):
         
         return jsonify({
             "messages": messages,
+            "has_more": has_more,  # ältere Seiten über /api/chat_history
             "facts": facts,       # Nur die echten Fakten
             "meta": meta,         # Nur die Meta-Infos
             "lead_score": lead_score,
@@ -133,21 +144,44 @@ def get_chat_data(user_id):
         print(f"❌ Fehler bei get_chat_data: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _message_json(msg):
+    return {
+        "id": msg["id"],
+        "role": msg["role"],
+        "content": msg["content"],
+        "timestamp": msg["timestamp"] or ""
+    }
+
+@app.route('/api/chat_history/<int:user_id>')
+def get_chat_history_page(user_id):
+    """Ältere Nachrichten vor ?before_id (eine Seite, ggf. aus dem Archiv)"""
+    try:
+        before_id = request.args.get('before_id', type=int)
+        raw_messages, has_more = get_chat_page(user_id, before_id)
+        return jsonify({
+            "messages": [_message_json(msg) for msg in raw_messages],
+            "has_more": has_more
+        })
+    
+    except Exception as e:
+        print(f"❌ Fehler bei get_chat_history_page: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/user_stats/<int:user_id>')
 def get_user_stats_api(user_id):
     """
     Liefert Statistiken über einen User.
+    Ein einziger Lookup in der user_stats Rollup-Tabelle.
     """
     try:
         stats = get_user_stats(user_id)
-        facts = get_user_facts(user_id)
-        lead_score = calculate_lead_score(facts)
         
         return jsonify({
             "messages": stats['messages'],
             "facts": stats['facts'],
             "contacts": stats['contacts'],
-            "lead_score": lead_score
+            "signals": stats['signals'],
+            "lead_score": stats['lead_score']
         })
     
     except Exception as e:
@@ -176,6 +210,54 @@ def get_user_details(user_id):
         print(f"❌ Fehler bei get_user_details: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/search')
+def search_api():
+    """
+    Volltextsuche über Nachrichten, Fakten und Kontakte.
+    Query-Parameter: q, scope (messages|facts|contacts|all), page, per_page
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        scope = request.args.get('scope', 'all')
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = min(100, max(1, request.args.get('per_page', 20, type=int)))
+        
+        if scope not in SEARCH_SCOPES:
+            return jsonify({"error": f"Ungültiger Scope: {scope}"}), 400
+        
+        return jsonify(search(query, scope=scope, page=page, per_page=per_page))
+    
+    except Exception as e:
+        print(f"❌ Fehler bei search_api: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/outbox/<int:outbox_id>')
+def get_outbox_status_api(outbox_id):
+    """
+    Versand-Status einer geplanten Nachricht (für manuelle Nachrichten):
+    pending/typing → sending → sent | failed | expired | cancelled
+    """
+    try:
+        status = get_outbox_status(outbox_id)
+        if status is None:
+            return jsonify({"error": "Unbekannte Nachricht"}), 404
+        return jsonify(status)
+    
+    except Exception as e:
+        print(f"❌ Fehler bei get_outbox_status_api: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/metrics')
+def metrics_api():
+    """Laufzeit-Kennzahlen des Dashboard-Prozesses (Caches etc.)"""
+    return jsonify({
+        "profile_cache": get_cache_stats(),
+        "llm_usage": get_usage_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "llm_breakers": get_breaker_state(),
+        "delivery": get_delivery_report()
+    })
+
 # ==================== ACTIONS ====================
 
 @app.route('/toggle/<int:user_id>', methods=['POST'])
@@ -209,10 +291,10 @@ def trigger_ai_route(user_id):
     """Löst eine proaktive KI-Nachricht aus (✨ Button)"""
     try:
         print(f"🎯 Triggere proaktive Nachricht für User {user_id}...")
-        success = asyncio.run(trigger_ai_message(user_id))
+        success = run_async(trigger_ai_message(user_id))
         
         if success:
-            return jsonify({"success": True, "message": "Nachricht gesendet"})
+            return jsonify({"success": True, "message": "Nachricht wird gesendet"})
         else:
             return jsonify({"success": False, "error": "Konnte nicht senden"}), 500
     
@@ -222,33 +304,21 @@ def trigger_ai_route(user_id):
 
 @app.route('/send_message/<int:user_id>', methods=['POST'])
 def send_manual_message(user_id):
-    """Sendet eine manuelle Nachricht vom Dashboard"""
+    """
+    Plant eine manuelle Nachricht vom Dashboard (über die Outbox).
+    Gesendet ist sie damit noch nicht – den Versand-Status liefert
+    /api/outbox/<outbox_id>.
+    """
     try:
         text = request.form.get('message')
         
         if not text:
             return jsonify({"success": False, "error": "Keine Nachricht"}), 400
         
-        if not TELEGRAM_TOKEN:
-            return jsonify({"success": False, "error": "Kein Bot-Token"}), 500
-        
-        # Via Telegram API senden
-        send_url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": user_id,
-            "text": text
-        }
-        
-        response = requests.post(send_url, json=payload)
-        
-        if response.status_code == 200:
-            # In DB speichern
-            save_message(user_id, "assistant", text)
-            print(f"✅ Manuelle Nachricht an User {user_id} gesendet")
-            return jsonify({"success": True})
-        else:
-            print(f"❌ Telegram API Fehler: {response.text}")
-            return jsonify({"success": False, "error": response.text}), 500
+        # In die Outbox - der Bot-Prozess sendet (Rate Limits, gespeichert wird beim Versand)
+        outbox_id = enqueue_outbox(user_id, user_id, text, datetime.now(), kind="manual")
+        print(f"✅ Manuelle Nachricht an User {user_id} geplant (Outbox {outbox_id})")
+        return jsonify({"success": True, "queued": True, "outbox_id": outbox_id})
     
     except Exception as e:
         print(f"❌ Fehler bei send_manual_message: {e}")
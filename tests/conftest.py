@@ -0,0 +1,31 @@
+"""
+Gemeinsame Fixtures: jede Test-DB liegt in tmp_path, nie in data/chat.db.
+
+Aufruf (aus dem Repo-Root):
+    python -m pytest -q
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Leitet src.db auf eine leere Datei um (noch ohne Schema)"""
+    from src import db
+    path = tmp_path / "test.db"
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db._profile_cache.clear()
+    yield path
+    db.close_connection()
+    db._profile_cache.clear()
+
+@pytest.fixture
+def temp_db(db_path):
+    """Frische DB mit aktuellem Schema. Returns: das Modul src.db"""
+    from src import db
+    db.init_db()
+    return db
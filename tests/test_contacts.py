@@ -0,0 +1,103 @@
+"""
+Kontakt-Identität (contact_key) und Merge-Regeln von UPSERT_CONTACT_SQL /
+compact_contacts: gleiche Person → eine Zeile, Info ergänzt, bekanntes
+Potential bleibt.
+"""
+import pytest
+
+from src.db import contact_key
+
+@pytest.mark.parametrize("name, relationship", [
+    ("Lisa", "Schwester"),
+    ("lisa ", "schwester"),
+    ("LISA!", "Schwester"),
+    ("  Lisa", " SCHWESTER. "),
+])
+def test_contact_key_normalizes(name, relationship):
+    assert contact_key(name, relationship) == "lisa|schwester"
+
+def test_contact_key_keeps_distinct_people_apart():
+    assert contact_key("Lisa", "Schwester") != contact_key("Lisa", "Freundin")
+    assert contact_key("Lisa Marie", "Schwester") == "lisa marie|schwester"
+    assert contact_key("Lisa-Marie", "Schwester") == "lisa marie|schwester"
+    assert contact_key("Jörg", "Onkel") == "jörg|onkel"
+    assert contact_key(None, None) == "|"
+
+def _contacts(db, user_id=1):
+    return db.get_contacts(user_id)
+
+def test_upsert_merges_same_contact(temp_db):
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    db.add_contact(1, "Lisa", "Schwester", "studiert in köln", "hoch")
+    db.add_contact(1, "lisa ", "schwester", "hat einen hund", "unbekannt")
+
+    contacts = _contacts(db)
+    assert len(contacts) == 1
+    assert contacts[0]["name"] == "Lisa"  # erste Schreibweise bleibt
+    assert contacts[0]["info"] == "studiert in köln; hat einen hund"
+    assert contacts[0]["potential"] == "hoch"
+    assert db.get_user_stats(1)["contacts"] == 1
+
+def test_upsert_info_rules(temp_db):
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    db.add_contact(1, "Tom", "Freund")
+    assert _contacts(db)[0]["info"] == ""
+
+    db.add_contact(1, "Tom", "Freund", "arbeitet bei bmw")    # leer → neue Info
+    db.add_contact(1, "TOM", "Freund", "")                    # leer → keine Änderung
+    db.add_contact(1, "tom", "freund", "arbeitet bei bmw")    # schon enthalten → kein Duplikat
+    db.add_contact(1, "Tom", "Freund", "bmw")                 # Teilstring → schon enthalten
+    assert _contacts(db)[0]["info"] == "arbeitet bei bmw"
+
+    db.add_contact(1, "Tom", "Freund", "fährt motorrad")
+    assert _contacts(db)[0]["info"] == "arbeitet bei bmw; fährt motorrad"
+
+@pytest.mark.parametrize("ignored", ["", "unbekannt", None])
+def test_upsert_potential_not_overwritten_by_unknown(temp_db, ignored):
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    db.add_contact(1, "Lisa", "Schwester", "", "hoch")
+    db.add_contact(1, "Lisa", "Schwester", "", ignored)
+    assert _contacts(db)[0]["potential"] == "hoch"
+
+    db.add_contact(1, "Lisa", "Schwester", "", "niedrig")
+    assert _contacts(db)[0]["potential"] == "niedrig"
+
+def test_upsert_is_per_user(temp_db):
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    db.add_user(2, "ben", "Ben")
+    db.add_contact(1, "Lisa", "Schwester", "a")
+    db.add_contact(2, "Lisa", "Schwester", "b")
+    assert [c["info"] for c in _contacts(db, 1)] == ["a"]
+    assert [c["info"] for c in _contacts(db, 2)] == ["b"]
+
+def test_compact_contacts_matches_upsert_rules(temp_db):
+    """Altbestand ohne contact_key (vor Migration 5) wird genauso zusammengeführt"""
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    conn = db.get_connection()
+    with conn:
+        conn.execute("DROP INDEX idx_user_contacts_identity")
+        conn.executemany("""
+            INSERT INTO user_contacts (user_id, name, relationship, info, potential, created_at)
+            VALUES (1, ?, ?, ?, ?, 0)
+        """, [
+            ("Lisa", "Schwester", "studiert in köln", "unbekannt"),
+            ("lisa ", "schwester", "", "hoch"),
+            ("LISA!", "Schwester", "studiert in köln", ""),
+            ("Lisa", "Schwester", "hat einen hund", "unbekannt"),
+            ("Tom", "Freund", "", "mittel"),
+        ])
+
+    assert db.compact_contacts() == 3
+    rows = conn.execute(
+        "SELECT name, info, potential, contact_key FROM user_contacts ORDER BY id"
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [
+        ("Lisa", "studiert in köln; hat einen hund", "hoch", "lisa|schwester"),
+        ("Tom", "", "mittel", "tom|freund"),
+    ]
+    assert db.compact_contacts() == 0
@@ -0,0 +1,143 @@
+"""
+src/delivery.py mit Fake-Bot: Priorität im globalen Bucket und im Chat,
+RetryAfter-Pause mit Retry-Limit, Weitergabe des Chat-Locks bei Abbruch.
+"""
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from src import delivery
+from src.delivery import LIVE, PROACTIVE, MANUAL, send_message
+
+class FakeBot:
+    """Zeichnet Sendungen auf; failures: Exceptions für die nächsten Aufrufe"""
+
+    def __init__(self, latency=0.0, failures=()):
+        self.latency = latency
+        self.failures = list(failures)
+        self.sent = []
+        self.calls = []
+
+    async def send_message(self, chat_id, text):
+        self.calls.append((time.monotonic(), chat_id))
+        if self.failures:
+            raise self.failures.pop(0)
+        await asyncio.sleep(self.latency)
+        self.sent.append((chat_id, text))
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Eigener Bucket (10/s) und leere Chat-/Statistik-Zustände pro Test"""
+    monkeypatch.setattr(delivery, "_bucket", delivery._PriorityBucket(10))
+    monkeypatch.setattr(delivery, "_next_send", {})
+    monkeypatch.setattr(delivery, "_chats", {})
+    monkeypatch.setattr(delivery, "_stats", {})
+    monkeypatch.setattr(delivery, "TELEGRAM_CHAT_INTERVAL", 0)
+
+# ==================== PRIORITÄT ====================
+
+def test_live_overtakes_queued_proactive_and_manual():
+    bot = FakeBot()
+
+    async def main():
+        tasks = [asyncio.create_task(send_message(bot, chat_id, "manual", MANUAL)) for chat_id in (1, 2, 3)]
+        await asyncio.sleep(0.01)  # chat 1 hat das erste Token, der Rest wartet
+        tasks += [asyncio.create_task(send_message(bot, chat_id, "proactive", PROACTIVE)) for chat_id in (4, 5)]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(send_message(bot, 9, "live", LIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert [chat_id for chat_id, _ in bot.sent] == [1, 9, 4, 5, 2, 3]
+    stats = delivery.get_delivery_stats()
+    assert (stats["live"]["sent"], stats["proactive"]["sent"], stats["manual"]["sent"]) == (1, 2, 3)
+
+def test_live_in_same_chat_boosts_queued_manual():
+    """Prioritätsvererbung: die manuelle Nachricht vor der Live-Antwort im Chat wird vorgezogen"""
+    bot = FakeBot()
+
+    async def main():
+        tasks = [asyncio.create_task(send_message(bot, chat_id, "andere", MANUAL)) for chat_id in (2, 3, 4)]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(send_message(bot, 1, "manual", MANUAL)))
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(send_message(bot, 1, "live", LIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert bot.sent == [(2, "andere"), (1, "manual"), (1, "live"), (3, "andere"), (4, "andere")]
+
+# ==================== RETRY AFTER ====================
+
+def test_retry_after_pauses_all_chats():
+    bot = FakeBot(failures=[RetryAfter(0.3)])
+
+    async def main():
+        first = asyncio.create_task(send_message(bot, 1, "erst 429", LIVE))
+        await asyncio.sleep(0.01)
+        other = asyncio.create_task(send_message(bot, 2, "anderer chat", LIVE))
+        await asyncio.gather(first, other)
+
+    asyncio.run(main())
+    flood_at = bot.calls[0][0]
+    assert sorted(bot.sent) == [(1, "erst 429"), (2, "anderer chat")]
+    assert all(at - flood_at >= 0.29 for at, _ in bot.calls[1:])
+    assert delivery.get_delivery_stats()["live"]["retry_after"] == 1
+
+def test_retry_after_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(delivery, "TELEGRAM_MAX_RETRIES", 2)
+    bot = FakeBot(failures=[RetryAfter(0.05)] * 5)
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(send_message(bot, 1, "geht nicht", PROACTIVE))
+
+    assert len(bot.calls) == 3  # 1 + TELEGRAM_MAX_RETRIES
+    stats = delivery.get_delivery_stats()["proactive"]
+    assert (stats["sent"], stats["failed"], stats["retry_after"]) == (0, 1, 3)
+    assert delivery._chats == {}
+
+def test_other_errors_are_not_retried():
+    bot = FakeBot(failures=[RuntimeError("chat not found")])
+    with pytest.raises(RuntimeError):
+        asyncio.run(send_message(bot, 1, "weg", LIVE))
+    assert len(bot.calls) == 1
+
+# ==================== ABBRUCH ====================
+
+def test_cancelled_waiter_passes_handed_lock_on():
+    async def main():
+        chat = delivery._Chat()
+        await chat.acquire(LIVE)
+        handed = asyncio.create_task(chat.acquire(LIVE))
+        waiting = asyncio.create_task(chat.acquire(MANUAL))
+        await asyncio.sleep(0)
+
+        chat.release()      # Lock geht an handed …
+        handed.cancel()     # … der abgebrochen wird, bevor er läuft
+        await asyncio.gather(handed, return_exceptions=True)
+
+        await asyncio.wait_for(waiting, 1)  # kein Deadlock: weitergereicht
+        assert chat.locked
+        chat.release()
+        assert not chat.locked
+
+    asyncio.run(main())
+
+def test_cancelled_send_does_not_block_chat():
+    bot = FakeBot(latency=0.1)
+
+    async def main():
+        first = asyncio.create_task(send_message(bot, 1, "eins", LIVE))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.create_task(send_message(bot, 1, "zwei", LIVE))
+        last = asyncio.create_task(send_message(bot, 1, "drei", MANUAL))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.wait_for(asyncio.gather(first, last), 2)
+        assert cancelled.cancelled()
+
+    asyncio.run(main())
+    assert bot.sent == [(1, "eins"), (1, "drei")]
+    assert delivery._chats == {}
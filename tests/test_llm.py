@@ -0,0 +1,269 @@
+"""
+src/llm.py gegen benchmarks/fake_openai.py: Retries, Retry-After, Timeout pro
+Agent, Semaphoren, Circuit Breaker, Fallback-Kette, Cache und Client-Lebensdauer.
+"""
+import asyncio
+import sys
+import time
+
+import openai
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_openai import DEFAULT_CONFIG, start_server
+from src import llm, llm_cache
+from src.agent_config import BASE
+
+MESSAGES = [{"role": "user", "content": "hey"}]
+
+@pytest.fixture(scope="module")
+def server():
+    server, url = start_server()
+    yield server, url
+    server.shutdown()
+
+@pytest.fixture
+def fake(server, monkeypatch):
+    """Frischer Server-Zustand, schnelle Backoffs, leere Breaker/Statistik"""
+    srv, url = server
+    # Requests aus dem vorigen Test (Timeout-Test) auslaufen lassen, sonst zählt peak sie mit
+    deadline = time.monotonic() + 5
+    while srv.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    srv.config.update(DEFAULT_CONFIG, latency_ms=20, jitter_ms=0, retry_after=0)
+    srv.window.clear()
+    srv.requests = srv.peak = 0
+    monkeypatch.setenv("OPENAI_BASE_URL", url)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 3)
+    monkeypatch.setattr(llm, "LLM_BREAKER_THRESHOLD", 100)
+    monkeypatch.setattr(llm, "_breakers", {})
+    monkeypatch.setattr(llm, "_usage", {})
+    monkeypatch.setattr(llm, "_latencies", {})
+    monkeypatch.setattr(llm, "_request_bucket", llm.TokenBucket(100_000))
+    monkeypatch.setattr(llm, "_token_bucket", llm.TokenBucket(100_000_000))
+    use_config(monkeypatch)
+    return srv
+
+def use_config(monkeypatch, **overrides):
+    """Agent-Konfiguration für alle Agenten im Test (statt Env/TOML)"""
+    config = {**BASE, "params": {}, "timeout": 5.0, **overrides}
+    monkeypatch.setattr(llm, "get_agent_config", lambda agent: {**config, "fallback": list(config["fallback"])})
+
+def run(coro):
+    return llm.run(coro)
+
+# ==================== RETRIES ====================
+
+def test_retries_429_and_5xx(fake):
+    fake.config["script"] = (429, 500, 503)
+    response = run(llm.chat("test", MESSAGES))
+
+    assert response.choices[0].message.content == DEFAULT_CONFIG["reply"]
+    assert fake.requests == 4
+    usage = llm.get_usage_stats()["test"]
+    assert (usage["calls"], usage["retries"], usage["failures"]) == (1, 3, 3)
+
+def test_retries_exhausted(fake):
+    fake.config["script"] = (500,) * 4
+    with pytest.raises(llm.LLMUnavailable):
+        run(llm.chat("test", MESSAGES))
+    assert fake.requests == 4  # 1 + LLM_MAX_RETRIES
+
+def test_client_errors_are_not_retried(fake):
+    fake.config["script"] = (400,)
+    with pytest.raises(openai.BadRequestError):
+        run(llm.chat("test", MESSAGES))
+    assert fake.requests == 1
+    assert llm.get_breaker_state()[BASE["model"]]["state"] == "closed"
+
+def test_waits_for_retry_after(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.0)
+    fake.config.update(script=(429,), retry_after=1)
+
+    start = time.perf_counter()
+    run(llm.chat("test", MESSAGES))
+    elapsed = time.perf_counter() - start
+
+    assert fake.requests == 2
+    assert 1.0 <= elapsed < 1.5
+
+# ==================== TIMEOUT ====================
+
+def test_agent_timeout(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 0)
+    use_config(monkeypatch, timeout=0.3)
+    fake.config["latency_ms"] = 1000
+
+    start = time.perf_counter()
+    with pytest.raises(llm.LLMUnavailable) as info:
+        run(llm.chat("test", MESSAGES))
+    elapsed = time.perf_counter() - start
+
+    assert isinstance(info.value.__cause__, llm._RETRYABLE)
+    assert elapsed < 1.0
+
+def test_wait_for_bounds_a_hanging_client(fake, monkeypatch):
+    """Auch wenn der HTTP-Client sein Timeout ignoriert, bricht wait_for nach timeout + 1 ab"""
+    async def hang(**kwargs):
+        await asyncio.sleep(60)
+
+    async def main():
+        monkeypatch.setattr(llm.get_client().chat.completions, "create", hang)
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await llm._create(MESSAGES, "gpt-4o-mini", {}, timeout=0.2)
+        return time.perf_counter() - start
+
+    assert run(main()) < 2.0
+
+# ==================== SEMAPHOREN ====================
+
+def test_model_semaphore(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_CONCURRENCY", 10)
+    monkeypatch.setattr(llm, "LLM_MODEL_CONCURRENCY", 2)
+    fake.config["latency_ms"] = 100
+
+    async def main():
+        await asyncio.gather(*(llm.chat("test", MESSAGES) for _ in range(8)))
+
+    run(main())
+    assert fake.requests == 8
+    assert fake.peak == 2
+
+def test_global_semaphore(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(llm, "LLM_MODEL_CONCURRENCY", 2)
+    fake.config["latency_ms"] = 100
+
+    async def main():
+        await asyncio.gather(*(
+            llm.chat("test", MESSAGES, model=model)
+            for model in ("model-a", "model-b", "model-c") for _ in range(4)
+        ))
+
+    run(main())
+    assert fake.requests == 12
+    assert fake.peak == 3
+
+# ==================== CIRCUIT BREAKER ====================
+
+def test_breaker_cycle(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(llm, "LLM_BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(llm, "LLM_BREAKER_COOLDOWN", 0.3)
+    model = BASE["model"]
+
+    def state():
+        return llm.get_breaker_state()[model]["state"]
+
+    fake.config["down"] = True
+    with pytest.raises(llm.LLMUnavailable):
+        run(llm.chat("test", MESSAGES))
+    assert state() == "closed"
+    with pytest.raises(llm.LLMUnavailable):
+        run(llm.chat("test", MESSAGES))
+    assert state() == "open"
+
+    # offen: sofort ablehnen, ohne Request
+    with pytest.raises(llm.LLMUnavailable, match="Circuit Breaker"):
+        run(llm.chat("test", MESSAGES))
+    assert fake.requests == 2
+    assert llm.get_usage_stats()["test"]["rejected"] == 1
+
+    # half_open: fehlgeschlagene Probe öffnet wieder
+    time.sleep(0.35)
+    assert state() == "half_open"
+    with pytest.raises(llm.LLMUnavailable):
+        run(llm.chat("test", MESSAGES))
+    assert fake.requests == 3
+    assert state() == "open"
+
+    # half_open: erfolgreiche Probe schließt
+    time.sleep(0.35)
+    fake.config["down"] = False
+    run(llm.chat("test", MESSAGES))
+    assert llm.get_breaker_state()[model] == {"state": "closed", "consecutive_failures": 0, "trips": 2}
+
+def test_breaker_ignores_429(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_BREAKER_THRESHOLD", 2)
+    fake.config["script"] = (429, 429, 429)
+    run(llm.chat("test", MESSAGES))
+    assert llm.get_breaker_state()[BASE["model"]]["state"] == "closed"
+
+# ==================== FALLBACK ====================
+
+def test_fallback_chain(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 1)
+    use_config(monkeypatch, model="model-a", fallback=["model-b", "model-c"])
+    fake.config["fail_models"] = ("model-a", "model-b")
+
+    response = run(llm.chat("test", MESSAGES))
+
+    assert response.model == "model-c"
+    assert fake.requests == 5  # je 2 Versuche auf a und b, dann c
+    usage = llm.get_usage_stats()["test"]
+    assert usage["fallbacks"] == 2
+    assert usage["models"] == {"model-c": 1}
+
+def test_fallback_raises_only_when_all_fail(fake, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 0)
+    use_config(monkeypatch, model="model-a", fallback=["model-b", "model-c"])
+    fake.config["fail_models"] = ("model-a", "model-b", "model-c")
+
+    with pytest.raises(llm.LLMUnavailable, match="InternalServerError"):
+        run(llm.chat("test", MESSAGES))
+    assert fake.requests == 3
+
+def test_fallback_skips_open_breaker(fake, monkeypatch):
+    use_config(monkeypatch, model="model-a", fallback=["model-b"])
+    breaker = llm._breaker("model-a")
+    breaker.opened_at = time.monotonic()
+
+    response = run(llm.chat("test", MESSAGES))
+    assert response.model == "model-b"
+    assert fake.requests == 1
+
+# ==================== CACHE ====================
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_backend", llm_cache.MemoryBackend(100))
+    monkeypatch.setattr(llm_cache, "CACHED_AGENTS", {"test": 60})
+
+def test_cache_hit_for_primary(fake, memory_cache):
+    run(llm.chat("test", MESSAGES))
+    response = run(llm.chat("test", MESSAGES))
+    assert response.choices[0].message.content == DEFAULT_CONFIG["reply"]
+    assert fake.requests == 1
+
+def test_cache_skips_routed_and_fallback_responses(fake, memory_cache, monkeypatch):
+    use_config(monkeypatch, model="model-a", small_model="model-small", small_under_tokens=1000)
+    run(llm.chat("test", MESSAGES))
+    run(llm.chat("test", MESSAGES))
+    assert fake.requests == 2
+
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 0)
+    use_config(monkeypatch, model="model-a", fallback=["model-b"])
+    fake.config["fail_models"] = ("model-a",)
+    fake.requests = 0
+    run(llm.chat("test", MESSAGES))
+    fake.config["fail_models"] = ()
+    response = run(llm.chat("test", MESSAGES))
+    assert response.model == "model-a"
+    assert fake.requests == 3
+
+# ==================== CLIENT ====================
+
+def test_run_closes_client(fake):
+    async def main():
+        await llm.chat("test", MESSAGES)
+        return llm.get_client()
+
+    client = llm.run(main())
+    assert client.is_closed()
+    assert len(llm._loop_state) == 0
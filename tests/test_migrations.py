@@ -0,0 +1,192 @@
+"""
+Upgrade einer DB im Baseline-Schema (vor Migration 1) auf den aktuellen Stand.
+
+Die Baseline speicherte Zeitstempel als Text (datetime-Repr, lokale Zeit),
+Kontakte ohne Identität und keine Zähler. init_db() muss daraus Epoch-ms,
+zusammengeführte Kontakte, user_stats und die FTS-Indizes machen.
+"""
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+
+from src import migrations
+
+# DDL wie in src/db.py der Baseline (vor Migration 1)
+BASELINE_SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        joined_at TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1,
+        human_mode BOOLEAN DEFAULT 1,
+        quiet_start INTEGER DEFAULT 23,
+        quiet_end INTEGER DEFAULT 7,
+        last_message_at TIMESTAMP
+    );
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        role TEXT,
+        content TEXT,
+        timestamp TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+    CREATE TABLE user_facts (
+        user_id INTEGER,
+        fact_key TEXT,
+        fact_value TEXT,
+        fact_type TEXT DEFAULT 'fact',
+        updated_at TIMESTAMP,
+        PRIMARY KEY (user_id, fact_key),
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+    CREATE TABLE user_contacts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        name TEXT,
+        relationship TEXT,
+        info TEXT,
+        potential TEXT,
+        created_at TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+    CREATE TABLE lead_signals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        signal TEXT,
+        category TEXT,
+        timestamp TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+"""
+
+JOINED = datetime(2024, 3, 1, 10, 15, 30, 123000)
+MESSAGES = [
+    (datetime(2024, 3, 1, 10, 16, 0), 'user', 'hey, mein hund heißt bello'),
+    (datetime(2024, 3, 1, 10, 16, 45, 500000), 'assistant', 'süß! was für einer?'),
+    (datetime(2024, 3, 2, 21, 5, 12), 'user', 'ein labrador, und meine schwester lisa hat auch einen'),
+]
+
+def _text(value):
+    """So hat der Standard-Adapter von sqlite3 datetime gespeichert"""
+    return value.isoformat(" ")
+
+def build_baseline(path):
+    """Baseline-DB mit einem User, Nachrichten, Fakten, doppelten Kontakten und Signal"""
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    last = MESSAGES[-1][0]
+    conn.execute("""
+        INSERT INTO users (id, username, first_name, joined_at, human_mode, quiet_start, quiet_end, last_message_at)
+        VALUES (1, 'anna', 'Anna', ?, 1, 23, 7, ?)
+    """, (_text(JOINED), _text(last)))
+    conn.executemany(
+        "INSERT INTO messages (user_id, role, content, timestamp) VALUES (1, ?, ?, ?)",
+        [(role, content, _text(ts)) for ts, role, content in MESSAGES]
+    )
+    conn.executemany(
+        "INSERT INTO user_facts (user_id, fact_key, fact_value, fact_type, updated_at) VALUES (1, ?, ?, ?, ?)",
+        [('haustier', 'hund (bello)', 'fact', _text(last)), ('lead_score', '7', 'score', _text(last))]
+    )
+    conn.executemany("""
+        INSERT INTO user_contacts (user_id, name, relationship, info, potential, created_at)
+        VALUES (1, ?, ?, ?, ?, ?)
+    """, [
+        ('Lisa', 'Schwester', 'hat einen labrador', 'hoch', _text(last)),
+        ('lisa ', 'schwester', 'wohnt in köln', 'unbekannt', _text(last)),
+        ('Tom', 'Freund', '', 'mittel', _text(last)),
+    ])
+    conn.execute(
+        "INSERT INTO lead_signals (user_id, signal, category, timestamp) VALUES (1, 'fragt nach Versicherung', 'interest', ?)",
+        (_text(last),)
+    )
+    conn.commit()
+    conn.close()
+
+def test_baseline_upgrade(db_path):
+    from src import db
+    build_baseline(db_path)
+
+    db.init_db()
+    conn = db.get_connection()
+
+    assert migrations.get_schema_version(conn) == migrations.MIGRATIONS[-1][0]
+
+    # Zeitstempel: überall Integer (Epoch-ms), zurück als dieselbe lokale Zeit
+    for table, col in migrations._TIMESTAMP_COLUMNS:
+        types = {row[0] for row in conn.execute(f"SELECT DISTINCT typeof({col}) FROM {table}")}
+        assert types <= {'integer', 'null'}, (table, col, types)
+    user = db.get_user(1)
+    assert user['joined_at'] == JOINED
+    assert bool(user['is_active']) and bool(user['human_mode'])
+    chat = db.get_full_chat(1)
+    assert [m['timestamp'] for m in chat] == [ts for ts, _, _ in MESSAGES]
+
+    # Kontakte: "Lisa"/"lisa " → eine Zeile, Info verbunden, Potential nicht von 'unbekannt' überschrieben
+    contacts = {c['name']: c for c in db.get_contacts(1)}
+    assert set(contacts) == {'Lisa', 'Tom'}
+    assert contacts['Lisa']['info'] == 'hat einen labrador; wohnt in köln'
+    assert contacts['Lisa']['potential'] == 'hoch'
+    rows = conn.execute("SELECT contact_key FROM user_contacts ORDER BY id").fetchall()
+    assert [row[0] for row in rows] == ['lisa|schwester', 'tom|freund']
+
+    # user_stats aus dem Bestand hochgerechnet und nach dem Zusammenführen stimmig
+    stats = db.get_user_stats(1)
+    assert stats['messages'] == 3
+    assert stats['facts'] == 2
+    assert stats['contacts'] == 2
+    assert stats['signals'] == 1
+    assert stats['lead_score'] == 7
+    assert stats['last_message'] == MESSAGES[-1][2]
+    assert stats['last_message_at'] == MESSAGES[-1][0]
+
+    # FTS: Bestand ist indiziert, global und pro User
+    assert [r['id'] for r in db.search('bello', scope='messages')['results']] == [1]
+    assert [r['id'] for r in db.search('köln', scope='contacts')['results']]
+    assert [m['id'] for m in db.search_user_messages(1, ['labrador'], before_id=10)] == [3]
+
+    # Neue Zeilen laufen über die Trigger weiter
+    db.save_message(1, 'user', 'nochmal zu bello')
+    assert db.get_user_stats(1)['messages'] == 4
+    db.add_contact(1, 'LISA!', 'Schwester', 'wohnt in köln', 'unbekannt')
+    assert db.get_user_stats(1)['contacts'] == 2
+
+def test_archive_payload_timestamps(db_path, monkeypatch):
+    """Segmente aus der Zeit vor Migration 7 enthalten Text-Zeitstempel"""
+    from src import db
+    build_baseline(db_path)
+
+    # Stand nach Migration 6: Archiv existiert, Zeitstempel noch Text
+    all_migrations = migrations.MIGRATIONS
+    monkeypatch.setattr(migrations, "MIGRATIONS", [m for m in all_migrations if m[0] <= 6])
+    db.init_db()
+    conn = db.get_connection()
+    archived = conn.execute(
+        "SELECT id, role, content, CAST(timestamp AS TEXT) AS timestamp FROM messages WHERE id <= 2 ORDER BY id"
+    ).fetchall()
+    payload = zlib.compress(json.dumps([list(row) for row in archived]).encode('utf-8'))
+    with conn:
+        conn.execute("DELETE FROM messages WHERE id <= 2")
+        conn.execute("""
+            INSERT INTO message_archive (user_id, first_message_id, last_message_id, first_timestamp,
+                                         last_timestamp, message_count, payload)
+            VALUES (1, 1, 2, ?, ?, 2, ?)
+        """, (archived[0]['timestamp'], archived[1]['timestamp'], payload))
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations)
+    db.init_db()
+
+    messages, has_more = db.get_chat_page(1)
+    assert not has_more
+    assert [(m['id'], m['timestamp']) for m in messages] == [
+        (i + 1, ts) for i, (ts, _, _) in enumerate(MESSAGES)
+    ]
+    segment = conn.execute("SELECT first_timestamp, last_timestamp FROM message_archive").fetchone()
+    assert (segment[0], segment[1]) == (MESSAGES[0][0], MESSAGES[1][0])
+
+    stats = conn.execute("SELECT message_count, archived_count FROM user_stats WHERE user_id = 1").fetchone()
+    assert tuple(stats) == (3, 2)
+    # Archivierte Nachrichten bleiben nach dem FTS-Neuaufbau (Migration 13) auffindbar
+    assert [m['id'] for m in db.search_user_messages(1, ['bello'], before_id=10)] == [1]
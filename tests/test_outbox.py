@@ -0,0 +1,229 @@
+"""
+Outbox (Migration 9, src/db.py + src/outbox.py): Reihenfolge, Lease,
+Freigabe nach Absturz, Zurückziehen, Verfall und Versand.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src import outbox
+
+NOW = datetime.now().replace(microsecond=0)
+
+def ago(seconds):
+    return NOW - timedelta(seconds=seconds)
+
+def status(db, outbox_id):
+    return db.get_outbox_status(outbox_id)['status']
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.actions = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent))
+
+    async def send_chat_action(self, chat_id, action):
+        self.actions.append(chat_id)
+
+@pytest.fixture
+def db(temp_db):
+    for user_id in (1, 2, 3):
+        temp_db.add_user(user_id, f"user{user_id}", f"User {user_id}")
+    return temp_db
+
+# ==================== REIHENFOLGE ====================
+
+def test_due_outbox_oldest_open_per_user_and_kind(db):
+    a1 = db.enqueue_outbox(1, 1, "a1", ago(30))
+    a2 = db.enqueue_outbox(1, 1, "a2", ago(60))  # früher fällig, aber nach a1 geplant
+    b1 = db.enqueue_outbox(2, 2, "b1", ago(10))
+    p1 = db.enqueue_outbox(1, 1, "p1", ago(90), kind="proactive")
+    m1 = db.enqueue_outbox(3, 3, "m1", ago(120), kind="manual")
+    db.enqueue_outbox(2, 2, "später", NOW + timedelta(hours=1))
+
+    # live vor proactive vor manual, innerhalb nach Fälligkeit
+    assert [row['id'] for row in db.due_outbox(NOW)] == [a1, b1, p1, m1]
+    assert [row['id'] for row in db.due_outbox(NOW, limit=2)] == [a1, b1]
+
+    # 'sending' blockiert die nächste Zeile des Users weiterhin
+    assert db.claim_outbox(a1, NOW + timedelta(minutes=5))
+    assert a2 not in [row['id'] for row in db.due_outbox(NOW)]
+
+    db.complete_outbox(a1)
+    assert [row['id'] for row in db.due_outbox(NOW)][:2] == [a2, b1]
+
+def test_next_outbox_at_and_typing(db):
+    assert db.next_outbox_at() is None
+    outbox_id = db.enqueue_outbox(1, 1, "hallo", NOW + timedelta(seconds=10), typing_at=NOW + timedelta(seconds=4))
+    assert db.next_outbox_at() == NOW + timedelta(seconds=4)
+
+    db.mark_outbox_typing(outbox_id)
+    assert status(db, outbox_id) == 'typing'
+    assert db.next_outbox_at() == NOW + timedelta(seconds=10)
+
+# ==================== LEASE ====================
+
+def test_claim_is_a_lease(db):
+    outbox_id = db.enqueue_outbox(1, 1, "hallo", ago(1))
+    lease = NOW + timedelta(minutes=5)
+
+    assert db.claim_outbox(outbox_id, lease) is True
+    assert db.claim_outbox(outbox_id, lease) is False
+    assert status(db, outbox_id) == 'sending'
+    assert db.next_outbox_at() is None  # 'sending' ist keine offene Aktion
+
+    cancelled = db.enqueue_outbox(2, 2, "weg", ago(1))
+    db.cancel_outbox(2)
+    assert db.claim_outbox(cancelled, lease) is False
+
+def test_release_stale_outbox(db):
+    stale = db.enqueue_outbox(1, 1, "hängt", ago(600))
+    fresh = db.enqueue_outbox(2, 2, "läuft", ago(5))
+    db.claim_outbox(stale, ago(1))
+    db.claim_outbox(fresh, NOW + timedelta(minutes=5))
+
+    assert db.release_stale_outbox(NOW) == [stale]
+    row = db.get_outbox_status(stale)
+    assert row['status'] == 'pending'
+    assert row['attempts'] == 1
+    assert 'Lease' in row['error']
+    assert status(db, fresh) == 'sending'
+
+    # wieder fällig und als älteste offene Zeile des Users dran
+    assert [r['id'] for r in db.due_outbox(NOW)] == [stale]
+    assert db.release_stale_outbox(NOW) == []
+
+def test_recover_outbox_after_crash(db):
+    sending = db.enqueue_outbox(1, 1, "mitten im senden", ago(20))
+    db.enqueue_outbox(1, 1, "danach", ago(10))
+    db.enqueue_outbox(2, 2, "geplant", NOW + timedelta(seconds=30), typing_at=NOW + timedelta(seconds=20))
+    sent = db.enqueue_outbox(3, 3, "raus", ago(30))
+    db.claim_outbox(sending, NOW + timedelta(minutes=5))
+    db.claim_outbox(sent, NOW + timedelta(minutes=5))
+    db.complete_outbox(sent)
+
+    assert db.recover_outbox() == 3
+    assert status(db, sending) == 'pending'
+    assert status(db, sent) == 'sent'
+    # sofort wieder fällig (next_at = due_at statt Lease-Ende)
+    assert [row['id'] for row in db.due_outbox(NOW)] == [sending]
+
+# ==================== ZURÜCKZIEHEN ====================
+
+def test_cancel_outbox_returns_reply_to(db):
+    first = db.enqueue_outbox(1, 1, "antwort 1", ago(1), reply_to="hey")
+    db.enqueue_outbox(1, 1, "antwort 2", NOW + timedelta(seconds=5))
+    db.enqueue_outbox(1, 1, "antwort 3", NOW + timedelta(seconds=9), reply_to="kurze frage")
+    proactive = db.enqueue_outbox(1, 1, "na?", NOW + timedelta(hours=1), kind="proactive", reply_to="x")
+    other = db.enqueue_outbox(2, 2, "andere", ago(1), reply_to="y")
+    db.claim_outbox(first, NOW + timedelta(minutes=5))  # schon im Versand → bleibt
+
+    assert db.cancel_outbox(1) == ["kurze frage"]
+    assert db.get_outbox_counts() == {'sending': 1, 'cancelled': 2, 'pending': 2}
+    assert status(db, proactive) == 'pending'
+    assert status(db, other) == 'pending'
+    assert db.cancel_outbox(1) == []
+
+def test_cancel_pending_replies_merges_superseded(db):
+    """Neue User-Nachricht: Antworten zurückziehen, Kampagnen verwerfen, Texte zusammen neu beantworten"""
+    db.enqueue_outbox(1, 1, "antwort 1", NOW + timedelta(seconds=5), reply_to="hey")
+    db.enqueue_outbox(1, 1, "antwort 2", NOW + timedelta(seconds=9), reply_to="kurze frage")
+    proactive = db.enqueue_outbox(1, 1, "na?", NOW + timedelta(hours=1), kind="proactive")
+    before = asyncio.run(outbox.get_outbox_stats())["superseded"]
+    reply_to = asyncio.run(outbox.cancel_pending_replies(1))
+
+    assert "\n".join(reply_to + ["was kostet sowas"]) == "hey\nkurze frage\nwas kostet sowas"
+    assert status(db, proactive) == 'cancelled'
+    stats = asyncio.run(outbox.get_outbox_stats())
+    assert stats["superseded"] - before == 2
+    assert stats["pending"] == 0
+
+# ==================== VERSAND ====================
+
+def test_complete_outbox_writes_message_in_same_transaction(db):
+    outbox_id = db.enqueue_outbox(1, 1, "bin gleich da", ago(1))
+    db.claim_outbox(outbox_id, NOW + timedelta(minutes=5))
+
+    db.complete_outbox(outbox_id)
+
+    row = db.get_outbox_status(outbox_id)
+    assert (row['status'], row['attempts']) == ('sent', 1)
+    last = db.get_full_chat(1)[-1]
+    assert (last['role'], last['content']) == ('assistant', "bin gleich da")
+    assert last['timestamp'] == row['sent_at']
+    assert db.get_user_stats(1)['messages'] == 1
+
+def test_complete_outbox_rolls_back_together(db):
+    outbox_id = db.enqueue_outbox(1, 1, "geht schief", ago(1))
+    db.claim_outbox(outbox_id, NOW + timedelta(minutes=5))
+    conn = db.get_connection()
+    conn.execute("""
+        CREATE TEMP TRIGGER fail_insert BEFORE INSERT ON messages
+        BEGIN SELECT RAISE(ABORT, 'disk full'); END
+    """)
+
+    with pytest.raises(Exception, match="disk full"):
+        db.complete_outbox(outbox_id)
+
+    assert status(db, outbox_id) == 'sending'
+    assert db.get_full_chat(1) == []
+
+def test_deliver_sends_and_completes(db):
+    outbox_id = db.enqueue_outbox(1, 101, "hallo", ago(1))
+    row = db.due_outbox(datetime.now())[0]
+    bot = FakeBot()
+
+    asyncio.run(outbox._deliver(bot, row))
+
+    assert bot.sent == [(101, "hallo")]
+    assert status(db, outbox_id) == 'sent'
+    assert db.get_full_chat(1)[-1]['content'] == "hallo"
+
+def test_deliver_skips_cancelled_row(db):
+    outbox_id = db.enqueue_outbox(1, 102, "überholt", ago(1))
+    row = db.due_outbox(datetime.now())[0]
+    db.cancel_outbox(1)
+    bot = FakeBot()
+
+    asyncio.run(outbox._deliver(bot, row))
+
+    assert bot.sent == []
+    assert status(db, outbox_id) == 'cancelled'
+
+def test_deliver_expires_after_max_late(db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_LATE", 60)
+    late = db.enqueue_outbox(1, 103, "zu spät", ago(120))
+    on_time = db.enqueue_outbox(2, 104, "knapp", ago(30))
+    bot = FakeBot()
+
+    async def main():
+        for row in db.due_outbox(datetime.now()):
+            await outbox._deliver(bot, row)
+
+    asyncio.run(main())
+
+    assert status(db, late) == 'expired'
+    assert status(db, on_time) == 'sent'
+    assert bot.sent == [(104, "knapp")]
+
+def test_deliver_retries_then_fails(db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    outbox_id = db.enqueue_outbox(1, 105, "kaputt", ago(1))
+
+    class BrokenBot(FakeBot):
+        async def send_message(self, chat_id, text):
+            raise RuntimeError("network down")
+
+    row = db.due_outbox(datetime.now())[0]
+    asyncio.run(outbox._deliver(BrokenBot(), row))
+    retry = db.get_outbox_status(outbox_id)
+    assert (retry['status'], retry['attempts'], retry['error']) == ('pending', 1, "network down")
+
+    row = dict(row, attempts=1)
+    asyncio.run(outbox._deliver(BrokenBot(), row))
+    assert status(db, outbox_id) == 'failed'
@@ -0,0 +1,26 @@
+"""
+Profil-Cache (user/facts): Treffer liefern Kopien, Schreibzugriffe invalidieren.
+"""
+import json
+
+def test_user_facts_are_isolated_from_cache(temp_db):
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    db.add_fact(1, "hobbies", json.dumps({"sport": ["tennis"]}))
+
+    facts = db.get_user_facts(1)
+    facts["fact"]["hobbies"]["sport"].append("golf")
+    facts["fact"]["hobbies"]["musik"] = "jazz"
+    facts["fact"]["neu"] = "x"
+    facts["extra"] = {}
+
+    assert db.get_user_facts(1) == {"fact": {"hobbies": {"sport": ["tennis"]}}}
+
+def test_add_fact_invalidates_cache(temp_db):
+    db = temp_db
+    db.add_user(1, "anna", "Anna")
+    db.add_fact(1, "wohnort", "köln")
+    assert db.get_user_facts(1)["fact"]["wohnort"] == "köln"
+
+    db.add_fact(1, "wohnort", "bonn")
+    assert db.get_user_facts(1)["fact"]["wohnort"] == "bonn"
@@ -0,0 +1,129 @@
+"""
+UserOrderedUpdateProcessor: FIFO pro User, parallel über User bis zum
+globalen Limit, und Bursts im Ruhe-Fenster als eine Antwort.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src import updates
+from src.updates import (
+    UserOrderedUpdateProcessor, current_arrival, wait_unless_newer, hand_over, merge_burst
+)
+
+def make_update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+async def feed(processor, items, gap=0.0):
+    """Startet process_update für (update, coroutine) in Eingangsreihenfolge"""
+    tasks = []
+    for update, coroutine in items:
+        tasks.append(asyncio.create_task(processor.process_update(update, coroutine)))
+        await asyncio.sleep(gap)
+    await asyncio.gather(*tasks)
+
+def test_same_user_runs_in_order():
+    log = []
+
+    async def handle(i):
+        log.append(("start", i))
+        # frühere Nachrichten brauchen länger – ohne Lock würden spätere überholen
+        await asyncio.sleep(0.05 * (5 - i))
+        log.append(("end", i))
+
+    async def main():
+        processor = UserOrderedUpdateProcessor(concurrency=8)
+        await feed(processor, [(make_update(1), handle(i)) for i in range(5)])
+        assert processor._users == {}
+
+    asyncio.run(main())
+    assert log == [(event, i) for i in range(5) for event in ("start", "end")]
+
+def test_users_run_in_parallel_up_to_limit():
+    active = {"now": 0, "peak": 0}
+
+    async def handle():
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.1)
+        active["now"] -= 1
+
+    async def main():
+        processor = UserOrderedUpdateProcessor(concurrency=3)
+        start = time.perf_counter()
+        await feed(processor, [(make_update(user_id), handle()) for user_id in range(6)])
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    assert active["peak"] == 3
+    assert 0.2 <= elapsed < 0.35  # zwei Runden à 0.1s, nicht sechs
+
+def test_waiting_user_does_not_hold_a_slot():
+    """Ein User mit Rückstau belegt höchstens einen Slot, andere kommen sofort dran"""
+    done = []
+
+    async def handle(name, seconds):
+        await asyncio.sleep(seconds)
+        done.append(name)
+
+    async def main():
+        processor = UserOrderedUpdateProcessor(concurrency=2)
+        items = [(make_update(1), handle(f"a{i}", 0.1)) for i in range(3)]
+        items.append((make_update(2), handle("b", 0.01)))
+        await feed(processor, items)
+
+    asyncio.run(main())
+    assert done == ["b", "a0", "a1", "a2"]
+
+# ==================== BURSTS ====================
+
+def burst_handler(replies, debounce):
+    """Ablauf wie in bot.handle_message: warten, abgeben oder alles zusammen beantworten"""
+    async def handle(text):
+        arrival = current_arrival()
+        if not await wait_unless_newer(arrival, asyncio.sleep(debounce)):
+            hand_over(arrival, text)
+            return
+        replies.append(merge_burst(arrival, text))
+    return handle
+
+def test_burst_in_debounce_window_gets_one_reply():
+    replies = []
+    handle = burst_handler(replies, debounce=0.2)
+    coalesced = updates.get_update_stats()["coalesced"]
+
+    async def main():
+        processor = UserOrderedUpdateProcessor(concurrency=8)
+        texts = ["hey", "kurze frage", "was kostet sowas"]
+        await feed(processor, [(make_update(1), handle(text)) for text in texts], gap=0.05)
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - start
+
+    assert replies == ["hey\nkurze frage\nwas kostet sowas"]
+    assert updates.get_update_stats()["coalesced"] - coalesced == 2
+    assert elapsed < 0.5  # Ruhe-Fenster läuft ab der letzten Nachricht, nicht pro Nachricht
+
+def test_messages_outside_window_and_other_users_stay_separate():
+    replies = []
+    handle = burst_handler(replies, debounce=0.05)
+
+    async def main():
+        processor = UserOrderedUpdateProcessor(concurrency=8)
+        await feed(processor, [
+            (make_update(1), handle("eins")),
+            (make_update(2), handle("andere")),
+        ], gap=0.01)
+        await feed(processor, [(make_update(1), handle("zwei"))])
+
+    asyncio.run(main())
+    assert sorted(replies) == ["andere", "eins", "zwei"]
+
+def test_burst_helpers_without_processor():
+    async def main():
+        assert current_arrival() is None
+        assert await wait_unless_newer(None, asyncio.sleep(0))
+        assert merge_burst(None, "hallo") == "hallo"
+
+    asyncio.run(main())